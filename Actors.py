@@ -5,11 +5,19 @@ Created on Mon Aug 24 11:44:24 2020
 @author: jhvroon
 """
 
+import threading
+import time
+
 import cv2
+import numpy as np
 
-from typing import List
-import ZEDFeatureExtractor as ZED
+from typing import List, TYPE_CHECKING
 import Features as F
+import FrameSources as FS
+import Recording as R
+import Session as SE
+if TYPE_CHECKING:
+    import ZEDFeatureExtractor as ZED
 
 
 
@@ -23,15 +31,25 @@ class Actor:
     Attributes:
         values: dictionary that holds the values that the actor works from
         expectsValues (List): stores the labels of the expected values
+        rate: maximum number of times per second (capture time) the actor is updated, None to update it on every frame. The values it holds are always the most recent ones.
+        stride: update the actor at most every stride-th frame.
+        quitRequested: whether the actor asks the FeatureExtractor to stop, e.g. because the user closed its window.
     '''
     def __init__(self, expectsValues:List):
         self.values = {}
         self.expectsValues = expectsValues
+        self.rate = None
+        self.stride = 1
+        self.quitRequested = False
         
-    def update(self,capture:ZED.CaptureZEDFeatures):
+    def update(self,capture:'ZED.CaptureZEDFeatures'):
         '''Dummy-method. Should be implemented to update with each new frame (after feature values have been updated).'''
         pass ##TODO
         
+    def requestedValues(self, capture:'ZED.CaptureZEDFeatures'):
+        '''Returns the labels of the values the actor needs for the current frame, called before the features are computed. Lazy features nobody requests are not computed. Defaults to all expected values.'''
+        return self.expectsValues
+        
     def updateValue(self, label:str, value):
         '''Stores the given value with in a dictionary under the given label, to be used for updating later on.'''
         self.values[label] = value
@@ -42,12 +60,123 @@ class Actor:
     
 
 
+# =============================================================================
+# Display
+# =============================================================================
+class Display:
+    '''
+    The Display draws and shows the frames of all actors with a window on one shared display thread. HighGUI (the Qt and Cocoa backends in particular) needs all window handling on a single thread, so actors never call cv2.imshow themselves: they hand each frame for their window to the display with show(), and it is drawn and shown on the display thread. While any window is open, the display thread keeps handling window events (cv2.waitKey), so every window keeps repainting, also when its actor has no new frame.
+    
+    Each window holds at most one waiting frame: a frame that is still waiting when the next one arrives for the same window is dropped. The display thread runs while any window is in use, and ends when the last one is closed.
+    
+    Args:
+        interval (float): seconds between handling window events when there are no new frames.
+        
+    Attributes:
+        quitRequested: whether the q-key was pressed in one of the windows, until the last window is closed.
+        error: the last error raised while drawing a frame, None if there was none.
+    '''
+    def __init__(self, interval:float=0.02):
+        self.interval = interval
+        self.quitRequested = False
+        self.error = None
+        self.condition = threading.Condition()
+        self.pending = {}    # window -> (draw, release, visible) of the frame waiting to be shown
+        self.windows = set() # windows in use
+        self.visible = set() # windows that were shown
+        self.closing = set() # windows to close
+        self.thread = None
+    
+    def show(self, window:str, draw, release=None, visible:bool=True):
+        '''Hands a frame for the window to the display thread: draw() is called there and returns the image to show (if visible). release(), if given, is called once the display is done with the frame, whether it was shown or dropped. Returns whether a frame that was still waiting for the window was dropped.'''
+        with self.condition:
+            dropped = self.pending.pop(window, None)
+            self.pending[window] = (draw, release, visible)
+            self.windows.add(window)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.displayLoop, name="Display", daemon=True)
+                self.thread.start()
+            self.condition.notify_all()
+        if dropped is not None and dropped[1] is not None:
+            dropped[1]()
+        return dropped is not None
+    
+    def close(self, window:str):
+        '''Drops the frame still waiting for the window, and waits until the display thread is done with the window and has closed it.'''
+        with self.condition:
+            if window not in self.windows:
+                return
+            dropped = self.pending.pop(window, None)
+            self.closing.add(window)
+            self.condition.notify_all()
+            while window in self.closing:
+                self.condition.wait()
+        if dropped is not None and dropped[1] is not None:
+            dropped[1]()
+    
+    def displayLoop(self):
+        '''Draws and shows the waiting frames, handles the window events and closes windows, until no window is in use.'''
+        while True:
+            with self.condition:
+                if not self.pending and not self.closing:
+                    self.condition.wait(self.interval)
+                frames, self.pending = self.pending, {}
+                closing = set(self.closing)
+            
+            # 1. Draw and show the new frames
+            for window, (draw, release, visible) in frames.items():
+                try:
+                    image = draw()
+                    if visible and image is not None:
+                        cv2.imshow(window, image)
+                        self.visible.add(window)
+                except Exception as error:
+                    self.error = error
+                finally:
+                    if release is not None:
+                        release()
+            
+            # 2. Close the windows of stopped actors, and handle the events of all windows
+            for window in closing & self.visible:
+                cv2.destroyWindow(window)
+            if self.visible:
+                if cv2.waitKey(1) == 113: # for 'q' key
+                    self.quitRequested = True
+            self.visible -= closing
+            
+            with self.condition:
+                self.windows -= closing
+                self.closing -= closing
+                self.condition.notify_all()
+                if not self.windows:
+                    self.thread = None
+                    self.quitRequested = False
+                    return
+
+
+# The display shared by all actors
+display = Display()
+
+
+
 # =============================================================================
 # Cv2Plotter
 # =============================================================================
 class Cv2Plotter(Actor):
     '''
     The Cv2Plotter is an Actor that plots the ZED2 data with bounding boxes and NaiveDistances
+    
+    Plotting happens on the shared display thread (see Display), at most refreshRate times per second, so it never slows down the capture. update() only copies the frame when the display is due for a new one (and only then requests the NaiveDistances); a frame that is still waiting when the next one arrives is dropped.
+    
+    Args:
+        refreshRate (float): maximum number of frames plotted per second.
+        headless (bool): do not open a window, e.g. on servers without a display.
+        snapshotFile (str): if given, every plotted frame is also written to this image file (e.g. "zed.png").
+        
+    Attributes:
+        plottedFrames: number of frames plotted.
+        droppedFrames: number of frames that were replaced by a newer frame before being plotted.
+        quitRequested: whether the q-key was pressed in the window.
     '''
     id_colors = [(59, 232, 176),
              (25,175,208),
@@ -62,37 +191,297 @@ class Cv2Plotter(Actor):
     
     expectsValues = [] 
     expectsValues.append(F.naiveDistanceLabel) #list of distances, one for each detected object
+    windowName = "ZED"
     
-    def __init__(self):
-        super.__init__(Cv2Plotter.expectsValues)
+    def __init__(self, refreshRate:float=20.0, headless:bool=False, snapshotFile:str=None):
+        super().__init__(Cv2Plotter.expectsValues)
+        self.interval = 1.0 / refreshRate
+        self.headless = headless
+        self.snapshotFile = snapshotFile
+        
+        self.plottedFrames = 0
+        self.droppedFrames = 0
+        
+        self.lastHandoff = 0.0
+        self.due = False    # whether the current frame will be plotted
     
-    def update(self,capture:ZED.CaptureZEDFeatures):
-        '''Plot the next frame.'''
-        obj_array = capture.getObjectArray()
-        image_data = capture.getImageData()
-        distances = self.values[F.naiveDistanceLabel]
+    def requestedValues(self, capture:'ZED.CaptureZEDFeatures'):
+        '''Requests the NaiveDistances only if it is time to plot a new frame.'''
+        now = time.perf_counter()
+        self.due = now - self.lastHandoff >= self.interval
+        if not self.due:
+            return []
+        self.lastHandoff = now
+        return self.expectsValues
+    
+    def update(self,capture:'ZED.CaptureZEDFeatures'):
+        '''Hand the next frame to the display thread, if it is time for a new frame.'''
+        if not self.due:
+            return
+        self.due = False
         
+        # 1. Copy the image, as the capture reuses its buffer for the next frame
+        frame = capture.getFrame()
+        image = frame.copyImageData()
+        
+        # 2. Take what we need from the objects
+        boxes = Cv2Plotter.objectBoxes(capture.getObjectRecords())
+        
+        # 3. Hand it to the display, replacing the waiting frame, if any
+        distances = self.values[F.naiveDistanceLabel]
+        pool = frame.pool
+        if display.show(Cv2Plotter.windowName, lambda: self.plot(image, boxes, distances), lambda: pool.release(image), not self.headless):
+            self.droppedFrames += 1
+        self.quitRequested = self.quitRequested or display.quitRequested
+    
+    @staticmethod
+    def objectBoxes(records):
+        '''Returns what is needed to draw the objects (given as object records): (left, top, right, bottom, id, label) for each object.'''
+        corners = records["bounding_box_2d"][:,[0,2]].reshape(-1,4).astype(np.int64).tolist()
+        labels = [FS.objectLabels.name(code) for code in records["label"].tolist()]
+        return [tuple(corners[i]) + (id, labels[i]) for i, id in enumerate(records["id"].tolist())]
+    
+    @staticmethod
+    def drawObjects(image_data, boxes, distances=None):
+        '''Draws the bounding box and label of each object (see objectBoxes), with its distance if given.'''
         # For each tracked object....
-        for i in range(len(obj_array)):
-            obj_data = obj_array[i]
+        for i in range(len(boxes)):
+            left, top, right, bottom, obj_id, obj_label = boxes[i]
             
             # 1. Plot a bounding box
-            bounding_box = obj_data.bounding_box_2d
-            cv2.rectangle(image_data, (int(bounding_box[0,0]),int(bounding_box[0,1])),
-                        (int(bounding_box[2,0]),int(bounding_box[2,1])),
-                          Cv2Plotter.get_color_id_gr(int(obj_data.id)), 3)
+            cv2.rectangle(image_data, (left,top), (right,bottom), Cv2Plotter.get_color_id_gr(obj_id), 3)
             
-            # 2. Plot the distance between the object and the previous object
-            obj_label = str(obj_array[i].label)
+            # 2. Plot the label, and the distance between the object and the previous object
+            cv2.putText(image_data, obj_label, (left,top-30), cv2.FONT_HERSHEY_SIMPLEX, 0.5,(255,255,255),1)
+            if distances is not None:
+                cv2.putText(image_data, str(distances[i]), (left,top-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5,(255,255,255),1)
+    
+    def plot(self, image_data, boxes, distances):
+        '''Plot a frame, returns the image to show. Called on the display thread.'''
+        Cv2Plotter.drawObjects(image_data, boxes, distances)
             
-            distance = distances[i]
+        # And plot the whole frame as well:
+        if self.snapshotFile is not None:
+            cv2.imwrite(self.snapshotFile, image_data)
+        self.plottedFrames += 1
+        return image_data
+        
+    def stop(self):
+        '''When stopped, the frame still waiting is dropped and the cv2-window will be closed.'''
+        display.close(Cv2Plotter.windowName)
 
-            cv2.putText(image_data, obj_label, (int(bounding_box[0,0]),int(bounding_box[0,1]-30)), cv2.FONT_HERSHEY_SIMPLEX, 0.5,(255,255,255),1)
-            cv2.putText(image_data, str(distance), (int(bounding_box[0,0]),int(bounding_box[0,1]-10)), cv2.FONT_HERSHEY_SIMPLEX, 0.5,(255,255,255),1)
-            
-        # And plot the whole frame as well:                  
-        cv2.imshow("ZED", image_data)
+
+
+# =============================================================================
+# DetectionRecorder
+# =============================================================================
+class DetectionRecorder(Actor):
+    '''
+    The DetectionRecorder is an Actor that records every detected object (with its NaiveDistance) to a DetectionLog. Export the recording with Recording.py afterwards.
+    
+    Args:
+        directory (str): directory to record to.
+        labels (List[str]): only record objects with these labels (e.g. ["Person"]), None to record all objects.
+        chunkSize (int): number of detections per segment written to disk.
+    '''
+    expectsValues = [F.naiveDistanceLabel]
+    
+    def __init__(self, directory:str, labels:List[str]=None, chunkSize:int=8192):
+        super().__init__(DetectionRecorder.expectsValues)
+        self.labels = labels
+        self.log = R.DetectionLog(directory, chunkSize)
+    
+    def update(self,capture:'ZED.CaptureZEDFeatures'):
+        '''Record the objects of the next frame.'''
+        records = capture.getObjectRecords()
+        distances = self.values[F.naiveDistanceLabel]
+        if self.labels is not None:
+            selected = np.isin(records["label"], [FS.objectLabels.code(label) for label in self.labels])
+            records, distances = records[selected], distances[selected]
+        self.log.appendRecords(capture.getTimestamp(), records, distances)
+        
+    def stop(self):
+        '''When stopped, the remaining detections are written.'''
+        self.log.close()
+
+
+
+# =============================================================================
+# OccupancyOverlay
+# =============================================================================
+class OccupancyOverlay(Actor):
+    '''
+    The OccupancyOverlay is an Actor that shows the FloorOccupancy heatmap as a top-down map of the floor (with the camera at the top), with the people of the current frame as dots, in the corner of the camera image (or on its own).
+    
+    The heatmap is only read refreshRate times per second, as reading it costs time proportional to the size of the grid. Like the Cv2Plotter, update() only takes a copy of the heatmap, the cells of the people and (for the inset) a pooled copy of the image, and hands them to the shared display thread (see Display) that draws and shows the overlay, so drawing never slows down the capture. An overlay that is still waiting when the next one arrives is dropped.
+    
+    Args:
+        refreshRate (float): maximum number of times per second the overlay is drawn.
+        cellPixels (int): size of a grid cell in the drawn map, in pixels.
+        inset (bool): draw the map in the top-right corner of the camera image, instead of on its own.
+        headless (bool): do not open a window, e.g. on servers without a display.
+        snapshotFile (str): if given, every drawn overlay is also written to this image file (e.g. "occupancy.png").
+        labels (List[str]): only objects with these labels are drawn, None to draw all objects. Should match the labels of the FloorOccupancy, so the dots show the objects the heatmap counts.
+        
+    Attributes:
+        image: the last drawn overlay, None before the first.
+        drawnFrames: number of overlays drawn.
+        droppedFrames: number of overlays that were replaced by a newer one before being drawn.
+        quitRequested: whether the q-key was pressed in the window.
+    '''
+    expectsValues = [F.floorOccupancyLabel]
+    windowName = "Occupancy"
+    
+    def __init__(self, refreshRate:float=2.0, cellPixels:int=8, inset:bool=True, headless:bool=False, snapshotFile:str=None, labels:List[str]=("Person",)):
+        super().__init__(OccupancyOverlay.expectsValues)
+        self.labels = labels
+        self.rate = refreshRate
+        self.cellPixels = cellPixels
+        self.inset = inset
+        self.headless = headless
+        self.snapshotFile = snapshotFile
+        self.image = None
+        
+        self.drawnFrames = 0
+        self.droppedFrames = 0
+        
+    def update(self,capture:'ZED.CaptureZEDFeatures'):
+        '''Hand the heatmap with the people of the current frame to the display thread.'''
+        occupancy = self.values[F.floorOccupancyLabel]
+        
+        # 1. The heatmap and the cells of the people of the current frame, the display thread owns them
+        heatmap = occupancy.heatmap()
+        records = F.selectLabels(capture.getObjectRecords(), self.labels)
+        cells, inside = occupancy.cellIndices(records["position"])
+        people = (cells, records["id"][inside])
+        
+        # 2. A copy of the image for the inset, as the capture reuses its buffer for the next frame
+        image, release = None, None
+        if self.inset:
+            frame = capture.getFrame()
+            data = frame.getImageData()
+            if data is not None and data.ndim == 3:
+                image = frame.copyImageData()
+                release = lambda pool=frame.pool: pool.release(image)
+        
+        # 3. Hand it to the display, replacing the waiting overlay, if any
+        if display.show(OccupancyOverlay.windowName, lambda: self.draw(heatmap, people, image), release, not self.headless):
+            self.droppedFrames += 1
+        self.quitRequested = self.quitRequested or display.quitRequested
+    
+    def draw(self, heatmap, people, frame):
+        '''Draw the heatmap with the people as dots, in the corner of the camera image if it fits. Returns the image to show, called on the display thread.'''
+        # 1. The heatmap, scaled to its peak and colored
+        peak = heatmap.max()
+        gray = (heatmap * (255.0 / peak) if peak > 0 else heatmap).astype(np.uint8)
+        size = (heatmap.shape[1] * self.cellPixels, heatmap.shape[0] * self.cellPixels)
+        overlay = cv2.resize(cv2.applyColorMap(gray, cv2.COLORMAP_JET), size, interpolation=cv2.INTER_NEAREST)
+        
+        # 2. The people of the current frame
+        cells, ids = people
+        ids = ids.tolist()
+        for i, cell in enumerate(cells.tolist()):
+            row, column = divmod(cell, heatmap.shape[1])
+            center = (int((column + 0.5) * self.cellPixels), int((row + 0.5) * self.cellPixels))
+            cv2.circle(overlay, center, max(2, self.cellPixels // 2), Cv2Plotter.get_color_id_gr(ids[i]), -1)
+        
+        # 3. In the corner of the camera image, if it fits
+        image = overlay
+        if frame is not None and frame.shape[0] >= size[1] and frame.shape[1] >= size[0]:
+            image = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR) if frame.shape[2] == 4 else frame.copy()
+            corner = image[:size[1], image.shape[1]-size[0]:]
+            cv2.addWeighted(overlay, 0.7, corner, 0.3, 0, dst=corner)
+        self.image = image
+        
+        if self.snapshotFile is not None:
+            cv2.imwrite(self.snapshotFile, image)
+        self.drawnFrames += 1
+        return image
+        
+    def stop(self):
+        '''When stopped, the overlay still waiting is dropped and the window will be closed.'''
+        display.close(OccupancyOverlay.windowName)
+
+
+
+
+# =============================================================================
+# VideoRecorder
+# =============================================================================
+class VideoRecorder(Actor):
+    '''
+    The VideoRecorder is an Actor that keeps the footage for later review: it records the frames (raw, or annotated with the bounding boxes of the objects) to video files with a VideoLog.
+    
+    Encoding, resizing and drawing happen on the encoder thread of the VideoLog. update() only copies the frame, and only when the encoder can take it: when the encoder falls behind, frames are dropped (and counted) instead of slowing down the capture.
+    
+    Args:
+        directory (str): directory to record to.
+        fps (float): number of frames recorded per second (capture time), the other frames are skipped. None to record every frame, the videos are then written with the frame rate given by videoFps.
+        scale (float): factor the frames are resized with before encoding, e.g. 0.5 for half the width and height.
+        segmentLength (float): seconds of capture time per video file.
+        annotate (bool): draw the bounding boxes and labels of the objects on the recorded frames.
+        queueSize (int): number of frames that can wait for the encoder.
+        codec (str): fourcc of the codec, e.g. "mp4v" (.mp4) or "MJPG" (.avi).
+        videoFps (float): frame rate the videos are written with when fps is None.
+        
+    Attributes:
+        log: the VideoLog, with the number of encoded and dropped frames.
+    '''
+    def __init__(self, directory:str, fps:float=15.0, scale:float=0.5, segmentLength:float=300.0, annotate:bool=True,
+                 queueSize:int=8, codec:str="mp4v", videoFps:float=30.0):
+        super().__init__([])
+        self.rate = fps
+        extension = ".avi" if codec in ["MJPG", "XVID"] else ".mp4"
+        self.log = R.VideoLog(directory, fps if fps is not None else videoFps, scale, segmentLength, queueSize, codec, extension,
+                              VideoRecorder.drawAnnotation if annotate else None)
+        self.annotate = annotate
+        
+    @staticmethod
+    def drawAnnotation(image_data, annotation):
+        '''Draws the objects on a frame on the encoder thread, scaling the boxes to the size of the frame.'''
+        scale, boxes = annotation
+        if scale != 1.0:
+            boxes = [(int(left * scale), int(top * scale), int(right * scale), int(bottom * scale), id, label)
+                     for left, top, right, bottom, id, label in boxes]
+        Cv2Plotter.drawObjects(image_data, boxes)
+        
+    def update(self,capture:'ZED.CaptureZEDFeatures'):
+        '''Hand a copy of the frame to the encoder, unless it is behind.'''
+        if not self.log.accepts():
+            self.log.droppedFrames += 1
+            return
+        frame = capture.getFrame()
+        image = frame.copyImageData()
+        annotation = (self.log.scale, Cv2Plotter.objectBoxes(capture.getObjectRecords())) if self.annotate else None
+        if not self.log.offer(image, capture.getTimestamp(), capture.getFrameNumber(), annotation, frame.pool.release):
+            frame.pool.release(image)
+        
+    def stop(self):
+        '''When stopped, the frames that are still queued are encoded and the video files are closed. Raises the last error the encoder ran into (e.g. a codec that is not available), if any.'''
+        self.log.close()
+
+
+
+
+# =============================================================================
+# SessionRecorder
+# =============================================================================
+class SessionRecorder(Actor):
+    '''
+    The SessionRecorder is an Actor that records every frame with its object records to a session (see Session.py), which can be searched by time and by track id afterwards, while it is being recorded too.
+    
+    Args:
+        directory (str): directory to record the session to.
+        flushFrames (int): number of frames written to disk at once, on the writer thread of the SessionWriter.
+    '''
+    def __init__(self, directory:str, flushFrames:int=30):
+        super().__init__([])
+        self.writer = SE.SessionWriter(directory, flushFrames)
+    
+    def update(self,capture:'ZED.CaptureZEDFeatures'):
+        '''Record the next frame.'''
+        self.writer.append(capture.getTimestamp(), capture.getFrameNumber(), capture.getObjectRecords(), capture.isPredicted())
         
     def stop(self):
-        '''When stopped, the cv2-window will be closed.'''
-        cv2.destroyAllWindows()
+        '''When stopped, the remaining frames are written.'''
+        self.writer.close()
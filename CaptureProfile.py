@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 17:41:05 2026
+
+The CaptureProfile holds the camera and detection settings of a capture (resolution, fps, depth
+mode, detection model and thresholds), loaded from a JSON file and/or the command line. The
+AdaptiveResolution steps the resolution and fps down when the pipeline cannot keep up, and back
+up when there is headroom.
+
+    python ObjectDistance.py --profile lab.json --fps 30
+"""
+
+import argparse
+import copy
+import json
+import time
+
+import numpy as np
+
+from typing import List
+
+
+# Image sizes of the ZED 2 video modes
+resolutionSizes = {"VGA": (672,376),
+                   "HD720": (1280,720),
+                   "HD1080": (1920,1080),
+                   "HD2K": (2208,1242)}
+
+# Video modes the AdaptiveResolution steps through by default
+defaultAdaptiveModes = [("HD1080", 30), ("HD720", 60), ("HD720", 30), ("VGA", 60), ("VGA", 30), ("VGA", 15)]
+
+
+
+class CaptureProfile:
+    '''
+    The CaptureProfile holds the settings the ZED is opened with. Names of SDK enums (resolution, depthMode, sensingMode, detectionModel) are given as strings, e.g. "HD720", and looked up in the SDK when the camera is opened, so profiles can be written and read without the SDK.
+
+    Args:
+        resolution (str): camera resolution, one of sl.RESOLUTION (VGA, HD720, HD1080, HD2K).
+        fps (int): camera frame rate.
+        depthMode (str): one of sl.DEPTH_MODE (e.g. PERFORMANCE, QUALITY, ULTRA), None for the SDK default.
+        sensingMode (str): one of sl.SENSING_MODE (STANDARD, FILL).
+        confidenceThreshold (int): depth confidence threshold (1-100), 100 keeps all depth.
+        texturenessConfidenceThreshold (int): depth textureness confidence threshold (1-100), 100 keeps all depth.
+        detectionModel (str): one of sl.DETECTION_MODEL (e.g. MULTI_CLASS_BOX, HUMAN_BODY_FAST), None for the SDK default.
+        detectionConfidenceThreshold (int): objects detected with a lower confidence (0-100) are left out.
+        enableTracking (bool): whether objects are tracked over frames (which requires positional tracking).
+        floorAsOrigin (bool): whether positions are relative to the floor instead of the camera.
+        adaptive (bool): whether to use an AdaptiveResolution to step the resolution and fps down when the pipeline cannot keep up.
+        adaptiveModes (List): (resolution, fps) pairs the AdaptiveResolution may switch between, None for defaultAdaptiveModes.
+    '''
+    def __init__(self, resolution:str="HD720", fps:int=60, depthMode:str=None, sensingMode:str="STANDARD",
+                 confidenceThreshold:int=100, texturenessConfidenceThreshold:int=100, detectionModel:str=None,
+                 detectionConfidenceThreshold:int=40, enableTracking:bool=True, floorAsOrigin:bool=True,
+                 adaptive:bool=False, adaptiveModes:List=None):
+        if resolution not in resolutionSizes:
+            raise ValueError("Unknown resolution: " + str(resolution))
+        self.resolution = resolution
+        self.fps = fps
+        self.depthMode = depthMode
+        self.sensingMode = sensingMode
+        self.confidenceThreshold = confidenceThreshold
+        self.texturenessConfidenceThreshold = texturenessConfidenceThreshold
+        self.detectionModel = detectionModel
+        self.detectionConfidenceThreshold = detectionConfidenceThreshold
+        self.enableTracking = enableTracking
+        self.floorAsOrigin = floorAsOrigin
+        self.adaptive = adaptive
+        self.adaptiveModes = [tuple(mode) for mode in adaptiveModes] if adaptiveModes is not None else None
+
+    @staticmethod
+    def load(path:str):
+        '''Returns the profile stored in a JSON file, settings that are not in the file keep their default.'''
+        with open(path) as file:
+            settings = json.load(file)
+        try:
+            return CaptureProfile(**settings)
+        except TypeError as error:
+            raise ValueError("Invalid capture profile " + path + ": " + str(error))
+
+    def save(self, path:str):
+        '''Writes the profile to a JSON file.'''
+        with open(path, "w") as file:
+            json.dump(vars(self), file, indent=2)
+
+    def withMode(self, resolution:str, fps:int):
+        '''Returns a copy of the profile with another resolution and fps.'''
+        profile = copy.copy(self)
+        profile.resolution = resolution
+        profile.fps = fps
+        return profile
+
+    @staticmethod
+    def addArguments(parser:argparse.ArgumentParser):
+        '''Adds the command line options for a capture profile to the parser: a profile file, and options that override its settings.'''
+        group = parser.add_argument_group("capture profile")
+        group.add_argument("--profile", help="JSON file with the capture profile")
+        group.add_argument("--resolution", choices=list(resolutionSizes))
+        group.add_argument("--fps", type=int)
+        group.add_argument("--depth-mode", dest="depthMode")
+        group.add_argument("--detection-model", dest="detectionModel")
+        group.add_argument("--confidence", dest="confidenceThreshold", type=int, help="depth confidence threshold (1-100)")
+        group.add_argument("--detection-confidence", dest="detectionConfidenceThreshold", type=int, help="detection confidence threshold (0-100)")
+        group.add_argument("--no-floor-origin", dest="floorAsOrigin", action="store_false", default=None, help="positions relative to the camera instead of the floor")
+        group.add_argument("--adaptive", action="store_true", default=None, help="step the resolution and fps down when the pipeline cannot keep up")
+
+    @staticmethod
+    def fromArgs(args:argparse.Namespace):
+        '''Returns the profile given on the command line (see addArguments).'''
+        profile = CaptureProfile.load(args.profile) if args.profile is not None else CaptureProfile()
+        for name in ["resolution", "fps", "depthMode", "detectionModel", "confidenceThreshold", "detectionConfidenceThreshold", "floorAsOrigin", "adaptive"]:
+            value = getattr(args, name)
+            if value is not None:
+                setattr(profile, name, value)
+        return profile
+
+    def initParameters(self, sl):
+        '''Returns the sl.InitParameters for this profile.'''
+        init_params = sl.InitParameters()
+        init_params.camera_resolution = getattr(sl.RESOLUTION, self.resolution)
+        init_params.camera_fps = self.fps
+        init_params.coordinate_units = sl.UNIT.METER # Set units in meters
+        if self.depthMode is not None:
+            init_params.depth_mode = getattr(sl.DEPTH_MODE, self.depthMode)
+        return init_params
+
+    def runtimeParameters(self, sl):
+        '''Returns the sl.RuntimeParameters for this profile.'''
+        runtime_parameters = sl.RuntimeParameters()
+        runtime_parameters.sensing_mode = getattr(sl.SENSING_MODE, self.sensingMode)
+        runtime_parameters.confidence_threshold = self.confidenceThreshold
+        runtime_parameters.textureness_confidence_threshold = self.texturenessConfidenceThreshold
+        return runtime_parameters
+
+    def objectDetectionParameters(self, sl):
+        '''Returns the sl.ObjectDetectionParameters for this profile.'''
+        obj_param = sl.ObjectDetectionParameters()
+        obj_param.enable_tracking = self.enableTracking
+        if self.detectionModel is not None:
+            obj_param.detection_model = getattr(sl.DETECTION_MODEL, self.detectionModel)
+        return obj_param
+
+    def positionalTrackingParameters(self, sl):
+        '''Returns the sl.PositionalTrackingParameters for this profile.'''
+        positional_tracking_parameters = sl.PositionalTrackingParameters()
+        positional_tracking_parameters.set_floor_as_origin = self.floorAsOrigin
+        return positional_tracking_parameters
+
+    def detectionRuntimeParameters(self, sl):
+        '''Returns the sl.ObjectDetectionRuntimeParameters for this profile.'''
+        detection_parameters_rt = sl.ObjectDetectionRuntimeParameters()
+        detection_parameters_rt.detection_confidence_threshold = self.detectionConfidenceThreshold
+        return detection_parameters_rt
+
+
+
+class AdaptiveResolution:
+    '''
+    The AdaptiveResolution picks the video mode (resolution and fps) the pipeline can keep up with.
+
+    It is given the time the features and actors took for each frame. Once a window of frames has been measured, it steps down to the next, less demanding mode when the 95th percentile of these latencies exceeds stepDown times the frame budget (1/fps). It steps back up when the latency, scaled by the number of pixels of the more demanding mode, would stay below stepUp times the budget of that mode. After each switch it waits cooldown seconds before switching again.
+
+    Args:
+        profile (CaptureProfile): the profile the capture starts with, its mode is added to the modes if it is not one of them.
+        modes (List): (resolution, fps) pairs to switch between, None for the adaptiveModes of the profile or defaultAdaptiveModes.
+        windowSize (int): number of frames measured before deciding.
+        stepDown (float): fraction of the frame budget above which to step down.
+        stepUp (float): fraction of the frame budget of the more demanding mode below which to step up.
+        cooldown (float): seconds to wait after a switch before switching again.
+
+    Attributes:
+        modes: the modes, from most to least demanding.
+        index: the index of the current mode.
+        switches: number of times the mode was switched.
+    '''
+    def __init__(self, profile:CaptureProfile, modes:List=None, windowSize:int=60, stepDown:float=0.9, stepUp:float=0.5, cooldown:float=2.0):
+        modes = modes if modes is not None else profile.adaptiveModes if profile.adaptiveModes is not None else defaultAdaptiveModes
+        modes = set(tuple(mode) for mode in modes) | {(profile.resolution, profile.fps)}
+        self.modes = sorted(modes, key=AdaptiveResolution.load, reverse=True)
+        self.index = self.modes.index((profile.resolution, profile.fps))
+        self.latencies = np.zeros(windowSize)
+        self.stepDown = stepDown
+        self.stepUp = stepUp
+        self.cooldown = cooldown
+        self.switches = 0
+        self.reset()
+
+    @staticmethod
+    def pixels(mode):
+        '''Returns the number of pixels per frame of a mode.'''
+        width, height = resolutionSizes[mode[0]]
+        return width * height
+
+    @staticmethod
+    def load(mode):
+        '''Returns the number of pixels per second of a mode.'''
+        return AdaptiveResolution.pixels(mode) * mode[1]
+
+    def reset(self):
+        '''Forgets the measured latencies and starts the cooldown.'''
+        self.count = 0
+        self.lastSwitch = time.perf_counter()
+
+    def getMode(self):
+        '''Returns the current (resolution, fps).'''
+        return self.modes[self.index]
+
+    def setMode(self, mode):
+        '''Goes back to the given (resolution, fps), e.g. when the source could not switch to the mode returned by update(), and starts the cooldown.'''
+        self.index = self.modes.index(tuple(mode))
+        self.reset()
+
+    def update(self, latency:float):
+        '''Records the latency (in seconds) of a frame. Returns the (resolution, fps) to switch to, or None to keep the current mode.'''
+        self.latencies[self.count % len(self.latencies)] = latency
+        self.count += 1
+        if self.count < len(self.latencies) or time.perf_counter() - self.lastSwitch < self.cooldown:
+            return None
+
+        latency = np.percentile(self.latencies, 95)
+        mode = self.modes[self.index]
+        if latency > self.stepDown / mode[1] and self.index < len(self.modes) - 1:
+            self.index += 1
+        elif self.index > 0:
+            upper = self.modes[self.index - 1]
+            if latency * AdaptiveResolution.pixels(upper) / AdaptiveResolution.pixels(mode) < self.stepUp / upper[1]:
+                self.index -= 1
+            else:
+                return None
+        else:
+            return None
+        self.switches += 1
+        self.reset()
+        return self.modes[self.index]
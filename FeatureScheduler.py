@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 11:20:31 2026
+
+The FeatureGraph orders the features and actors of a FeatureExtractor by their dependencies,
+the FeatureScheduler runs them for each frame, independent features in parallel.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import Profiling as P
+
+from typing import List, TYPE_CHECKING
+if TYPE_CHECKING:
+    import ZEDFeatureExtractor as ZED
+    import FeatureWorkers as FW
+    import Features as F
+    import Actors as A
+
+
+
+class FeatureGraph:
+    '''
+    The FeatureGraph is the dependency graph of features (through Feature.dependentOn) and actors (through the labels in Actor.expectsValues).
+
+    Args:
+        features (List[Feature]): the features, in any order.
+        actors (List[Actor]): the actors.
+
+    Attributes:
+        dependencies: for each feature and actor, the features it waits for.
+        dependents: for each feature, the features and actors waiting for it.
+        missing: the (feature, dependency) pairs where the dependency is not in the feature list.
+    '''
+    def __init__(self, features:List['F.Feature'], actors:List['A.Actor']):
+        self.features = features
+        self.actors = actors
+        self.dependencies = {}
+        self.dependents = {feature: [] for feature in features}
+        self.missing = []
+
+        # 1. Features wait for the features they depend on
+        for feature in features:
+            self.dependencies[feature] = []
+            for featureNeeded in feature.dependentOn:
+                if featureNeeded in self.dependents:
+                    self.dependencies[feature].append(featureNeeded)
+                    self.dependents[featureNeeded].append(feature)
+                else:
+                    self.missing.append((feature, featureNeeded))
+
+        # 2. Actors wait for the features that compute the values they expect
+        for actor in actors:
+            self.dependencies[actor] = []
+            for feature in features:
+                if feature.label in actor.expectsValues:
+                    self.dependencies[actor].append(feature)
+                    self.dependents[feature].append(actor)
+
+    def findCycle(self):
+        '''Returns a list of features that depend on each other in a cycle (first and last are the same), or None if there are no cycles.'''
+        visiting, done = set(), set()
+
+        def visit(feature, path):
+            visiting.add(feature)
+            path.append(feature)
+            for featureNeeded in self.dependencies[feature]:
+                if featureNeeded in visiting:
+                    return path[path.index(featureNeeded):] + [featureNeeded]
+                if featureNeeded not in done:
+                    cycle = visit(featureNeeded, path)
+                    if cycle is not None:
+                        return cycle
+            visiting.remove(feature)
+            done.add(feature)
+            path.pop()
+            return None
+
+        for feature in self.features:
+            if feature not in done:
+                cycle = visit(feature, [])
+                if cycle is not None:
+                    return cycle
+        return None
+
+    def sortedFeatures(self):
+        '''Returns the features in an order where each feature comes after the features it depends on (keeping the listed order where possible). The graph should not have cycles.'''
+        remaining = {feature: len(self.dependencies[feature]) for feature in self.features}
+        ordered = []
+        ready = [feature for feature in self.features if remaining[feature] == 0]
+        while ready:
+            feature = ready.pop(0)
+            ordered.append(feature)
+            for dependent in self.dependents[feature]:
+                if dependent in remaining:
+                    remaining[dependent] -= 1
+                    if remaining[dependent] == 0:
+                        ready.append(dependent)
+        return ordered
+
+
+
+class FeatureScheduler:
+    '''
+    The FeatureScheduler computes the features and updates the actors for a frame. Lazy features (Feature.lazy) are skipped when no actor requests their value and no other computed feature depends on them; features whose inputs did not change keep their value (see Feature.inputs). Features and actors with a rate or stride only run on the frames they are due; in between, the most recent values are used.
+
+    With more than one worker, each feature is computed on a thread pool as soon as the features it depends on are done, so independent features run in parallel (NumPy and cv2 release the GIL for most of their work). Actors are updated on the calling thread as soon as all values they expect are ready. Actors with a window do not handle it themselves, they hand their frames to the display thread shared by all actors (see Actors.Display).
+
+    Args:
+        graph (FeatureGraph): the dependencies between features and actors, without cycles.
+        workers (int): number of threads to compute features on, 1 to compute them one after the other on the calling thread.
+        profiler (Profiler): measures the duration of each feature and actor.
+        workerPool (FeatureWorkerPool): computes the features that run in worker processes, None if all features run in-process.
+    '''
+    def __init__(self, graph:FeatureGraph, workers:int=1, profiler:P.Profiler=None, workerPool:'FW.FeatureWorkerPool'=None):
+        self.graph = graph
+        self.profiler = profiler if profiler is not None else P.Profiler()
+        self.workerPool = workerPool
+        self.features = graph.sortedFeatures()
+        self.actors = graph.actors
+        self.workers = workers
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="Feature") if workers > 1 else None
+        self.frames = 0
+        self.lastRun = {} # feature or actor -> (frame, timestamp) it was last computed or updated
+
+    def run(self, capture:'ZED.CaptureZEDFeatures'):
+        '''Computes the needed features and updates all actors for the current frame of the capture.'''
+        self.frames += 1
+        actors = [actor for actor in self.actors if self.isDue(actor, capture)]
+        needed = self.neededFeatures(capture, actors)
+        for node in actors + list(needed):
+            self.lastRun[node] = (self.frames, capture.getTimestamp())
+        # The frame is only copied to shared memory on frames a feature in a worker process is needed
+        if self.workerPool is not None and any(self.workerPool.runs(feature) for feature in needed):
+            self.workerPool.shareFrame(capture)
+
+        if self.pool is None:
+            for feature in self.features:
+                if feature in needed:
+                    self.computeFeature(feature, capture)
+            for actor in actors:
+                self.updateActor(actor, capture)
+            return
+
+        # 1. Start all needed features that do not depend on other features
+        remaining = {node: sum(1 for featureNeeded in dependencies if featureNeeded in needed)
+                     for node, dependencies in self.graph.dependencies.items()}
+        running = {}
+        for feature in self.features:
+            if feature in needed and remaining[feature] == 0:
+                running[self.pool.submit(self.computeFeature, feature, capture)] = feature
+        for actor in actors:
+            if remaining[actor] == 0:
+                self.updateActor(actor, capture)
+
+        # 2. Whenever a feature is done, start the features and update the actors that were waiting for it
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                feature = running.pop(future)
+                future.result() # raises the exception of the feature, if any
+                for dependent in self.graph.dependents[feature]:
+                    remaining[dependent] -= 1
+                    if remaining[dependent] == 0:
+                        if dependent in self.graph.dependents:
+                            if dependent in needed:
+                                running[self.pool.submit(self.computeFeature, dependent, capture)] = dependent
+                        elif dependent in actors:
+                            self.updateActor(dependent, capture)
+
+    def isDue(self, node, capture:'ZED.CaptureZEDFeatures'):
+        '''Returns whether a feature or actor should run on the current frame, given its rate and stride.'''
+        lastRun = self.lastRun.get(node)
+        if lastRun is None:
+            return True
+        lastFrame, lastTimestamp = lastRun
+        if self.frames - lastFrame < node.stride:
+            return False
+        return node.rate is None or capture.getTimestamp() - lastTimestamp >= 1e9 / node.rate
+
+    def neededFeatures(self, capture:'ZED.CaptureZEDFeatures', actors:List['A.Actor']):
+        '''Returns the features to compute for the current frame: the features that are due (see isDue) and not lazy, the lazy features whose value one of the given actors requests, and the due features these depend on.'''
+        requested = set()
+        for actor in actors:
+            requested.update(actor.requestedValues(capture))
+        needed = set()
+        for feature in reversed(self.features):
+            if (not feature.lazy or feature.label in requested or any(dependent in needed for dependent in self.graph.dependents[feature])) \
+                    and self.isDue(feature, capture):
+                needed.add(feature)
+        return needed
+
+    def computeFeature(self, feature:'F.Feature', capture:'ZED.CaptureZEDFeatures'):
+        '''Computes a single feature, measuring how long it takes.'''
+        start = self.profiler.start()
+        if self.workerPool is not None and self.workerPool.runs(feature):
+            inputsKey = feature.inputKey(capture)
+            if inputsKey != feature.inputsKey:
+                feature.value = self.workerPool.compute(feature)
+                feature.computed(inputsKey)
+                feature.updateActors()
+        else:
+            feature.compute(capture)
+        self.profiler.stop("feature " + feature.label, start)
+
+    def updateActor(self, actor:'A.Actor', capture:'ZED.CaptureZEDFeatures'):
+        '''Updates a single actor, measuring how long it takes.'''
+        start = self.profiler.start()
+        actor.update(capture)
+        self.profiler.stop("actor " + type(actor).__name__, start)
+
+    def shutdown(self):
+        '''Stops the worker threads and processes.'''
+        if self.pool is not None:
+            self.pool.shutdown()
+        if self.workerPool is not None:
+            self.workerPool.close()
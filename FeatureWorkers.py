@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 16:02:26 2026
+
+The FeatureWorkerPool computes selected features (Feature.runInWorker) in worker processes, so
+heavy features do not compete for the GIL. Frames are handed to the workers through shared
+memory; only the small per-frame message and the computed values are pickled.
+"""
+
+import copy
+import threading
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from typing import List, TYPE_CHECKING
+
+import FrameSources as FS
+if TYPE_CHECKING:
+    import ZEDFeatureExtractor as ZED
+    import Features as F
+
+
+def detach(feature:'F.Feature', detached:dict=None):
+    '''Returns a copy of the feature (and the features it depends on) without actors, to send to a worker process.'''
+    detached = detached if detached is not None else {}
+    if feature not in detached:
+        clone = copy.copy(feature)
+        clone.actors = []
+        detached[feature] = clone
+        clone.dependentOn = [detach(featureNeeded, detached) for featureNeeded in feature.dependentOn]
+    return detached[feature]
+
+
+class AttachedBlocks:
+    '''
+    The AttachedBlocks are the shared memory blocks a worker process is attached to: the current block of each kind of buffer (image, depth, pointCloud, objects). When the pool replaces the block of a kind (e.g. for larger frames), the worker closes the block it replaces, so it does not keep every block it ever saw mapped.
+    '''
+    def __init__(self):
+        self.blocks = {}  # kind -> current block
+        self.retired = [] # replaced blocks that arrays of an earlier frame still refer to
+
+    def attach(self, kind:str, name:str):
+        '''Returns the shared memory block with the given name for a kind of buffer, attaching to it once. A block it replaces is closed.'''
+        block = self.blocks.get(kind)
+        if block is not None and block.name == name:
+            return block
+        if block is not None:
+            self.retired.append(block)
+        self.release()
+        block = shared_memory.SharedMemory(name=name)
+        try:
+            # The main process owns the block, keep this process from removing it when it exits
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(block._name, "shared_memory")
+        except (ImportError, AttributeError, KeyError):
+            pass
+        self.blocks[kind] = block
+        return block
+
+    def release(self):
+        '''Closes the replaced blocks, except those that arrays still refer to (they are closed on a later call).'''
+        inUse = []
+        for block in self.retired:
+            try:
+                block.close()
+            except BufferError:
+                inUse.append(block)
+        self.retired = inUse
+
+    def close(self):
+        '''Closes all blocks.'''
+        self.retired += self.blocks.values()
+        self.blocks = {}
+        self.release()
+
+
+
+class SharedFrameCapture:
+    '''
+    The SharedFrameCapture stands in for the CaptureZEDFeatures in a worker process, reading the current frame from shared memory.
+    '''
+    def __init__(self, image:np.ndarray, records:np.ndarray, timestamp:int, frameNumber:int, depth:np.ndarray=None, pointCloud:np.ndarray=None):
+        self.image = FS.ImageFrame(image)
+        self.depth = depth
+        self.pointCloud = pointCloud
+        self.objects = FS.unpackObjects(records, timestamp)
+        self.timestamp = timestamp
+        self.frameNumber = frameNumber
+
+    def getObjects(self):
+        '''Returns the objects of the current frame.'''
+        return self.objects
+
+    def getObjectArray(self):
+        '''Returns the objects of the current frame, unpacked from shared memory on first use.'''
+        return self.objects.object_list
+
+    def getObjectRecords(self):
+        '''Returns the object records of the current frame, read directly from shared memory.'''
+        return self.objects.records
+
+    def getImage(self):
+        '''Returns the image of the current frame.'''
+        return self.image
+
+    def getImageData(self):
+        '''Returns the image data of the current frame (read-only).'''
+        return self.image.get_data()
+
+    def getDepthData(self):
+        '''Returns the depth map of the current frame (read-only), None if it was not retrieved or no feature in the workers needs depth.'''
+        return self.depth
+
+    def getPointCloudData(self):
+        '''Returns the point cloud of the current frame (read-only), None if it was not retrieved or no feature in the workers needs it.'''
+        return self.pointCloud
+
+    def getTimestamp(self):
+        '''Returns the capture time of the current frame, in nanoseconds.'''
+        return self.timestamp
+
+    def getFrameNumber(self):
+        '''Returns the number of the current frame.'''
+        return self.frameNumber
+
+
+
+def mapShared(kind:str, shared, attached:AttachedBlocks):
+    '''Returns the read-only array of a kind of buffer, shared as (block name, shape, dtype) by FeatureWorkerPool.shareArray(), None if nothing was shared.'''
+    if shared is None:
+        return None
+    name, shape, dtype = shared
+    # frombuffer keeps the block exported while the array lives, so the block cannot be closed under it
+    array = np.frombuffer(attached.attach(kind, name).buf, dtype, int(np.prod(shape))).reshape(shape)
+    array.flags.writeable = False
+    return array
+
+
+def workerLoop(connection, features:List['F.Feature']):
+    '''Runs in a worker process: computes the requested feature for each frame announced over the connection, until it receives None.'''
+    attached = AttachedBlocks()
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        index, frame, dependencyValues = message
+        arrays, names, timestamp, frameNumber = frame
+        try:
+            image, depth, pointCloud, records = [mapShared(kind, arrays[kind], attached) for kind in ["image", "depth", "pointCloud", "objects"]]
+            FS.objectLabels.extend(names[0])
+            FS.trackingStates.extend(names[1])
+
+            feature = features[index]
+            for featureNeeded in feature.dependentOn:
+                featureNeeded.value = dependencyValues[featureNeeded.label]
+            feature.computeValue(SharedFrameCapture(image, records, timestamp, frameNumber, depth, pointCloud))
+            connection.send((True, feature.getValue()))
+        except Exception as error:
+            connection.send((False, error))
+        # Drop the arrays of this frame, so a block replaced for the next frame can be closed
+        image = depth = pointCloud = records = None
+    attached.close()
+
+
+
+class FeatureWorkerPool:
+    '''
+    The FeatureWorkerPool runs features in worker processes. Each feature is assigned to one of the processes, where a copy of it (without actors) keeps its state between frames.
+
+    For every frame shareFrame() copies the image, the objects and (when a feature in the workers needs them) the depth map and point cloud into shared memory once, after which compute() asks the worker of a feature to compute it and returns the value.
+
+    Args:
+        features (List[Feature]): the features to compute in worker processes.
+        processes (int): number of worker processes.
+    '''
+    def __init__(self, features:List['F.Feature'], processes:int=1):
+        self.features = features
+        processes = max(1, min(processes, len(features)))
+        self.assignment = {}
+        assigned = [[] for i in range(processes)]
+        for i, feature in enumerate(features):
+            worker = i % processes
+            self.assignment[feature] = (worker, len(assigned[worker]))
+            assigned[worker].append(detach(feature))
+
+        self.connections = []
+        self.locks = []
+        self.processes = []
+        for worker in range(processes):
+            connection, workerConnection = mp.Pipe()
+            process = mp.Process(target=workerLoop, args=(workerConnection, assigned[worker]), name="FeatureWorker%d" % worker, daemon=True)
+            process.start()
+            self.connections.append(connection)
+            self.locks.append(threading.Lock())
+            self.processes.append(process)
+
+        self.needsDepth = any(feature.needsDepth for feature in features)
+        self.needsPointCloud = any(feature.needsPointCloud for feature in features)
+        self.blocks = {} # kind of array -> shared memory block
+        self.frame = None
+
+    def runs(self, feature:'F.Feature'):
+        '''Returns whether the feature is computed by a worker process.'''
+        return feature in self.assignment
+
+    def shareFrame(self, capture:'ZED.CaptureZEDFeatures'):
+        '''Copies the image, objects, and if needed the depth map and point cloud of the current frame into shared memory.'''
+        # The object records go with the label and tracking state names, in case new names were numbered since the workers started
+        records = capture.getObjectRecords()
+        arrays = {"image": self.shareArray("image", capture.getImageData()),
+                  "depth": self.shareArray("depth", capture.getDepthData()) if self.needsDepth else None,
+                  "pointCloud": self.shareArray("pointCloud", capture.getPointCloudData()) if self.needsPointCloud else None,
+                  "objects": self.shareArray("objects", records, 2 * len(records) * FS.objectDtype.itemsize)}
+        self.frame = (arrays, (tuple(FS.objectLabels.names), tuple(FS.trackingStates.names)), capture.getTimestamp(), capture.getFrameNumber())
+
+    def shareArray(self, kind:str, array:np.ndarray, reserve:int=0):
+        '''Copies an array into the shared memory block for its kind, (re)allocating the block (with room for reserve bytes) when it is too small. Returns (block name, shape, dtype) for the workers, None if array is None.'''
+        if array is None:
+            return None
+        block = self.blocks.get(kind)
+        if block is None or block.size < max(array.nbytes, 1):
+            block = self.blocks[kind] = self.replace(block, max(array.nbytes, reserve, 4096))
+        np.copyto(np.ndarray(array.shape, array.dtype, buffer=block.buf), array)
+        return block.name, array.shape, array.dtype
+
+    def replace(self, block, size:int):
+        '''Returns a new shared memory block of the given size, releasing the old block.'''
+        if block is not None:
+            block.close()
+            block.unlink()
+        return shared_memory.SharedMemory(create=True, size=size)
+
+    def compute(self, feature:'F.Feature'):
+        '''Computes the feature for the shared frame in its worker process and returns its value. Raises the exception of the feature, if any.'''
+        worker, index = self.assignment[feature]
+        dependencyValues = {featureNeeded.label: featureNeeded.getValue() for featureNeeded in feature.dependentOn}
+        with self.locks[worker]:
+            self.connections[worker].send((index, self.frame, dependencyValues))
+            ok, value = self.connections[worker].recv()
+        if not ok:
+            raise value
+        return value
+
+    def close(self):
+        '''Stops the worker processes and releases the shared memory.'''
+        for worker, connection in enumerate(self.connections):
+            with self.locks[worker]:
+                connection.send(None)
+        for process in self.processes:
+            process.join()
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks = {}
@@ -5,11 +5,30 @@ Created on Mon Aug 24 11:44:08 2020
 @author: jhvroon
 """
 
-import math
+import numpy as np
 
-from typing import List
-import ZEDFeatureExtractor as ZED
-import Actors as A
+import FrameSources as FS
+import TrackStore as TS
+import Occupancy as O
+import Zones as Z
+
+from typing import List, TYPE_CHECKING
+if TYPE_CHECKING:
+    import ZEDFeatureExtractor as ZED
+    import Actors as A
+
+
+# Inputs a feature can declare, see Feature.inputs
+frameInput = "frame"     # anything in the frame (image, depth, timestamp), changes every frame
+objectsInput = "objects" # the ids, labels, positions and bounding boxes of the detected objects
+
+
+
+def selectLabels(records:np.ndarray, labels:List[str]):
+    '''Returns the object records with one of the given labels, all records if labels is None.'''
+    if labels is None:
+        return records
+    return records[np.isin(records["label"], [FS.objectLabels.code(label) for label in labels])]
 
 
 
@@ -25,16 +44,33 @@ class Feature:
     Attributes:
         value: last computed value for this feature.
         needsTrackPeople: whether or not this feature depends on tracking people with the ZED2.
+        needsDepth: whether this feature uses the depth map (capture.getDepthData()).
+        needsPointCloud: whether this feature uses the point cloud (capture.getPointCloudData()).
+        runInWorker: whether the FeatureExtractor should compute this feature in a worker process instead of in-process. Set it for heavy features; the feature (without its actors) is then copied to the worker once, and its value is sent back every frame.
+        inputs: what the feature reads from the capture (frameInput and/or objectsInput). The feature is only recomputed when one of its inputs or the value of a feature it depends on changed since it was last computed. Defaults to frameInput, i.e. every frame.
+        lazy: whether the feature is only computed on frames where an actor requests its value (see Actor.requestedValues) or another computed feature depends on it. Only set it for features without state that has to be updated every frame.
+        version: number of times the value has been computed.
+        rate: maximum number of times per second (capture time) the feature is computed, None to compute it on every frame. In between, its actors and dependent features keep the most recent value.
+        stride: compute the feature at most every stride-th frame.
     '''
-    def __init__(self, label, actors:List[A.Actor], dependentOn:List):
+    def __init__(self, label, actors:List['A.Actor'], dependentOn:List):
         self.label = label
         self.actors = actors
         self.dependentOn = dependentOn
-        self.value
+        self.value = 0
         
         self.needsTrackPeople = False
+        self.needsDepth = False
+        self.needsPointCloud = False
+        self.runInWorker = False
+        self.inputs = [frameInput]
+        self.lazy = False
+        self.version = 0
+        self.inputsKey = None
+        self.rate = None
+        self.stride = 1
         
-    def addActor(self,actor:A.Actor):
+    def addActor(self,actor:'A.Actor'):
         '''Actors can be added during construction or later on.'''
         self.actors.append(actor)
         
@@ -42,13 +78,31 @@ class Feature:
         '''Return the last computed value for this Feature.'''
         return self.value
     
-    def compute(self, capture:ZED.CaptureZEDFeatures):
-        '''Computes the value for each new frame and updates the feature's actors accordingly.'''
+    def compute(self, capture:'ZED.CaptureZEDFeatures'):
+        '''Computes the value for each new frame and updates the feature's actors accordingly. Does nothing if the inputs did not change since the value was last computed.'''
+        inputsKey = self.inputKey(capture)
+        if inputsKey == self.inputsKey:
+            return
         self.computeValue(capture)
+        self.computed(inputsKey)
+        self.updateActors()
+    
+    def inputKey(self, capture:'ZED.CaptureZEDFeatures'):
+        '''Returns a key that changes whenever the inputs of the feature or the values of the features it depends on change.'''
+        return (tuple(capture.getInputKey(input) for input in self.inputs),
+                tuple(featureNeeded.version for featureNeeded in self.dependentOn))
+    
+    def computed(self, inputsKey):
+        '''Marks the value as computed from the inputs with the given key.'''
+        self.inputsKey = inputsKey
+        self.version += 1
+    
+    def updateActors(self):
+        '''Passes the last computed value to the feature's actors.'''
         for actor in self.actors:
             actor.updateValue(self.label, self.getValue())
             
-    def computeValue(self, capture:ZED.CaptureZEDFeatures):
+    def computeValue(self, capture:'ZED.CaptureZEDFeatures'):
         '''Dummy-method. Should be implemented to update with each new frame.''' 
         pass  #TODO implement me in each subclass implementing Feature
     
@@ -61,29 +115,393 @@ naiveDistanceLabel = "NaiveDistance"
 class NaiveDistance(Feature):
     '''
     The NaiveDistance is a Feature that lazily computes distances between each detected person and the previous detected person (first person compared to 0,0,0).
+    The value is an ndarray with one distance per detected object. It is only recomputed when the objects change, and only on frames where an actor requests it.
     '''
     dependentOn = []
     
     def __init__(self, actors):
-        super.__init__(naiveDistanceLabel,actors,NaiveDistance.dependentOn)
+        super().__init__(naiveDistanceLabel,actors,NaiveDistance.dependentOn)
         self.actors = actors
         self.needsTrackPeople = True
+        self.inputs = [objectsInput]
+        self.lazy = True
         
-    def computeValue(self, capture:ZED.CaptureZEDFeatures):
+    def computeValue(self, capture:'ZED.CaptureZEDFeatures'):
         '''Computes the distances between each detected person and the previous detected person (first person compared to 0,0,0).'''
-        prePosition = [0,0,0]
-        obj_array = capture.getObjectArray()
-        self.value = []
+        self.value = NaiveDistance.computeDistances(capture.getObjectRecords()["position"])
+    
+    @staticmethod
+    def computeDistances(positions:np.ndarray):
+        '''Returns the distances between each position in an (N,3) array and the previous position (first position compared to 0,0,0).'''
+        return np.linalg.norm(np.diff(positions, axis=0, prepend=np.zeros((1,3), positions.dtype)), axis=1)
+    
+    @staticmethod
+    def computeBatch(positions:np.ndarray, counts:np.ndarray=None):
+        '''
+        Computes the NaiveDistances for a stack of frames at once, e.g. when replaying a recording offline.
+        
+        Args:
+            positions (ndarray): (frames, N, 3) positions, frames with fewer than N objects are padded at the end.
+            counts (ndarray): number of objects in each frame, None if all frames have N objects.
+            
+        Returns:
+            (frames, N) ndarray of distances, NaN for the padding.
+        '''
+        distances = np.linalg.norm(np.diff(positions, axis=1, prepend=np.zeros((positions.shape[0],1,3), positions.dtype)), axis=2)
+        if counts is not None:
+            distances[np.arange(positions.shape[1])[None,:] >= np.asarray(counts)[:,None]] = np.nan
+        return distances
+        
+
+
+# =============================================================================
+# Proximity
+# =============================================================================
+class SpatialGrid:
+    '''
+    The SpatialGrid is a uniform grid over 3D positions, used to find positions that are close to each other without comparing all pairs.
+    
+    Args:
+        cellSize: size of the (cubic) grid cells in meters. Queries are cheapest for radii up to the cell size.
+    '''
+    def __init__(self, cellSize:float):
+        self.cellSize = cellSize
+        self.positions = np.empty((0,3), np.float32)
+        self.cells = {}
+    
+    def build(self, positions:np.ndarray):
+        '''Puts the (N,3) positions in the grid, replacing the previous positions.'''
+        self.positions = positions
+        self.cells = {}
+        cells = np.floor(positions / self.cellSize).astype(np.int64).tolist()
+        for i in range(len(cells)):
+            self.cells.setdefault(tuple(cells[i]), []).append(i)
+    
+    def offsets(self, radius:float, half:bool):
+        '''Returns the offsets of the cells that can hold positions within radius of a cell, only one of each opposite pair if half.'''
+        reach = int(np.ceil(radius / self.cellSize))
+        offsets = []
+        for dx in range(-reach, reach+1):
+            for dy in range(-reach, reach+1):
+                for dz in range(-reach, reach+1):
+                    if not half or (dx,dy,dz) > (0,0,0):
+                        offsets.append((dx,dy,dz))
+        return offsets
+    
+    def pairsWithin(self, radius:float):
+        '''Returns the index arrays i, j (with i < j) and the distances of all pairs of positions closer than radius.'''
+        first, second = [], []
+        offsets = self.offsets(radius, True)
+        for cell, members in self.cells.items():
+            # 1. Pairs within the cell
+            for a in range(len(members)):
+                for b in range(a+1, len(members)):
+                    first.append(members[a])
+                    second.append(members[b])
+            # 2. Pairs with neighboring cells, each pair of cells is visited once
+            for dx, dy, dz in offsets:
+                others = self.cells.get((cell[0]+dx, cell[1]+dy, cell[2]+dz))
+                if others is not None:
+                    for a in members:
+                        for b in others:
+                            first.append(min(a,b))
+                            second.append(max(a,b))
+        
+        first = np.array(first, np.intp)
+        second = np.array(second, np.intp)
+        distances = np.linalg.norm(self.positions[first] - self.positions[second], axis=1) if len(first) > 0 else np.empty(0, np.float32)
+        close = distances < radius
+        return first[close], second[close], distances[close]
+    
+    def neighborsWithin(self, point, radius:float):
+        '''Returns the indices and distances of all positions closer than radius to the given point.'''
+        cell = np.floor(np.asarray(point) / self.cellSize).astype(np.int64).tolist()
+        candidates = []
+        for dx, dy, dz in self.offsets(radius, False):
+            candidates.extend(self.cells.get((cell[0]+dx, cell[1]+dy, cell[2]+dz), []))
+        candidates = np.array(candidates, np.intp)
+        distances = np.linalg.norm(self.positions[candidates] - np.asarray(point, self.positions.dtype), axis=1) if len(candidates) > 0 else np.empty(0, np.float32)
+        close = distances < radius
+        return candidates[close], distances[close]
+
+
+
+proximityLabel = "Proximity"
+proximityPairDtype = np.dtype([("idA", np.int32), ("idB", np.int32), ("distance", np.float32)])
+class Proximity(Feature):
+    '''
+    The Proximity is a Feature that finds all pairs of tracked people that are closer to each other than a threshold, e.g. for social distancing checks.
+    The value is an ndarray (with dtype proximityPairDtype) holding the ids of both people and their distance, for each pair closer than the threshold.
+    
+    Args:
+        actors: ...that should act based on the values from this Feature.
+        threshold: distance in meters below which a pair of people is reported.
+        labels: only objects with these labels are considered, None to consider all objects.
+    '''
+    dependentOn = []
+    
+    def __init__(self, actors, threshold:float=1.5, labels:List[str]=("Person",)):
+        super().__init__(proximityLabel,actors,Proximity.dependentOn)
+        self.needsTrackPeople = True
+        self.inputs = [objectsInput]
+        self.threshold = threshold
+        self.labels = labels
+        self.grid = SpatialGrid(threshold)
+        self.ids = np.empty(0, np.int32)
+        self.value = np.empty(0, proximityPairDtype)
+        
+    def computeValue(self, capture:'ZED.CaptureZEDFeatures'):
+        '''Finds the pairs of people closer than the threshold.'''
+        records = selectLabels(capture.getObjectRecords(), self.labels)
+        self.ids = records["id"].copy()
+        self.grid.build(records["position"])
+        
+        first, second, distances = self.grid.pairsWithin(self.threshold)
+        self.value = np.empty(len(first), proximityPairDtype)
+        self.value["idA"] = self.ids[first]
+        self.value["idB"] = self.ids[second]
+        self.value["distance"] = distances
+    
+    def neighbors(self, id:int, radius:float=None):
+        '''Returns the ids and distances of the people within radius (default: the threshold) of the person with the given id in the last frame.'''
+        radius = radius if radius is not None else self.threshold
+        index = np.flatnonzero(self.ids == id)
+        if len(index) == 0:
+            return np.empty(0, np.int32), np.empty(0, np.float32)
+        indices, distances = self.grid.neighborsWithin(self.grid.positions[index[0]], radius)
+        others = indices != index[0]
+        return self.ids[indices[others]], distances[others]
+    
+    def distanceMatrix(self):
+        '''Returns the (N,N) matrix of distances between all people in the last frame, in the order of their records in getObjectRecords().'''
+        positions = self.grid.positions
+        return np.linalg.norm(positions[:,None,:] - positions[None,:,:], axis=2)
+
+
+
+# =============================================================================
+# ObjectDepth
+# =============================================================================
+objectDepthLabel = "ObjectDepth"
+class ObjectDepth(Feature):
+    '''
+    The ObjectDepth is a Feature that measures the distance to each detected object as the median of the depth map over (the center part of) its bounding box, which is robust against background pixels and holes in the depth map.
+    Only a grid of at most samples x samples pixels per box is read, so the cost does not depend on the size of the image or of the boxes.
+    The value is an ndarray with one depth (in meters) per detected object, NaN where the box holds no valid depth.
+    
+    Args:
+        actors: ...that should act based on the values from this Feature.
+        samples: maximum number of pixels sampled along each side of a bounding box.
+        margin: fraction of the width and height of a bounding box that is left out on each side.
+    '''
+    dependentOn = []
+    
+    def __init__(self, actors, samples:int=16, margin:float=0.2):
+        super().__init__(objectDepthLabel,actors,ObjectDepth.dependentOn)
+        self.needsTrackPeople = True
+        self.needsDepth = True
+        self.samples = samples
+        self.margin = margin
+        self.value = np.empty(0, np.float32)
+        
+    def computeValue(self, capture:'ZED.CaptureZEDFeatures'):
+        '''Takes the median depth over the bounding box of each object.'''
+        bounding_boxes = capture.getObjectRecords()["bounding_box_2d"]
+        depth = capture.getDepthData()
+        self.value = np.full(len(bounding_boxes), np.nan, np.float32)
+        if depth is None:
+            return
+        
+        # The depth map can have a lower resolution than the image the boxes are in
+        image = capture.getImageData()
+        scale = np.array([depth.shape[1] / image.shape[1], depth.shape[0] / image.shape[0]], np.float32)
+        topLeft, bottomRight = bounding_boxes[:,0] * scale, bounding_boxes[:,2] * scale
+        margin = (bottomRight - topLeft) * self.margin
+        topLeft = np.maximum(topLeft + margin, 0).astype(np.int64).tolist()
+        bottomRight = np.minimum(bottomRight - margin, [depth.shape[1], depth.shape[0]]).astype(np.int64).tolist()
+        for i in range(len(bounding_boxes)):
+            (left, top), (right, bottom) = topLeft[i], bottomRight[i]
+            if right <= left or bottom <= top:
+                continue
             
-        for i in range(len(obj_array)) :
-            obj_data = obj_array[i]
-            obj_position = obj_data.position
-
-            # Calculating distance 
-            distance = math.sqrt((obj_position[0]-prePosition[0])*(obj_position[0]-prePosition[0]) + 
-                               (obj_position[1]-prePosition[1])*(obj_position[1]-prePosition[1]) +
-                               (obj_position[2]-prePosition[2])*(obj_position[2]-prePosition[2]))
-            self.value.append(distance)
-
-            prePosition = obj_position
-        
\ No newline at end of file
+            roi = depth[top:bottom:max(1, (bottom - top) // self.samples), left:right:max(1, (right - left) // self.samples)]
+            valid = roi[np.isfinite(roi) & (roi > 0)]
+            if len(valid) > 0:
+                self.value[i] = np.median(valid)
+
+
+
+# =============================================================================
+# TrackHistory
+# =============================================================================
+trackHistoryLabel = "TrackHistory"
+class TrackHistory(Feature):
+    '''
+    The TrackHistory is a Feature that keeps the recent positions, timestamps and bounding boxes of every tracked object id in a TrackStore.
+    The value is the TrackStore itself, so features that depend on the TrackHistory can query the history (and velocities) of each track.
+    
+    Args:
+        actors: ...that should act based on the values from this Feature.
+        historyLength: number of observations kept per track.
+        maxAge: seconds after which a track that has not been seen is forgotten.
+    '''
+    dependentOn = []
+    
+    def __init__(self, actors, historyLength:int=60, maxAge:float=2.0):
+        super().__init__(trackHistoryLabel,actors,TrackHistory.dependentOn)
+        self.needsTrackPeople = True
+        self.value = TS.TrackStore(historyLength, maxAge)
+        
+    def computeValue(self, capture:'ZED.CaptureZEDFeatures'):
+        '''Adds the objects of the new frame to their tracks.'''
+        self.value.update(capture.getTimestamp(), capture.getObjectRecords())
+
+
+
+# =============================================================================
+# FloorOccupancy
+# =============================================================================
+floorOccupancyLabel = "FloorOccupancy"
+class FloorOccupancy(Feature):
+    '''
+    The FloorOccupancy is a Feature that accumulates where people spend their time on the floor, in an OccupancyMap (a 2D grid over the floor, in the floor-referenced coordinates of the positional tracking).
+    Each frame only adds the positions of the people to their cells, so the cost does not depend on the size of the grid. The value is the OccupancyMap itself; read the current heatmap with getValue().heatmap().
+    
+    Args:
+        actors: ...that should act based on the values from this Feature.
+        cellSize: size of the grid cells in meters.
+        extent: (minimum x, maximum x, minimum z, maximum z) of the mapped floor area in meters.
+        halfLife: seconds after which time spent in a cell counts for half, None for no decay.
+        window: seconds after which time spent in a cell no longer counts (instead of halfLife), None for no window.
+        labels: only objects with these labels are mapped, None to map all objects.
+    '''
+    dependentOn = []
+    
+    def __init__(self, actors, cellSize:float=0.25, extent=(-4.0,4.0,0.0,8.0), halfLife:float=60.0, window:float=None, labels:List[str]=("Person",)):
+        super().__init__(floorOccupancyLabel,actors,FloorOccupancy.dependentOn)
+        self.needsTrackPeople = True
+        self.labels = labels
+        self.value = O.OccupancyMap(cellSize, extent, halfLife=halfLife if window is None else None, window=window)
+        
+    def computeValue(self, capture:'ZED.CaptureZEDFeatures'):
+        '''Adds the positions of the people in the new frame to the map.'''
+        records = selectLabels(capture.getObjectRecords(), self.labels)
+        self.value.add(capture.getTimestamp(), records["position"])
+
+
+
+
+# =============================================================================
+# ZoneCounts and LineCrossings
+# =============================================================================
+zoneCountsLabel = "ZoneCounts"
+class ZoneCounts(Feature):
+    '''
+    The ZoneCounts is a Feature that counts the people in each of a set of zones on the floor.
+    All positions are tested against all zones at once, against a raster of the zones that is computed once (see Zones.ZoneLayout).
+    The value is an ndarray with the number of people in each zone, in the order of the zones.
+    
+    Args:
+        actors: ...that should act based on the values from this Feature.
+        zones: the zones (Zones.Zone) to count the people in.
+        resolution: size of the raster cells in meters, None to test the positions against the polygons exactly.
+        labels: only objects with these labels are counted, None to count all objects.
+        axes: the two position axes that span the floor, (0,2) for x and z.
+        
+    Attributes:
+        ids: the ids of the counted people in the last frame.
+        inside: (people, zones) boolean array holding which zones each of them is in.
+    '''
+    dependentOn = []
+    
+    def __init__(self, actors, zones:List[Z.Zone], resolution:float=0.05, labels:List[str]=("Person",), axes=(0,2)):
+        super().__init__(zoneCountsLabel,actors,ZoneCounts.dependentOn)
+        self.needsTrackPeople = True
+        self.inputs = [objectsInput]
+        self.layout = Z.ZoneLayout(zones, resolution)
+        self.labels = labels
+        self.axes = list(axes)
+        self.ids = np.empty(0, np.int32)
+        self.inside = np.zeros((0, len(zones)), bool)
+        self.value = np.zeros(len(zones), np.int32)
+        
+    def computeValue(self, capture:'ZED.CaptureZEDFeatures'):
+        '''Counts the people in each zone.'''
+        records = selectLabels(capture.getObjectRecords(), self.labels)
+        self.ids = records["id"]
+        self.inside = self.layout.contains(records["position"][:,self.axes].astype(np.float64))
+        self.value = np.count_nonzero(self.inside, axis=0).astype(np.int32)
+
+
+
+lineCrossingsLabel = "LineCrossings"
+crossingDtype = np.dtype([("timestamp", np.int64), ("id", np.int32), ("tripwire", np.int16), ("direction", np.int8)])
+class LineCrossings(Feature):
+    '''
+    The LineCrossings is a Feature that detects people crossing tripwires on the floor, from the movement of each id since its previous position.
+    The value is an ndarray (with dtype crossingDtype) with a crossing event for each person that crossed a tripwire since the previous frame: the timestamp, the id, the index of the tripwire and the direction (Tripwire.entering or Tripwire.leaving).
+    Actors that are not updated on every frame (see Actor.rate) only see the events of the frames they are updated on, they can use the totals instead.
+    
+    Args:
+        actors: ...that should act based on the values from this Feature.
+        tripwires: the tripwires (Zones.Tripwire) to watch.
+        maxAge: seconds after which the previous position of an id that is no longer seen is forgotten.
+        labels: only objects with these labels are watched, None to watch all objects.
+        axes: the two position axes that span the floor, (0,2) for x and z.
+        
+    Attributes:
+        totals: (tripwires, 2) array with the total number of people that entered and left through each tripwire.
+    '''
+    dependentOn = []
+    
+    def __init__(self, actors, tripwires:List[Z.Tripwire], maxAge:float=1.0, labels:List[str]=("Person",), axes=(0,2)):
+        super().__init__(lineCrossingsLabel,actors,LineCrossings.dependentOn)
+        self.needsTrackPeople = True
+        self.tripwires = tripwires
+        self.maxAge = maxAge
+        self.labels = labels
+        self.axes = list(axes)
+        self.totals = np.zeros((len(tripwires), 2), np.int64)
+        # The previous position of each id, sorted by id
+        self.lastIds = np.empty(0, np.int64)
+        self.lastPositions = np.empty((0,2), np.float64)
+        self.lastSeen = np.empty(0, np.int64)
+        self.value = np.empty(0, crossingDtype)
+        
+    def computeValue(self, capture:'ZED.CaptureZEDFeatures'):
+        '''Detects the crossings since the previous positions, and remembers the new positions.'''
+        timestamp = capture.getTimestamp()
+        records = selectLabels(capture.getObjectRecords(), self.labels)
+        ids = records["id"].astype(np.int64)
+        positions = records["position"][:,self.axes].astype(np.float64)
+        
+        # 1. Find the previous position of each id
+        index = np.minimum(np.searchsorted(self.lastIds, ids), max(len(self.lastIds) - 1, 0))
+        known = (self.lastIds[index] == ids) if len(self.lastIds) > 0 else np.zeros(len(ids), bool)
+        before, after = self.lastPositions[index[known]], positions[known]
+        
+        # 2. Test the movements against all tripwires
+        events = []
+        for t, tripwire in enumerate(self.tripwires):
+            directions = tripwire.crossings(before, after)
+            crossed = np.flatnonzero(directions)
+            if len(crossed) > 0:
+                event = np.empty(len(crossed), crossingDtype)
+                event["timestamp"] = timestamp
+                event["id"] = ids[known][crossed]
+                event["tripwire"] = t
+                event["direction"] = directions[crossed]
+                events.append(event)
+                self.totals[t,0] += np.count_nonzero(directions == Z.Tripwire.entering)
+                self.totals[t,1] += np.count_nonzero(directions == Z.Tripwire.leaving)
+        self.value = np.concatenate(events) if events else np.empty(0, crossingDtype)
+        
+        # 3. Remember the new positions, and the previous positions of ids not seen for less than maxAge
+        keep = np.ones(len(self.lastIds), bool)
+        keep[index[known]] = False
+        keep &= self.lastSeen >= timestamp - int(self.maxAge * 1e9)
+        ids = np.concatenate([self.lastIds[keep], ids])
+        order = np.argsort(ids, kind="stable")
+        self.lastIds = ids[order]
+        self.lastPositions = np.concatenate([self.lastPositions[keep], positions])[order]
+        self.lastSeen = np.concatenate([self.lastSeen[keep], np.full(len(positions), timestamp, np.int64)])[order]
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 10:05:12 2026
+
+The FrameRing sits between the grab thread and the thread that runs the features and actors,
+so a slow feature or actor does not slow down grabbing. The Frame gives the features and actors
+read-only access to the buffers of a frame, with copies taken from a BufferPool.
+"""
+
+import threading
+from collections import deque
+
+import numpy as np
+
+from typing import List
+
+
+# Policies for when the grab thread has a new frame and all slots are full
+dropOldestPolicy = "drop-oldest"      # overwrite the oldest frame that has not been processed yet
+blockPolicy = "block"                 # wait for the features and actors to finish a frame before grabbing the next
+skipToLatestPolicy = "skip-to-latest" # like drop-oldest, but the features and actors also skip all frames but the newest
+bufferPolicies = [dropOldestPolicy, blockPolicy, skipToLatestPolicy]
+
+
+
+class FrameSlot:
+    '''
+    A FrameSlot holds one grabbed frame. Slots are allocated once and reused for every frame.
+
+    Args:
+        image: image container from FrameSource.createImage(), filled by FrameSource.retrieveImage().
+        objects: objects container from FrameSource.createObjects(), filled by FrameSource.retrieveObjects().
+        depth: depth container from FrameSource.createDepth(), None if depth is not retrieved.
+        pointCloud: point cloud container from FrameSource.createPointCloud(), None if the point cloud is not retrieved.
+
+    Attributes:
+        timestamp: capture time of the frame in nanoseconds.
+        frameNumber: number of the frame since the capture was started.
+        hasDepth: whether depth (and the point cloud) was retrieved for this frame.
+        predicted: the objects predicted for this frame when detection was skipped, None if they were retrieved into objects.
+        records: the objects of the frame as object records (see FrameSources.packObjects).
+    '''
+    def __init__(self, image, objects, depth=None, pointCloud=None):
+        self.image = image
+        self.objects = objects
+        self.depth = depth
+        self.pointCloud = pointCloud
+        self.hasDepth = False
+        self.predicted = None
+        self.records = None
+        self.timestamp = 0
+        self.frameNumber = 0
+
+
+
+class FrameRing:
+    '''
+    The FrameRing is a bounded buffer of preallocated FrameSlots between a single producer (the grab thread) and a single consumer (the features and actors).
+
+    The producer takes a free slot with acquireWrite(), fills it and hands it over with commitWrite(). The consumer takes the next filled slot with acquireRead() and gives it back with releaseRead() once all features and actors are done with it.
+
+    Args:
+        slots (List[FrameSlot]): the preallocated slots, at least two (one to read while the other is written).
+        policy (str): what to do when the producer has a new frame and no slot is free, one of bufferPolicies.
+
+    Attributes:
+        grabbedFrames: number of frames committed by the producer.
+        processedFrames: number of frames released by the consumer.
+        droppedFrames: number of frames that were overwritten or skipped before being processed.
+    '''
+    def __init__(self, slots:List[FrameSlot], policy:str=dropOldestPolicy):
+        if len(slots) < 2:
+            raise ValueError("A FrameRing needs at least two slots.")
+        if policy not in bufferPolicies:
+            raise ValueError("Unknown buffer policy: " + str(policy))
+        self.slots = slots
+        self.policy = policy
+
+        self.free = deque(slots, maxlen=len(slots))
+        self.ready = deque(maxlen=len(slots))
+        self.condition = threading.Condition()
+        self.closed = False
+
+        self.grabbedFrames = 0
+        self.processedFrames = 0
+        self.droppedFrames = 0
+
+    def acquireWrite(self):
+        '''Returns a free slot to write the next frame into. Depending on the policy drops the oldest unprocessed frame or waits if no slot is free. Returns None once the ring is closed.'''
+        with self.condition:
+            while not self.free:
+                if self.closed:
+                    return None
+                if self.policy == blockPolicy or not self.ready:
+                    self.condition.wait()
+                else:
+                    self.free.append(self.ready.popleft())
+                    self.droppedFrames += 1
+            if self.closed:
+                return None
+            return self.free.popleft()
+
+    def commitWrite(self, slot:FrameSlot):
+        '''Hands a filled slot over to the consumer.'''
+        with self.condition:
+            self.ready.append(slot)
+            self.grabbedFrames += 1
+            self.condition.notify_all()
+
+    def abortWrite(self, slot:FrameSlot):
+        '''Gives back a slot that could not be filled (e.g. because grabbing failed).'''
+        with self.condition:
+            self.free.appendleft(slot)
+            self.condition.notify_all()
+
+    def acquireRead(self, timeout:float=None):
+        '''Returns the next frame to process (the newest frame with the skip-to-latest policy). Returns None after the timeout, or once the ring is closed and empty.'''
+        with self.condition:
+            while not self.ready:
+                if self.closed:
+                    return None
+                if not self.condition.wait(timeout):
+                    return None
+            if self.policy == skipToLatestPolicy:
+                while len(self.ready) > 1:
+                    self.free.append(self.ready.popleft())
+                    self.droppedFrames += 1
+            return self.ready.popleft()
+
+    def releaseRead(self, slot:FrameSlot):
+        '''Gives back a processed slot so it can be reused for a new frame.'''
+        with self.condition:
+            self.free.append(slot)
+            self.processedFrames += 1
+            self.condition.notify_all()
+
+    def close(self):
+        '''Closes the ring: wakes up the producer and consumer, no new slots are handed out to the producer.'''
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def getStats(self):
+        '''Returns the frame counters and the number of frames waiting to be processed.'''
+        with self.condition:
+            return {"grabbedFrames": self.grabbedFrames,
+                    "processedFrames": self.processedFrames,
+                    "droppedFrames": self.droppedFrames,
+                    "queuedFrames": len(self.ready)}
+
+
+
+class BufferPool:
+    '''
+    The BufferPool hands out image-sized arrays and takes them back for reuse, so copies of frames do not allocate new memory for every frame.
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.free = {} # (shape, dtype) -> arrays that can be reused
+        self.allocated = 0
+
+    def acquire(self, shape, dtype):
+        '''Returns an array of the given shape and dtype, with undefined contents.'''
+        key = (tuple(shape), np.dtype(dtype))
+        with self.lock:
+            arrays = self.free.get(key)
+            if arrays:
+                return arrays.pop()
+            self.allocated += 1
+        return np.empty(shape, dtype)
+
+    def release(self, array:np.ndarray):
+        '''Gives an array back to the pool. The array should not be used afterwards.'''
+        with self.lock:
+            self.free.setdefault((array.shape, array.dtype), []).append(array)
+
+
+
+class Frame:
+    '''
+    The Frame gives features and actors access to the buffers of the current frame without copying them.
+
+    getImageData(), getDepthData() and getPointCloudData() return read-only views of the buffers the frame was retrieved into, so no feature or actor can change what the others see. Actors that want to draw on the image ask for a copy with getWritableImageData() (returned to the pool when the frame is done) or copyImageData() (theirs to release to the pool when they are done with it).
+
+    Args:
+        pool (BufferPool): pool the copies are taken from.
+
+    Attributes:
+        image: image container of the frame (sl.Mat or ImageFrame).
+        depth: depth container of the frame, None if depth was not retrieved.
+        pointCloud: point cloud container of the frame, None if the point cloud was not retrieved.
+        timestamp: capture time of the frame in nanoseconds.
+        frameNumber: number of the frame since the capture was started.
+    '''
+    def __init__(self, pool:BufferPool):
+        self.pool = pool
+        self.borrowed = []
+        self.set(None, 0, 0)
+
+    def set(self, image, timestamp:int, frameNumber:int, depth=None, pointCloud=None):
+        '''Points the frame at the buffers of a new frame.'''
+        self.image = image
+        self.depth = depth
+        self.pointCloud = pointCloud
+        self.timestamp = timestamp
+        self.frameNumber = frameNumber
+        self.views = {}
+
+    def readOnly(self, name:str, container):
+        '''Returns (and caches for this frame) a read-only view of the data in a container.'''
+        view = self.views.get(name)
+        if view is None and container is not None:
+            view = container.get_data().view()
+            view.flags.writeable = False
+            self.views[name] = view
+        return view
+
+    def getImageData(self):
+        '''Returns a read-only view of the image.'''
+        return self.readOnly("image", self.image)
+
+    def getDepthData(self):
+        '''Returns a read-only view of the depth map, None if depth was not retrieved.'''
+        return self.readOnly("depth", self.depth)
+
+    def getPointCloudData(self):
+        '''Returns a read-only view of the point cloud, None if the point cloud was not retrieved.'''
+        return self.readOnly("pointCloud", self.pointCloud)
+
+    def copyImageData(self):
+        '''Returns a copy of the image from the pool. The caller owns the copy and should give it back with pool.release() when done.'''
+        data = self.getImageData()
+        copy = self.pool.acquire(data.shape, data.dtype)
+        np.copyto(copy, data)
+        return copy
+
+    def getWritableImageData(self):
+        '''Returns a copy of the image that can be drawn on during this frame, it goes back to the pool when the frame is released.'''
+        copy = self.copyImageData()
+        self.borrowed.append(copy)
+        return copy
+
+    def release(self):
+        '''Gives the copies made with getWritableImageData() back to the pool, should be called when all features and actors are done with the frame.'''
+        for copy in self.borrowed:
+            self.pool.release(copy)
+        self.borrowed.clear()
+        self.views = {}
@@ -0,0 +1,719 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 09:12:40 2026
+
+Frame sources deliver frames (an image plus the detected objects) to the CaptureZEDFeatures.
+Next to the live ZED 2 camera there is a replay source (frames recorded to disk with the
+ReplayWriter) and a synthetic source, so the Feature/Actor pipeline can be run without a camera.
+"""
+
+import os
+import glob
+import time
+import threading
+
+import numpy as np
+
+import CaptureProfile as CP
+
+
+# =============================================================================
+# Frame data
+# =============================================================================
+class ImageFrame:
+    '''
+    ImageFrame holds an image for the sources that do not use the ZED SDK. Mirrors the part of sl.Mat that the Features and Actors use.
+
+    Args:
+        data (ndarray): image data, (height, width, 4) BGRA as retrieved from the ZED.
+    '''
+    def __init__(self, data:np.ndarray):
+        self.data = data
+
+    def get_data(self):
+        '''Returns the image data.'''
+        return self.data
+
+    def copyFrom(self, data:np.ndarray):
+        '''Copies the given image data into this frame, only allocating when the size changes.'''
+        if self.data is None or self.data.shape != data.shape:
+            self.data = np.empty_like(data)
+        np.copyto(self.data, data)
+
+    def get_width(self):
+        '''Returns the width of the image in pixels.'''
+        return self.data.shape[1]
+
+    def get_height(self):
+        '''Returns the height of the image in pixels.'''
+        return self.data.shape[0]
+
+
+
+class ObjectData:
+    '''
+    ObjectData holds a single detected object for the sources that do not use the ZED SDK. Mirrors the attributes of sl.ObjectData that the Features and Actors use.
+
+    Attributes:
+        id: tracking id of the object.
+        label: object class, e.g. "Person".
+        confidence: detection confidence (0-100).
+        position (ndarray): 3D position in meters.
+        velocity (ndarray): 3D velocity in meters per second.
+        bounding_box_2d (ndarray): (4,2) corners of the 2D bounding box in pixels, clockwise starting top-left.
+        tracking_state: tracking state of the object, e.g. "OK".
+        predicted: whether the object was predicted from its track instead of detected (see TrackStore.TrackPredictor).
+    '''
+    def __init__(self, id, label, confidence, position, velocity, bounding_box_2d, tracking_state="OK"):
+        self.id = id
+        self.label = label
+        self.confidence = confidence
+        self.position = position
+        self.velocity = velocity
+        self.bounding_box_2d = bounding_box_2d
+        self.tracking_state = tracking_state
+        self.predicted = False
+
+
+
+class Objects:
+    '''
+    Objects holds all objects detected in a frame. Mirrors sl.Objects.
+
+    Attributes:
+        object_list (List[ObjectData]): the detected objects.
+        timestamp: capture time of the frame in nanoseconds.
+        predicted: whether the objects were predicted from their tracks instead of detected.
+        records: the objects as object records (see packObjects), None if they have not been packed yet.
+    '''
+    def __init__(self, object_list, timestamp):
+        self.object_list = object_list
+        self.timestamp = timestamp
+        self.predicted = False
+        self.records = None
+
+
+
+class NameCodes:
+    '''
+    NameCodes numbers names (object labels or tracking states), so they can be stored as small integers in the object records. Names that are not known yet are numbered as they come in.
+
+    Args:
+        names (List[str]): the names known up front, numbered from 0.
+    '''
+    def __init__(self, names):
+        self.names = list(names)
+        self.codes = {name: code for code, name in enumerate(self.names)}
+        self.lock = threading.Lock()
+
+    def code(self, name):
+        '''Returns the number of a name (or of an SDK enum value, by its string), numbering it if it is new.'''
+        name = str(name)
+        code = self.codes.get(name)
+        if code is None:
+            with self.lock:
+                code = self.codes.get(name)
+                if code is None:
+                    code = len(self.names)
+                    self.names.append(name)
+                    self.codes[name] = code
+        return code
+
+    def name(self, code:int):
+        '''Returns the name with the given number.'''
+        return self.names[code]
+
+    def extend(self, names):
+        '''Adds the names that are not known yet, e.g. the names numbered by another process.'''
+        for name in names[len(self.names):]:
+            self.code(name)
+
+
+# The object labels and tracking states of the ZED SDK (sl.OBJECT_CLASS and sl.OBJECT_TRACKING_STATE)
+objectLabels = NameCodes(["Person", "Vehicle", "Bag", "Animal", "Electronics", "Fruit-Vegetable", "Sport"])
+trackingStates = NameCodes(["OFF", "OK", "SEARCHING", "TERMINATE"])
+
+# The object records: all objects of a frame in a single structured array, see packObjects()
+objectDtype = np.dtype([("id", np.int32),
+                        ("label", np.int16),          # number of the label in objectLabels
+                        ("confidence", np.float32),
+                        ("position", np.float32, (3,)),
+                        ("velocity", np.float32, (3,)),
+                        ("bounding_box_2d", np.float32, (4,2)),
+                        ("tracking_state", np.int8),  # number of the tracking state in trackingStates
+                        ("predicted", np.bool_)])
+
+
+def packObjects(objects):
+    '''
+    Returns the objects of a frame as object records: a read-only structured array with dtype objectDtype, one record per object in the order of object_list. Features and actors read the columns of these records (e.g. records["position"]) instead of walking the object list.
+
+    Args:
+        objects: the objects of a frame (sl.Objects or Objects). Predicted Objects come with their records already packed.
+    '''
+    records = getattr(objects, "records", None)
+    if records is not None:
+        return records
+    object_list = objects.object_list
+    records = np.empty(len(object_list), objectDtype)
+    for i in range(len(object_list)):
+        obj_data = object_list[i]
+        records[i] = (obj_data.id, objectLabels.code(obj_data.label), obj_data.confidence, obj_data.position, obj_data.velocity,
+                      obj_data.bounding_box_2d, trackingStates.code(obj_data.tracking_state), getattr(obj_data, "predicted", False))
+    records.flags.writeable = False
+    return records
+
+
+def unpackObjects(records:np.ndarray, timestamp:int):
+    '''Returns object records as Objects, the inverse of packObjects(). The object list is only built when it is first used.'''
+    return PackedObjects(records, timestamp)
+
+
+
+class PackedObjects(Objects):
+    '''
+    PackedObjects holds the objects of a frame as object records (see packObjects), and only builds the object list (of ObjectData) when it is first used.
+
+    Args:
+        records (ndarray): the object records.
+        timestamp: capture time of the frame in nanoseconds.
+    '''
+    def __init__(self, records:np.ndarray, timestamp:int):
+        super().__init__(None, timestamp)
+        self.records = records
+
+    @property
+    def object_list(self):
+        if self.unpacked is None:
+            self.unpacked = []
+            for record in self.records:
+                obj_data = ObjectData(int(record["id"]), objectLabels.name(record["label"]), float(record["confidence"]), record["position"],
+                                      record["velocity"], record["bounding_box_2d"], trackingStates.name(record["tracking_state"]))
+                obj_data.predicted = bool(record["predicted"])
+                self.unpacked.append(obj_data)
+        return self.unpacked
+
+    @object_list.setter
+    def object_list(self, object_list):
+        self.unpacked = object_list
+
+
+
+# =============================================================================
+# FrameSource
+# =============================================================================
+class FrameSource:
+    '''
+    FrameSources deliver the frames that the CaptureZEDFeatures runs its features on.
+
+    A source is opened once, after which grab() is called in a loop; whenever grab() returns True the image, objects and timestamp of the new frame can be retrieved, and the depth map and point cloud if the source measures depth.
+    The image and objects can be retrieved into containers created with createImage() and createObjects(), so a buffer of frames can be allocated once and reused. The same goes for depth maps and point clouds (createDepth() and createPointCloud()).
+
+    Each source implements grab(), retrieveImage(), retrieveObjects() and getTimestamp(), here they raise a NotImplementedError. The other methods have defaults that fit a live source without depth.
+
+    Attributes:
+        trackPeople: whether objects should be retrieved, set when the source is opened.
+    '''
+    def __init__(self):
+        self.trackPeople = False
+
+    def open(self, trackPeople:bool):
+        '''Opens the source. Returns whether the source could be opened.'''
+        self.trackPeople = trackPeople
+        return True
+
+    def grab(self):
+        '''Loads the next frame, returns whether a new frame is available. Implemented by each FrameSource.'''
+        raise NotImplementedError(type(self).__name__ + " does not implement grab()")
+
+    def hasFrames(self):
+        '''Returns whether the source can still deliver frames. Live sources always can, recorded sources end at some point.'''
+        return True
+
+    def isRealTime(self):
+        '''Returns whether the source delivers frames at capture pace whether or not they are taken (like a live camera), so a slow consumer has to drop frames. Sources that wait for their frames to be taken return False.'''
+        return True
+
+    def createImage(self):
+        '''Returns a new, empty image container to retrieve images into.'''
+        return ImageFrame(None)
+
+    def createObjects(self):
+        '''Returns a new, empty objects container to retrieve objects into.'''
+        return Objects([], 0)
+
+    def retrieveImage(self, image=None):
+        '''Returns the image of the last grabbed frame (an object with get_data()), copied into image if given. Implemented by each FrameSource.'''
+        raise NotImplementedError(type(self).__name__ + " does not implement retrieveImage()")
+
+    def retrieveObjects(self, objects=None):
+        '''Returns the objects of the last grabbed frame (an object with object_list), copied into objects if given. Implemented by each FrameSource.'''
+        raise NotImplementedError(type(self).__name__ + " does not implement retrieveObjects()")
+
+    def createDepth(self):
+        '''Returns a new, empty depth map container to retrieve depth maps into.'''
+        return ImageFrame(None)
+
+    def createPointCloud(self):
+        '''Returns a new, empty point cloud container to retrieve point clouds into.'''
+        return ImageFrame(None)
+
+    def retrieveDepth(self, depth=None):
+        '''Returns the depth map of the last grabbed frame ((height, width) distances in meters along the viewing direction, NaN or inf where unknown), copied into depth if given. None if the source does not measure depth.'''
+        return None
+
+    def retrievePointCloud(self, pointCloud=None):
+        '''Returns the point cloud of the last grabbed frame ((height, width, 4) X, Y, Z and color), copied into pointCloud if given. None if the source does not measure depth.'''
+        return None
+
+    def copyImage(self, image, into):
+        '''Returns image, or copies image into the given container and returns that.'''
+        if into is None:
+            return image
+        into.copyFrom(image.get_data())
+        return into
+
+    def copyObjects(self, objects, into):
+        '''Returns objects, or copies objects into the given container and returns that.'''
+        if into is None:
+            return objects
+        into.object_list = objects.object_list
+        into.timestamp = objects.timestamp
+        into.records = getattr(objects, "records", None)
+        return into
+
+    def getTimestamp(self):
+        '''Returns the capture time of the last grabbed frame in nanoseconds. Implemented by each FrameSource.'''
+        raise NotImplementedError(type(self).__name__ + " does not implement getTimestamp()")
+
+    def reconfigure(self, resolution:str, fps:int):
+        '''Switches the source to another resolution (a name from CaptureProfile.resolutionSizes) and fps. Returns whether the source could switch, sources that cannot switch return False.'''
+        return False
+
+    def close(self):
+        '''Closes the source.'''
+        pass
+
+
+
+# =============================================================================
+# ZEDFrameSource
+# =============================================================================
+class ZEDFrameSource(FrameSource):
+    '''
+    The ZEDFrameSource grabs frames from a ZED 2 camera, or from an SVO file recorded with a ZED.
+
+    Args:
+        svoFile (str): if given, the SVO file to play back instead of the live camera.
+        svoRealTime (bool): play the SVO file back at recorded speed instead of as fast as possible.
+        serialNumber (int): if given, open the camera with this serial number (when several cameras are connected).
+        depthResolution (tuple): (width, height) to retrieve depth maps and point clouds at, None for the full image resolution. A lower resolution makes the copy from the GPU cheaper.
+        profile (CaptureProfile): the camera and detection settings, the default CaptureProfile (HD720 at 60 fps) if not given.
+
+    Attributes:
+        zed: the camera object
+        runtime_parameters: parameters for configuring the camera
+        detection_parameters_rt: if we track people, holds parameters for configuring the camera to do so
+        objects: the detected objects
+        image: the recorded image
+    '''
+    def __init__(self, svoFile:str=None, svoRealTime:bool=False, serialNumber:int=None, depthResolution=None, profile:CP.CaptureProfile=None):
+        super().__init__()
+        self.profile = profile if profile is not None else CP.CaptureProfile()
+        self.svoFile = svoFile
+        self.svoRealTime = svoRealTime
+        self.serialNumber = serialNumber
+        self.depthResolution = depthResolution
+
+    def open(self, trackPeople:bool):
+        '''Opens the camera (or SVO file) and enables object detection if we are to track people.'''
+        # The SDK is only imported here, so the other sources can be used on machines without it
+        import pyzed.sl as sl
+        self.sl = sl
+        self.trackPeople = trackPeople
+
+        # 1. Create the ZED camera object:
+        # Create a Camera object
+        self.zed = sl.Camera()
+        # Create a InitParameters object and set configuration parameters (resolution, fps, depth mode) from the profile
+        init_params = self.profile.initParameters(sl)
+        if self.svoFile is not None:
+            init_params.set_from_svo_file(self.svoFile)
+            init_params.svo_real_time_mode = self.svoRealTime
+        elif self.serialNumber is not None:
+            init_params.set_from_serial_number(self.serialNumber)
+        # Open the camera
+        err = self.zed.open(init_params)
+        if err != sl.ERROR_CODE.SUCCESS:
+            return False
+
+        # Sensing mode and depth confidence parameters
+        self.runtime_parameters = self.profile.runtimeParameters(sl)
+
+        # 2. If we are to track people, initialize:
+        if self.trackPeople:
+            # Set initialization parameters
+            obj_param = self.profile.objectDetectionParameters(sl)
+
+            #Configuration for Tracking Object Motion in Runtime using positional tracking
+            if obj_param.enable_tracking:
+                # Enable positional tracking
+                self.zed.enable_positional_tracking(self.profile.positionalTrackingParameters(sl))
+
+            # Set runtime parameters
+            self.detection_parameters_rt = self.profile.detectionRuntimeParameters(sl)
+
+            # Enable object detection with initialization parameters
+            zed_error = self.zed.enable_object_detection(obj_param)
+            if zed_error != sl.ERROR_CODE.SUCCESS :
+                print("enable_object_detection", zed_error)
+                self.zed.close()
+                return False
+
+            self.objects = sl.Objects() # Structure containing all the detected objects
+
+        #Capture images and depth using point_cloud,
+        self.image = sl.Mat()
+        self.depth = sl.Mat()
+        self.pointCloud = sl.Mat()
+        self.measureResolution = sl.Resolution(*self.depthResolution) if self.depthResolution is not None else sl.Resolution(0, 0) # 0x0 is the full resolution
+        self.finished = False
+        return True
+
+    def grab(self):
+        '''Grabs the next frame from the camera.'''
+        err = self.zed.grab(self.runtime_parameters)
+        if err == self.sl.ERROR_CODE.END_OF_SVOFILE_REACHED:
+            self.finished = True
+        return err == self.sl.ERROR_CODE.SUCCESS
+
+    def hasFrames(self):
+        '''Returns False once the end of the SVO file has been reached.'''
+        return not self.finished
+
+    def isRealTime(self):
+        '''Returns False for an SVO file played back as fast as possible, True for the live camera.'''
+        return self.svoFile is None or self.svoRealTime
+
+    def createImage(self):
+        '''Returns a new sl.Mat, allocated by the SDK on the first retrieve.'''
+        return self.sl.Mat()
+
+    def createObjects(self):
+        '''Returns a new sl.Objects.'''
+        return self.sl.Objects()
+
+    def retrieveImage(self, image=None):
+        '''Retrieves the left image of the last grabbed frame.'''
+        image = image if image is not None else self.image
+        self.zed.retrieve_image(image, self.sl.VIEW.LEFT)
+        return image
+
+    def retrieveObjects(self, objects=None):
+        '''Retrieves the objects detected in the last grabbed frame.'''
+        objects = objects if objects is not None else self.objects
+        self.zed.retrieve_objects(objects, self.detection_parameters_rt)
+        return objects
+
+    def createDepth(self):
+        '''Returns a new sl.Mat for depth maps.'''
+        return self.sl.Mat()
+
+    def createPointCloud(self):
+        '''Returns a new sl.Mat for point clouds.'''
+        return self.sl.Mat()
+
+    def retrieveDepth(self, depth=None):
+        '''Retrieves the depth map of the last grabbed frame, at depthResolution.'''
+        depth = depth if depth is not None else self.depth
+        self.zed.retrieve_measure(depth, self.sl.MEASURE.DEPTH, self.sl.MEM.CPU, self.measureResolution)
+        return depth
+
+    def retrievePointCloud(self, pointCloud=None):
+        '''Retrieves the point cloud of the last grabbed frame, at depthResolution.'''
+        pointCloud = pointCloud if pointCloud is not None else self.pointCloud
+        self.zed.retrieve_measure(pointCloud, self.sl.MEASURE.XYZRGBA, self.sl.MEM.CPU, self.measureResolution)
+        return pointCloud
+
+    def getTimestamp(self):
+        '''Returns the time the last grabbed frame was captured, in nanoseconds.'''
+        return self.zed.get_timestamp(self.sl.TIME_REFERENCE.IMAGE).get_nanoseconds()
+
+    def reconfigure(self, resolution:str, fps:int):
+        '''Reopens the camera with another resolution and fps (the SDK only sets these when opening). SVO files keep their recorded mode. If the camera cannot be opened in the new mode, it is reopened with the previous profile and False is returned.'''
+        if self.svoFile is not None:
+            return False
+        previous = self.profile
+        self.zed.close()
+        self.profile = previous.withMode(resolution, fps)
+        if self.open(self.trackPeople):
+            return True
+        self.profile = previous
+        if not self.open(self.trackPeople):
+            print("Unable to reopen the camera at %s and %d fps." % (previous.resolution, previous.fps))
+        return False
+
+    def close(self):
+        '''Closes the camera.'''
+        self.zed.close()
+
+
+
+# =============================================================================
+# Replay
+# =============================================================================
+replayFilePattern = "frame_%06d.npz"
+class ReplayWriter:
+    '''
+    The ReplayWriter records frames to a directory, one .npz file per frame, so they can be played back with the ReplayFrameSource.
+
+    Args:
+        directory (str): directory to write the frames to, created if it does not exist.
+        saveImages (bool): whether to store the images as well. Without images only the objects are replayed (with a black frame).
+    '''
+    def __init__(self, directory:str, saveImages:bool=True):
+        self.directory = directory
+        self.saveImages = saveImages
+        self.frameIndex = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, timestamp:int, image_data, obj_array):
+        '''Writes a single frame.'''
+        n = len(obj_array)
+        ids = np.empty(n, np.int32)
+        labels = np.empty(n, "U16")
+        confidences = np.empty(n, np.float32)
+        positions = np.empty((n,3), np.float32)
+        velocities = np.empty((n,3), np.float32)
+        bboxes = np.empty((n,4,2), np.float32)
+        for i in range(n):
+            obj_data = obj_array[i]
+            ids[i] = obj_data.id
+            labels[i] = str(obj_data.label)
+            confidences[i] = obj_data.confidence
+            positions[i] = obj_data.position
+            velocities[i] = obj_data.velocity
+            bboxes[i] = obj_data.bounding_box_2d
+
+        columns = dict(timestamp=np.int64(timestamp), ids=ids, labels=labels, confidences=confidences,
+                       positions=positions, velocities=velocities, bboxes=bboxes,
+                       shape=np.array(image_data.shape, np.int32))
+        if self.saveImages:
+            columns["image"] = image_data
+        np.savez(os.path.join(self.directory, replayFilePattern % self.frameIndex), **columns)
+        self.frameIndex += 1
+
+
+
+class ReplayFrameSource(FrameSource):
+    '''
+    The ReplayFrameSource plays back frames recorded with the ReplayWriter.
+
+    Args:
+        directory (str): directory the frames were recorded to.
+        realTime (bool): play the frames back at recorded speed instead of as fast as possible.
+        loop (bool): start again at the first frame after the last frame has been played.
+    '''
+    def __init__(self, directory:str, realTime:bool=False, loop:bool=False):
+        super().__init__()
+        self.directory = directory
+        self.realTime = realTime
+        self.loop = loop
+        self.files = sorted(glob.glob(os.path.join(directory, "frame_*.npz")))
+        self.frameIndex = 0
+
+    def open(self, trackPeople:bool):
+        '''Opens the recording, fails when there are no recorded frames.'''
+        self.trackPeople = trackPeople
+        self.frameIndex = 0
+        self.startTime = None
+        return len(self.files) > 0
+
+    def grab(self):
+        '''Loads the next recorded frame, waiting for its recorded time if we replay in real time.'''
+        if not self.hasFrames():
+            return False
+        if self.frameIndex >= len(self.files):
+            self.frameIndex = 0
+            self.startTime = None
+        with np.load(self.files[self.frameIndex]) as frame:
+            self.timestamp = int(frame["timestamp"])
+            if "image" in frame:
+                self.image = ImageFrame(frame["image"])
+            else:
+                self.image = ImageFrame(np.zeros(tuple(frame["shape"]), np.uint8))
+            object_list = [ObjectData(int(frame["ids"][i]), str(frame["labels"][i]), float(frame["confidences"][i]),
+                                      frame["positions"][i], frame["velocities"][i], frame["bboxes"][i])
+                           for i in range(len(frame["ids"]))]
+            self.objects = Objects(object_list, self.timestamp)
+        self.frameIndex += 1
+
+        if self.realTime:
+            # Wait until the recorded time of this frame has passed since the first frame
+            now = time.perf_counter()
+            if self.startTime is None:
+                self.startTime = now
+                self.startTimestamp = self.timestamp
+            delay = (self.timestamp - self.startTimestamp) / 1e9 - (now - self.startTime)
+            if delay > 0:
+                time.sleep(delay)
+        return True
+
+    def hasFrames(self):
+        '''Returns whether there are frames left to play.'''
+        return self.loop or self.frameIndex < len(self.files)
+
+    def isRealTime(self):
+        '''Returns whether the frames are played back at recorded speed.'''
+        return self.realTime
+
+    def retrieveImage(self, image=None):
+        '''Returns the image of the last loaded frame.'''
+        return self.copyImage(self.image, image)
+
+    def retrieveObjects(self, objects=None):
+        '''Returns the objects of the last loaded frame.'''
+        return self.copyObjects(self.objects, objects)
+
+    def getTimestamp(self):
+        '''Returns the recorded time of the last loaded frame, in nanoseconds.'''
+        return self.timestamp
+
+
+
+# =============================================================================
+# SyntheticFrameSource
+# =============================================================================
+class SyntheticFrameSource(FrameSource):
+    '''
+    The SyntheticFrameSource generates a deterministic scene of people walking through a room, to run and benchmark the pipeline without a camera.
+
+    People walk in straight lines at walking speed and bounce off the walls of the room. Their bounding boxes are projected with a simple pinhole camera at (0,0,0) looking along z. The depth map shows the people as flat boxes in front of the back wall of the room.
+
+    Args:
+        numPeople (int): number of people in the scene.
+        resolution (tuple): (width, height) of the generated images.
+        fps (float): frame rate, determines the timestamps and, if realTime, the pace of grab().
+        numFrames (int): number of frames to generate, None to keep generating.
+        seed (int): seed for the starting positions and directions of the people.
+        realTime (bool): deliver frames at the given fps instead of as fast as possible.
+        room (tuple): (width, depth) of the room in meters, centered in front of the camera.
+    '''
+    personHeight = 1.8
+    personWidth = 0.5
+    walkingSpeed = 1.4
+
+    def __init__(self, numPeople:int=10, resolution=(1280,720), fps:float=60, numFrames:int=None, seed:int=0, realTime:bool=False, room=(8.0,8.0)):
+        super().__init__()
+        self.numPeople = numPeople
+        self.width, self.height = resolution
+        self.fps = fps
+        self.numFrames = numFrames
+        self.seed = seed
+        self.realTime = realTime
+        self.room = room
+
+    def open(self, trackPeople:bool):
+        '''Places the people at their starting positions and allocates the (static) image.'''
+        self.trackPeople = trackPeople
+        random = np.random.RandomState(self.seed)
+
+        # The room starts 1m in front of the camera, people walk on the floor (y = 0)
+        roomWidth, roomDepth = self.room
+        self.lower = np.array([-roomWidth/2, 0, 1.0])
+        self.upper = np.array([roomWidth/2, 0, 1.0 + roomDepth])
+        self.positions = self.lower + random.random_sample((self.numPeople,3)) * (self.upper - self.lower)
+        angles = random.random_sample(self.numPeople) * 2 * np.pi
+        self.velocities = np.zeros((self.numPeople,3))
+        self.velocities[:,0] = np.cos(angles) * SyntheticFrameSource.walkingSpeed
+        self.velocities[:,2] = np.sin(angles) * SyntheticFrameSource.walkingSpeed
+        self.allocate()
+        self.frameIndex = 0
+        self.timestamp = 0
+        self.startTime = None
+        return True
+
+    def allocate(self):
+        '''Allocates the (static) image and the depth map for the current resolution.'''
+        # A horizontal gradient, so the image is not completely uniform
+        data = np.empty((self.height, self.width, 4), np.uint8)
+        data[:,:,:3] = np.linspace(40, 200, self.width, dtype=np.uint8)[None,:,None]
+        data[:,:,3] = 255
+        self.image = ImageFrame(data)
+        self.depth = ImageFrame(np.empty((self.height, self.width), np.float32))
+        self.focal = self.width / 2
+
+    def grab(self):
+        '''Moves all people one frame ahead.'''
+        if not self.hasFrames():
+            return False
+        if self.frameIndex > 0:
+            self.positions += self.velocities / self.fps
+            # Bounce off the walls
+            outside = (self.positions < self.lower) | (self.positions > self.upper)
+            self.velocities[outside] *= -1
+            np.clip(self.positions, self.lower, self.upper, out=self.positions)
+            self.timestamp += int(round(1e9 / self.fps))
+        self.frameIndex += 1
+
+        if self.realTime:
+            now = time.perf_counter()
+            if self.startTime is None:
+                self.startTime = now
+            delay = self.timestamp / 1e9 - (now - self.startTime)
+            if delay > 0:
+                time.sleep(delay)
+        return True
+
+    def reconfigure(self, resolution:str, fps:int):
+        '''Switches to the image size of the given ZED resolution and the given fps, the people keep walking where they were.'''
+        self.width, self.height = CP.resolutionSizes[resolution]
+        self.fps = fps
+        self.allocate()
+        return True
+
+    def hasFrames(self):
+        '''Returns whether there are frames left to generate.'''
+        return self.numFrames is None or self.frameIndex < self.numFrames
+
+    def isRealTime(self):
+        '''Returns whether frames are delivered at the given fps.'''
+        return self.realTime
+
+    def retrieveImage(self, image=None):
+        '''Returns the (static) image.'''
+        return self.copyImage(self.image, image)
+
+    def project(self, i:int):
+        '''Returns the left, top, right and bottom of person i in the image.'''
+        cx, cy = self.width / 2, self.height / 2
+        x, y, z = self.positions[i]
+        # Project the person (feet at y, head at y - height, as y points down) onto the image
+        left = cx + self.focal * (x - SyntheticFrameSource.personWidth/2) / z
+        right = cx + self.focal * (x + SyntheticFrameSource.personWidth/2) / z
+        top = cy + self.focal * (y - SyntheticFrameSource.personHeight) / z
+        bottom = cy + self.focal * y / z
+        return left, top, right, bottom
+
+    def retrieveObjects(self, objects=None):
+        '''Returns the people at their current positions.'''
+        object_list = []
+        for i in range(self.numPeople):
+            left, top, right, bottom = self.project(i)
+            bounding_box = np.array([[left,top], [right,top], [right,bottom], [left,bottom]], np.float32)
+            object_list.append(ObjectData(i, "Person", 90.0, self.positions[i].astype(np.float32),
+                                          self.velocities[i].astype(np.float32), bounding_box))
+        return self.copyObjects(Objects(object_list, self.timestamp), objects)
+
+    def retrieveDepth(self, depth=None):
+        '''Returns the depth map of the people at their current positions, nearest person in front.'''
+        data = self.depth.data
+        data[:] = self.upper[2]
+        for i in np.argsort(-self.positions[:,2]):
+            left, top, right, bottom = self.project(i)
+            data[max(int(top),0):max(int(bottom),0), max(int(left),0):max(int(right),0)] = self.positions[i,2]
+        return self.copyImage(self.depth, depth)
+
+    def getTimestamp(self):
+        '''Returns the generated time of the last frame, in nanoseconds.'''
+        return self.timestamp
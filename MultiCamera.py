@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 15:18:09 2026
+
+The MultiCameraSource combines several frame sources (ZED cameras or replays) into a single
+source of multi-view frames, so one set of features covers all cameras.
+"""
+
+import threading
+
+import numpy as np
+
+from typing import List
+
+import FrameSources as FS
+import FrameBuffer as FB
+
+
+
+class MultiCameraSource(FS.FrameSource):
+    '''
+    The MultiCameraSource grabs several sources on parallel threads and combines frames that were captured at (nearly) the same time.
+
+    Each source is grabbed on its own thread into its own FrameRing. grab() takes the oldest frame of every source and skips frames that are more than tolerance older than the newest of them, until all frames fall within the tolerance. The combined frame has:
+        - an image with the views of all sources side by side,
+        - the objects of all sources, with their positions transformed to a shared (floor) coordinate system if poses are given, their bounding boxes moved to their view in the combined image, and their ids made unique by adding camera * idStride. Each object has a camera attribute.
+        - the timestamp of the newest frame.
+
+    Frames of live sources are buffered with the drop-oldest policy, frames of sources that are not real-time (replays, SVO files played back as fast as possible) with the block policy, so none of their frames are lost. getStats() reports the frames dropped from the buffers as well as the unmatched frames.
+
+    Args:
+        sources (List[FrameSource]): the sources to combine, e.g. ZEDFrameSources with a serialNumber.
+        tolerance (float): maximum difference in seconds between the timestamps of the combined frames.
+        poses (List[ndarray]): for each source, a 4x4 matrix transforming positions of that camera to the shared coordinate system. None to keep the positions of each camera.
+        bufferSize (int): number of frames buffered per source.
+        timeout (float): seconds to wait for a source to deliver a frame before grab() gives up.
+
+    Attributes:
+        unmatchedFrames: number of frames skipped because no frames of the other sources were close enough in time.
+        offsets: for each source, the x-offset of its view in the combined image.
+    '''
+    idStride = 100000
+
+    def __init__(self, sources:List[FS.FrameSource], tolerance:float=0.010, poses:List[np.ndarray]=None, bufferSize:int=4, timeout:float=1.0):
+        super().__init__()
+        self.sources = sources
+        self.tolerance = tolerance
+        self.poses = [np.asarray(pose, np.float32) for pose in poses] if poses is not None else None
+        self.bufferSize = bufferSize
+        self.timeout = timeout
+        self.unmatchedFrames = 0
+        self.offsets = []
+        self.closed = True # until open() succeeds
+        self.held = []
+        self.rings = []
+        self.threads = []
+        self.image = FS.ImageFrame(None)
+        self.objects = FS.Objects([], 0)
+        self.timestamp = 0
+
+    @staticmethod
+    def fromSerialNumbers(serialNumbers:List[int], **kwargs):
+        '''Returns a MultiCameraSource for the ZED cameras with the given serial numbers.'''
+        return MultiCameraSource([FS.ZEDFrameSource(serialNumber=serialNumber) for serialNumber in serialNumbers], **kwargs)
+
+    def open(self, trackPeople:bool):
+        '''Opens all sources and starts grabbing them. Fails (closing the sources that were opened) if any source cannot be opened.'''
+        self.trackPeople = trackPeople
+        for i in range(len(self.sources)):
+            if not self.sources[i].open(trackPeople):
+                for source in self.sources[:i]:
+                    source.close()
+                return False
+
+        self.closed = False
+        self.held = [None] * len(self.sources)
+        self.rings = []
+        self.threads = []
+        for camera, source in enumerate(self.sources):
+            slots = [FB.FrameSlot(source.createImage(), source.createObjects() if trackPeople else None)
+                     for i in range(self.bufferSize)]
+            # A live source drops its oldest frames when the others lag behind, a source that waits for its frames to be taken is waited for
+            policy = FB.dropOldestPolicy if source.isRealTime() else FB.blockPolicy
+            self.rings.append(FB.FrameRing(slots, policy))
+            thread = threading.Thread(target=self.grabLoop, args=(camera,), name="ZEDGrab%d" % camera, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return True
+
+    def grabLoop(self, camera:int):
+        '''Grabs frames from a single source into its FrameRing until closed or the source runs out of frames.'''
+        source, ring = self.sources[camera], self.rings[camera]
+        while not self.closed and source.hasFrames():
+            if not source.grab():
+                continue
+            slot = ring.acquireWrite()
+            if slot is None:
+                break
+            source.retrieveImage(slot.image)
+            if self.trackPeople:
+                source.retrieveObjects(slot.objects)
+            slot.timestamp = source.getTimestamp()
+            ring.commitWrite(slot)
+        ring.close()
+
+    def grab(self):
+        '''Waits for a frame of every source within the tolerance of each other and combines them.'''
+        # 1. Hold one frame of every source
+        for camera in range(len(self.sources)):
+            if self.held[camera] is None:
+                self.held[camera] = self.rings[camera].acquireRead(self.timeout)
+                if self.held[camera] is None:
+                    return False
+
+        # 2. Replace frames that are too old compared with the newest frame
+        tolerance = int(self.tolerance * 1e9)
+        while True:
+            newest = max(slot.timestamp for slot in self.held)
+            lagging = [camera for camera in range(len(self.sources)) if self.held[camera].timestamp < newest - tolerance]
+            if not lagging:
+                break
+            for camera in lagging:
+                self.rings[camera].releaseRead(self.held[camera])
+                self.unmatchedFrames += 1
+                self.held[camera] = self.rings[camera].acquireRead(self.timeout)
+                if self.held[camera] is None:
+                    return False
+
+        # 3. Combine them and give the slots back to the grab threads
+        self.combine()
+        for camera in range(len(self.sources)):
+            self.rings[camera].releaseRead(self.held[camera])
+            self.held[camera] = None
+        return True
+
+    def combine(self):
+        '''Combines the held frames into a single image and object list.'''
+        views = [slot.image.get_data() for slot in self.held]
+        height = max(view.shape[0] for view in views)
+        width = sum(view.shape[1] for view in views)
+        shape = (height, width) + views[0].shape[2:]
+        if self.image.data is None or self.image.data.shape != shape:
+            self.image.data = np.zeros(shape, views[0].dtype)
+
+        self.offsets = []
+        x = 0
+        for view in views:
+            self.image.data[:view.shape[0], x:x+view.shape[1]] = view
+            self.offsets.append(x)
+            x += view.shape[1]
+
+        object_list = []
+        if self.trackPeople:
+            for camera, slot in enumerate(self.held):
+                offset = np.array([self.offsets[camera], 0], np.float32)
+                for obj_data in slot.objects.object_list:
+                    position = np.asarray(obj_data.position, np.float32)
+                    velocity = np.asarray(obj_data.velocity, np.float32)
+                    if self.poses is not None:
+                        pose = self.poses[camera]
+                        position = pose[:3,:3] @ position + pose[:3,3]
+                        velocity = pose[:3,:3] @ velocity
+                    combined = FS.ObjectData(camera * MultiCameraSource.idStride + int(obj_data.id), obj_data.label, obj_data.confidence,
+                                             position, velocity, np.asarray(obj_data.bounding_box_2d, np.float32) + offset, obj_data.tracking_state)
+                    combined.camera = camera
+                    object_list.append(combined)
+        self.timestamp = max(slot.timestamp for slot in self.held)
+        self.objects = FS.Objects(object_list, self.timestamp)
+
+    def hasFrames(self):
+        '''Returns whether all sources can still deliver frames.'''
+        for ring in self.rings:
+            if ring.closed and ring.getStats()["queuedFrames"] == 0:
+                return False
+        return True
+
+    def isRealTime(self):
+        '''Returns whether all sources deliver frames at capture pace.'''
+        return all(source.isRealTime() for source in self.sources)
+
+    def getStats(self):
+        '''Returns the number of unmatched frames, the number of frames dropped from the buffers of all sources, and the buffer counters of each source.'''
+        sources = [ring.getStats() for ring in self.rings]
+        return {"unmatchedFrames": self.unmatchedFrames,
+                "droppedFrames": sum(stats["droppedFrames"] for stats in sources),
+                "sources": sources}
+
+    def retrieveImage(self, image=None):
+        '''Returns the combined image of the last grabbed frames.'''
+        return self.copyImage(self.image, image)
+
+    def retrieveObjects(self, objects=None):
+        '''Returns the objects of all sources in the last grabbed frames.'''
+        return self.copyObjects(self.objects, objects)
+
+    def getTimestamp(self):
+        '''Returns the time the newest of the last grabbed frames was captured, in nanoseconds.'''
+        return self.timestamp
+
+    def close(self):
+        '''Stops grabbing and closes all sources. Does nothing if the sources are not open (never opened, failed to open, or already closed).'''
+        if self.closed:
+            return
+        self.closed = True
+        for ring in self.rings:
+            ring.close()
+        for thread in self.threads:
+            thread.join()
+        for source in self.sources:
+            source.close()
@@ -5,7 +5,10 @@
 import pyzed.sl as sl
 import cv2
 import numpy as np
-import math
+import argparse
+
+import CaptureProfile as CP
+import FrameSources as FS
 
 id_colors = [(59, 232, 176),
              (25,175,208),
@@ -19,14 +22,16 @@ def get_color_id_gr(idx):
     return arr
 
 def main():
+    # Read the capture profile (resolution, fps, thresholds, ...) from the command line
+    parser = argparse.ArgumentParser()
+    CP.CaptureProfile.addArguments(parser)
+    profile = CP.CaptureProfile.fromArgs(parser.parse_args())
+
     # Create a Camera object
     zed = sl.Camera()
 
     # Create a InitParameters object and set configuration parameters
-    init_params = sl.InitParameters()
-    init_params.camera_resolution = sl.RESOLUTION.HD720  # Use HD720 video mode
-    init_params.camera_fps = 60  # Set fps at 15
-    init_params.coordinate_units = sl.UNIT.METER # Set units in meters
+    init_params = profile.initParameters(sl)
 
     # Open the camera
     err = zed.open(init_params)
@@ -34,30 +39,19 @@ def main():
         exit(1)
     
    
-    runtime_parameters = sl.RuntimeParameters()
-    runtime_parameters.sensing_mode = sl.SENSING_MODE.STANDARD  # Use STANDARD sensing mode
-    
-    # Setting the depth confidence parameters
-    runtime_parameters.confidence_threshold = 100
-    runtime_parameters.textureness_confidence_threshold = 100
+    runtime_parameters = profile.runtimeParameters(sl)  # sensing mode and depth confidence parameters
     key = ''
 
     # Set initialization parameters
-    obj_param = sl.ObjectDetectionParameters()
-    obj_param.enable_tracking = True
+    obj_param = profile.objectDetectionParameters(sl)
 
     #Configuration for Tracking Object Motion in Runtime using positional tracking
     if obj_param.enable_tracking :
-        # Set positional tracking parameters
-        positional_tracking_parameters = sl.PositionalTrackingParameters()
-        positional_tracking_parameters.set_floor_as_origin = True
-
         # Enable positional tracking
-        zed.enable_positional_tracking(positional_tracking_parameters)
+        zed.enable_positional_tracking(profile.positionalTrackingParameters(sl))
 
    # Set runtime parameters
-    detection_parameters_rt = sl.ObjectDetectionRuntimeParameters()
-    detection_parameters_rt.detection_confidence_threshold = 40
+    detection_parameters_rt = profile.detectionRuntimeParameters(sl)
 
     # Enable object detection with initialization parameters
     zed_error = zed.enable_object_detection(obj_param)
@@ -77,31 +71,21 @@ def main():
             # A new image is available if grab() returns SUCCESS
             zed.retrieve_image(image, sl.VIEW.LEFT)
             zed.retrieve_objects(objects, detection_parameters_rt)
-            obj_array = objects.object_list
             image_data = image.get_data()
 
-            prePosition = [0,0,0]
+            # The objects as records (one row per object), with the distance of each object to the previous one (the first to 0,0,0)
+            records = FS.packObjects(objects)
+            positions = records["position"]
+            distances = np.linalg.norm(np.diff(positions, axis=0, prepend=np.zeros((1,3), positions.dtype)), axis=1)
+            boxes = records["bounding_box_2d"][:,[0,2]].reshape(-1,4).astype(np.int64).tolist()
+            labels = [FS.objectLabels.name(code) for code in records["label"].tolist()]
+            ids = records["id"].tolist()
             
-            for i in range(len(obj_array)) :
-                obj_data = obj_array[i]
-                bounding_box = obj_data.bounding_box_2d
-                cv2.rectangle(image_data, (int(bounding_box[0,0]),int(bounding_box[0,1])),
-                            (int(bounding_box[2,0]),int(bounding_box[2,1])),
-                              get_color_id_gr(int(obj_data.id)), 3)
-                
-                #Getting object data         
-                obj_label = str(obj_array[i].label)
-                obj_position = obj_data.position
-
-                # Calculating distance 
-                distance = math.sqrt((obj_position[0]-prePosition[0])*(obj_position[0]-prePosition[0]) + 
-                                   (obj_position[1]-prePosition[1])*(obj_position[1]-prePosition[1]) +
-                                   (obj_position[2]-prePosition[2])*(obj_position[2]-prePosition[2]))
-
-                cv2.putText(image_data, obj_label, (int(bounding_box[0,0]),int(bounding_box[0,1]-30)), cv2.FONT_HERSHEY_SIMPLEX, 0.5,(255,255,255),1)
-                cv2.putText(image_data, str(distance), (int(bounding_box[0,0]),int(bounding_box[0,1]-10)), cv2.FONT_HERSHEY_SIMPLEX, 0.5,(255,255,255),1)
-                
-                prePosition = obj_position
+            for i in range(len(records)) :
+                left, top, right, bottom = boxes[i]
+                cv2.rectangle(image_data, (left,top), (right,bottom), get_color_id_gr(ids[i]), 3)
+                cv2.putText(image_data, labels[i], (left,top-30), cv2.FONT_HERSHEY_SIMPLEX, 0.5,(255,255,255),1)
+                cv2.putText(image_data, str(distances[i]), (left,top-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5,(255,255,255),1)
               
             cv2.imshow("ZED", image_data)
 
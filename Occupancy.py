@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 19:02:37 2026
+
+The OccupancyMap accumulates where people spend their time on the floor, in a 2D grid of cells.
+With the floor as origin of the positional tracking, positions are already relative to the floor,
+so the floor plane is spanned by the x and z axes. Old observations fade out (exponential decay)
+or drop out (sliding window), without rescanning the history.
+"""
+
+import math
+from collections import deque
+
+import numpy as np
+
+
+
+class OccupancyMap:
+    '''
+    The OccupancyMap bins floor positions into a grid and accumulates, per cell, the time spent there (or the number of observations).
+
+    Adding the positions of a frame only touches the cells of these positions, so it costs O(people), not O(cells):
+        - with halfLife, old observations decay exponentially. Instead of decaying all cells every frame, new observations are added with a weight that grows over time, and the grid is scaled back when it is read (and, once in a long while, to keep the weights in range).
+        - with window, only the observations of the last window seconds count. The window is split into intervals; the cells touched in each interval are kept, and subtracted again when their interval leaves the window.
+    Without either, observations accumulate forever.
+
+    Args:
+        cellSize (float): size of the (square) cells in meters.
+        extent (tuple): (minimum first axis, maximum first axis, minimum second axis, maximum second axis) of the mapped floor area in meters. Positions outside are ignored.
+        axes (tuple): the two position axes that span the floor, (0,2) for x and z.
+        halfLife (float): seconds after which an observation counts for half, None for no decay.
+        window (float): seconds after which an observation no longer counts, None for no window. Not together with halfLife.
+        intervals (int): number of intervals the window is split into, the window moves in steps of window / intervals.
+        dwell (bool): accumulate the time (in seconds) people spend in each cell, instead of the number of observations.
+        maxGap (float): longest time (in seconds) between two frames that is counted as dwell time, so a gap in the capture does not count as time spent.
+
+    Attributes:
+        shape: (rows, columns) of the grid, rows along the second axis.
+        observations: number of positions added inside the extent.
+    '''
+    def __init__(self, cellSize:float=0.25, extent=(-4.0,4.0,0.0,8.0), axes=(0,2), halfLife:float=None, window:float=None,
+                 intervals:int=12, dwell:bool=True, maxGap:float=0.5):
+        if halfLife is not None and window is not None:
+            raise ValueError("An OccupancyMap either decays (halfLife) or uses a window, not both.")
+        self.cellSize = cellSize
+        self.extent = tuple(float(edge) for edge in extent)
+        self.axes = tuple(axes)
+        self.shape = (max(1, int(math.ceil((self.extent[3] - self.extent[2]) / cellSize))),
+                      max(1, int(math.ceil((self.extent[1] - self.extent[0]) / cellSize))))
+        self.halfLife = halfLife
+        self.window = window
+        self.intervals = max(1, intervals)
+        self.dwell = dwell
+        self.maxGap = maxGap
+        self.grid = np.zeros(self.shape[0] * self.shape[1], np.float64)
+        self.reset()
+
+    def reset(self):
+        '''Forgets all observations.'''
+        self.grid[:] = 0
+        self.observations = 0
+        self.lastTimestamp = None
+        # Decay: the grid holds the values scaled by exp(decayRate * (t - referenceTime))
+        self.decayRate = math.log(2) / self.halfLife if self.halfLife is not None else 0.0
+        self.referenceTime = None
+        # Window: the cells and weights added in each interval that is still in the window
+        self.interval = None
+        self.expiring = deque()
+        self.cells = []
+        self.weights = []
+
+    def cellIndices(self, positions:np.ndarray):
+        '''Returns the flat grid indices of the cells of the given (N,3) positions, and which positions are inside the extent.'''
+        positions = np.asarray(positions, np.float64).reshape(-1, 3)
+        columns = np.floor((positions[:,self.axes[0]] - self.extent[0]) / self.cellSize)
+        rows = np.floor((positions[:,self.axes[1]] - self.extent[2]) / self.cellSize)
+        inside = (columns >= 0) & (columns < self.shape[1]) & (rows >= 0) & (rows < self.shape[0])
+        return (rows[inside] * self.shape[1] + columns[inside]).astype(np.intp), inside
+
+    def add(self, timestamp:int, positions:np.ndarray):
+        '''Adds the (N,3) positions of a frame captured at timestamp (in nanoseconds).'''
+        # 1. The weight of each position: the time since the previous frame, or one observation
+        if self.dwell:
+            seconds = 0.0 if self.lastTimestamp is None else (timestamp - self.lastTimestamp) / 1e9
+            weight = min(max(seconds, 0.0), self.maxGap)
+        else:
+            weight = 1.0
+        self.lastTimestamp = timestamp
+        if self.window is not None:
+            self.advance(timestamp)
+
+        cells, inside = self.cellIndices(positions)
+        self.observations += len(cells)
+        if len(cells) == 0 or weight == 0.0:
+            return
+
+        # 2. Add the weights to the cells
+        if self.halfLife is not None:
+            if self.referenceTime is None:
+                self.referenceTime = timestamp
+            scale = math.exp(self.decayRate * (timestamp - self.referenceTime) / 1e9)
+            if scale > 1e12:
+                # Rescale the grid (O(cells), roughly once every 40 half-lives) so the weights stay in range
+                self.grid /= scale
+                self.referenceTime = timestamp
+                scale = 1.0
+            weight *= scale
+        np.add.at(self.grid, cells, weight)
+        if self.window is not None:
+            self.cells.append(cells)
+            self.weights.append(np.full(len(cells), weight))
+
+    def advance(self, timestamp:int):
+        '''Moves the window to the interval of timestamp, subtracting the cells of the intervals that leave it.'''
+        interval = int(timestamp // int(self.window / self.intervals * 1e9))
+        if self.interval is None:
+            self.interval = interval
+        if interval <= self.interval:
+            return
+
+        # 1. Close the current interval, and the intervals without frames since
+        closed = (np.concatenate(self.cells), np.concatenate(self.weights)) if self.cells else None
+        self.cells, self.weights = [], []
+        self.expiring.append(closed)
+        for i in range(min(interval - self.interval - 1, self.intervals)):
+            self.expiring.append(None)
+        self.interval = interval
+
+        # 2. Subtract the intervals that are no longer in the window (the window holds the current interval and intervals - 1 closed ones)
+        while len(self.expiring) > self.intervals - 1:
+            expired = self.expiring.popleft()
+            if expired is not None:
+                np.subtract.at(self.grid, expired[0], expired[1])
+
+    def heatmap(self, out:np.ndarray=None):
+        '''Returns the current heatmap as a (rows, columns) float32 array, rows along the second axis. Costs O(cells), so read it only when it is needed, into out to reuse an array.'''
+        out = out if out is not None else np.empty(self.shape, np.float32)
+        scale = 1.0
+        if self.halfLife is not None and self.referenceTime is not None and self.lastTimestamp is not None:
+            scale = math.exp(-self.decayRate * (self.lastTimestamp - self.referenceTime) / 1e9)
+        np.multiply(self.grid.reshape(self.shape), scale, out=out, casting="unsafe")
+        np.maximum(out, 0, out=out) # subtracting expired intervals can leave rounding errors below zero
+        return out
+
+    def cellCenter(self, row:int, column:int):
+        '''Returns the floor coordinates (along both axes) of the center of a cell.'''
+        return (self.extent[0] + (column + 0.5) * self.cellSize, self.extent[2] + (row + 0.5) * self.cellSize)
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 12:02:47 2026
+
+The Profiler measures how long each stage of the capture and feature extraction takes.
+"""
+
+import json
+import threading
+import time
+
+import numpy as np
+
+
+
+class Profiler:
+    '''
+    The Profiler keeps the durations of the last windowSize runs of each stage (grab, retrieving the image, each feature, each actor, ...) and of the frame rate.
+
+    Stages are measured with start() and stop(). When the profiler is disabled both return immediately, so the hooks can stay in the capture loop.
+
+        start = profiler.start()
+        source.grab()
+        profiler.stop("grab", start)
+
+    Args:
+        enabled (bool): whether to measure, can be changed later with enable() and disable().
+        windowSize (int): number of most recent measurements per stage the statistics are computed over.
+        dumpFile (str): if given, the statistics are written to this file (as JSON) every dumpInterval seconds.
+        dumpInterval (float): seconds between writes to the dumpFile.
+    '''
+    def __init__(self, enabled:bool=False, windowSize:int=1000, dumpFile:str=None, dumpInterval:float=10.0):
+        self.enabled = enabled
+        self.windowSize = windowSize
+        self.dumpFile = dumpFile
+        self.dumpInterval = dumpInterval
+        self.lock = threading.Lock()
+        self.reset()
+
+    def enable(self):
+        '''Starts measuring.'''
+        self.enabled = True
+
+    def disable(self):
+        '''Stops measuring, the measurements so far are kept.'''
+        self.enabled = False
+
+    def reset(self):
+        '''Forgets all measurements.'''
+        with self.lock:
+            self.durations = {} # stage -> ring of durations in seconds
+            self.counts = {}    # stage -> number of measurements
+            self.frameTimes = np.zeros(self.windowSize)
+            self.frameCount = 0
+            self.lastDump = time.perf_counter()
+
+    def start(self):
+        '''Returns the start time of a stage, to pass to stop(). None while profiling is disabled.'''
+        if not self.enabled:
+            return None
+        return time.perf_counter()
+
+    def stop(self, stage:str, start:float):
+        '''Records the duration of a stage that was started at start. Nothing is recorded for a stage started while profiling was disabled.'''
+        if not self.enabled or start is None:
+            return
+        self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage:str, duration:float):
+        '''Records a duration (in seconds) for a stage.'''
+        with self.lock:
+            durations = self.durations.get(stage)
+            if durations is None:
+                durations = self.durations[stage] = np.zeros(self.windowSize)
+                self.counts[stage] = 0
+            durations[self.counts[stage] % self.windowSize] = duration
+            self.counts[stage] += 1
+
+    def frameDone(self):
+        '''Should be called once per processed frame, to measure the frame rate. Also writes the dumpFile when it is time to.'''
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        with self.lock:
+            self.frameTimes[self.frameCount % self.windowSize] = now
+            self.frameCount += 1
+            dump = self.dumpFile is not None and now - self.lastDump >= self.dumpInterval
+            if dump:
+                self.lastDump = now
+        if dump:
+            self.dump(self.dumpFile)
+
+    def getFps(self):
+        '''Returns the frame rate over the last windowSize frames.'''
+        with self.lock:
+            count = min(self.frameCount, self.windowSize)
+            if count < 2:
+                return 0.0
+            last = self.frameTimes[(self.frameCount - 1) % self.windowSize]
+            first = self.frameTimes[(self.frameCount - count) % self.windowSize]
+        return (count - 1) / (last - first) if last > first else 0.0
+
+    def getStats(self):
+        '''Returns, for each stage, the number of measurements and the mean, p50, p95, p99 and max duration in milliseconds over the window. Also returns the frame rate.'''
+        stages = {}
+        with self.lock:
+            snapshot = [(stage, durations[:min(self.counts[stage], self.windowSize)].copy(), self.counts[stage])
+                        for stage, durations in self.durations.items()]
+        for stage, durations, count in snapshot:
+            milliseconds = durations * 1000
+            p50, p95, p99 = np.percentile(milliseconds, [50, 95, 99])
+            stages[stage] = {"count": count,
+                             "mean": float(milliseconds.mean()),
+                             "p50": float(p50),
+                             "p95": float(p95),
+                             "p99": float(p99),
+                             "max": float(milliseconds.max())}
+        return {"fps": self.getFps(), "frames": self.frameCount, "stages": stages}
+
+    def dump(self, path:str):
+        '''Writes the statistics to a file as JSON.'''
+        with open(path, "w") as file:
+            json.dump(self.getStats(), file, indent=2)
+
+    def report(self):
+        '''Returns the statistics as a readable table.'''
+        stats = self.getStats()
+        lines = ["fps: %.1f over %d frames" % (stats["fps"], stats["frames"]),
+                 "%-32s %8s %8s %8s %8s %8s" % ("stage (ms)", "mean", "p50", "p95", "p99", "max")]
+        for stage, stage_stats in sorted(stats["stages"].items()):
+            lines.append("%-32s %8.3f %8.3f %8.3f %8.3f %8.3f" % (stage, stage_stats["mean"], stage_stats["p50"],
+                                                                 stage_stats["p95"], stage_stats["p99"], stage_stats["max"]))
+        return "\n".join(lines)
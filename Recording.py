@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 13:10:05 2026
+
+The DetectionLog records detections into typed columns and writes them to disk in chunks
+(one .npz segment per chunk) on a background thread. Recordings can be exported to CSV or xlsx
+afterwards:
+
+    python Recording.py <recording directory> <output .csv or .xlsx>
+
+The VideoLog likewise encodes frames to video files (in segments, each with an index of its
+frames) on a background thread.
+"""
+
+import os
+import sys
+import glob
+import csv
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+import FrameSources as FS
+
+
+# Column name, dtype and header used when exporting
+detectionColumns = [("timestamp", np.int64, "Timestamp (ns)"),
+                    ("id", np.int32, "ID"),
+                    ("label", "U16", "Label"),
+                    ("x", np.float32, "x-axis"),
+                    ("y", np.float32, "y-axis"),
+                    ("z", np.float32, "z-axis"),
+                    ("distance", np.float32, "Distance from Camera"),
+                    ("left", np.float32, "Box left"),
+                    ("top", np.float32, "Box top"),
+                    ("right", np.float32, "Box right"),
+                    ("bottom", np.float32, "Box bottom"),
+                    ("confidence", np.float32, "Confidence")]
+segmentPattern = "segment_%06d.npz"
+
+
+
+def nextSegment(directory:str):
+    '''Returns the number after the highest numbered segment in a directory, 0 if there are none.'''
+    numbers = [int(os.path.basename(path)[len("segment_"):-len(".npz")]) for path in glob.glob(os.path.join(directory, "segment_*.npz"))]
+    return max(numbers) + 1 if numbers else 0
+
+
+
+class DetectionLog:
+    '''
+    The DetectionLog buffers detections in preallocated column arrays. Whenever a chunk is full it is handed to a writer thread, which saves it as a segment in the recording directory, so writing never happens on the capture thread.
+
+    Args:
+        directory (str): directory to write the segments to, created if it does not exist. A recording that is already there is appended to: new segments are numbered after the existing ones.
+        chunkSize (int): number of detections per segment.
+
+    If writing a segment fails (e.g. the disk is full), the writer stops writing and the error is raised by the next flush(), and by close(), so the capture notices instead of buffering detections that are never written.
+
+    Attributes:
+        rows: number of detections appended so far.
+        segments: number of segments in the directory so far, those of an earlier recording included.
+        error: the error writing a segment ran into, None if there was none.
+    '''
+    def __init__(self, directory:str, chunkSize:int=8192):
+        self.directory = directory
+        self.chunkSize = chunkSize
+        os.makedirs(directory, exist_ok=True)
+
+        self.spareChunks = queue.Queue()
+        self.chunk = self.newChunk()
+        self.count = 0
+        self.rows = 0
+        self.segments = nextSegment(directory)
+        self.error = None
+
+        self.writeQueue = queue.Queue()
+        self.writer = threading.Thread(target=self.writeLoop, name="DetectionLog", daemon=True)
+        self.writer.start()
+
+    def newChunk(self):
+        '''Returns a chunk of empty columns, reusing a chunk that has been written if there is one.'''
+        try:
+            return self.spareChunks.get_nowait()
+        except queue.Empty:
+            return {name: np.empty(self.chunkSize, dtype) for name, dtype, header in detectionColumns}
+
+    def append(self, timestamp:int, id:int, label:str, position, distance:float, bounding_box, confidence:float):
+        '''Adds a single detection. The bounding box is given as its four corners, like bounding_box_2d.'''
+        chunk, i = self.chunk, self.count
+        chunk["timestamp"][i] = timestamp
+        chunk["id"][i] = id
+        chunk["label"][i] = label
+        chunk["x"][i] = position[0]
+        chunk["y"][i] = position[1]
+        chunk["z"][i] = position[2]
+        chunk["distance"][i] = distance
+        chunk["left"][i] = bounding_box[0][0]
+        chunk["top"][i] = bounding_box[0][1]
+        chunk["right"][i] = bounding_box[2][0]
+        chunk["bottom"][i] = bounding_box[2][1]
+        chunk["confidence"][i] = confidence
+        self.count += 1
+        self.rows += 1
+        if self.count == self.chunkSize:
+            self.flush()
+
+    def appendRecords(self, timestamp:int, records:np.ndarray, distances:np.ndarray):
+        '''Adds all objects of a frame at once, given as object records (see FrameSources.packObjects) with a distance for each.'''
+        labels = np.array(FS.objectLabels.names, "U16")
+        done = 0
+        while done < len(records):
+            n = min(len(records) - done, self.chunkSize - self.count)
+            part, chunk, i = records[done:done+n], self.chunk, self.count
+            chunk["timestamp"][i:i+n] = timestamp
+            chunk["id"][i:i+n] = part["id"]
+            chunk["label"][i:i+n] = labels[part["label"]]
+            chunk["x"][i:i+n] = part["position"][:,0]
+            chunk["y"][i:i+n] = part["position"][:,1]
+            chunk["z"][i:i+n] = part["position"][:,2]
+            chunk["distance"][i:i+n] = distances[done:done+n]
+            chunk["left"][i:i+n] = part["bounding_box_2d"][:,0,0]
+            chunk["top"][i:i+n] = part["bounding_box_2d"][:,0,1]
+            chunk["right"][i:i+n] = part["bounding_box_2d"][:,2,0]
+            chunk["bottom"][i:i+n] = part["bounding_box_2d"][:,2,1]
+            chunk["confidence"][i:i+n] = part["confidence"]
+            done += n
+            self.count += n
+            self.rows += n
+            if self.count == self.chunkSize:
+                self.flush()
+
+    def flush(self):
+        '''Hands the detections appended so far to the writer thread. Raises the error of a write that failed, the detections appended since are dropped then.'''
+        if self.error is not None:
+            self.count = 0
+            raise self.error
+        if self.count == 0:
+            return
+        self.writeQueue.put((self.segments, self.chunk, self.count))
+        self.segments += 1
+        self.chunk = self.newChunk()
+        self.count = 0
+
+    def writeLoop(self):
+        '''Writes the chunks handed over by flush() until close() is called. After a write failed, the chunks are no longer written.'''
+        while True:
+            item = self.writeQueue.get()
+            if item is None:
+                break
+            segment, chunk, count = item
+            if self.error is None:
+                try:
+                    np.savez(os.path.join(self.directory, segmentPattern % segment),
+                             **{name: column[:count] for name, column in chunk.items()})
+                except Exception as error:
+                    self.error = error
+            self.spareChunks.put(chunk)
+
+    def close(self):
+        '''Writes the remaining detections and waits for the writer thread to finish. Raises the error of a write that failed, if any.'''
+        try:
+            self.flush()
+        finally:
+            self.writeQueue.put(None)
+            self.writer.join()
+        if self.error is not None:
+            raise self.error
+
+
+
+videoPattern = "video_%06d"
+class VideoLog:
+    '''
+    The VideoLog encodes frames to video files on a background thread, fed by a bounded queue, so encoding never happens on the capture thread. When the queue is full, offer() refuses the frame instead of waiting, and the frame is counted as dropped.
+
+    The video is split into segments of segmentLength seconds (capture time), each a separate file (video_000000.mp4, ...) with a sidecar index (video_000000.csv) that maps each frame in the file to its frame number and capture timestamp.
+
+    Args:
+        directory (str): directory to write the segments to, created if it does not exist.
+        fps (float): frame rate the video files are written with.
+        scale (float): factor the frames are resized with before encoding, e.g. 0.5 for half the width and height.
+        segmentLength (float): seconds of capture time per segment.
+        queueSize (int): number of frames that can wait for the encoder.
+        codec (str): fourcc of the codec, e.g. "mp4v" or "MJPG".
+        extension (str): file extension of the video files, matching the codec.
+        annotate: if given, called on the encoder thread as annotate(image, annotation) to draw on each frame before it is encoded.
+
+    Attributes:
+        frames: number of frames encoded so far.
+        droppedFrames: number of frames refused because the encoder was behind.
+        segments: number of segments started so far.
+        error: the last error the encoder ran into (e.g. a codec that is not available), None if there was none.
+    '''
+    def __init__(self, directory:str, fps:float=15.0, scale:float=1.0, segmentLength:float=300.0, queueSize:int=8,
+                 codec:str="mp4v", extension:str=".mp4", annotate=None):
+        self.directory = directory
+        self.fps = fps
+        self.scale = scale
+        self.segmentLength = segmentLength
+        self.codec = codec
+        self.extension = extension
+        self.annotate = annotate
+        os.makedirs(directory, exist_ok=True)
+
+        self.frames = 0
+        self.droppedFrames = 0
+        self.segments = 0
+        self.video = None
+        self.index = None
+        self.error = None
+
+        self.queue = queue.Queue(queueSize)
+        self.encoder = threading.Thread(target=self.encodeLoop, name="VideoLog", daemon=True)
+        self.encoder.start()
+
+    def accepts(self):
+        '''Returns whether the encoder can take another frame, so a frame is only copied when it will be offered.'''
+        return not self.queue.full()
+
+    def offer(self, image:np.ndarray, timestamp:int, frameNumber:int, annotation=None, release=None):
+        '''Hands a frame to the encoder thread without waiting. The encoder owns the image until it calls release(image), if given. Returns False (and counts the frame as dropped) when the queue is full, the caller keeps the image then.'''
+        try:
+            self.queue.put_nowait((image, timestamp, frameNumber, annotation, release))
+            return True
+        except queue.Full:
+            self.droppedFrames += 1
+            return False
+
+    def encodeLoop(self):
+        '''Encodes the offered frames until close() is called.'''
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            image, timestamp, frameNumber, annotation, release = item
+            try:
+                # 1. Resize and convert the frame (the ZED delivers BGRA)
+                if self.scale != 1.0:
+                    frame = cv2.resize(image, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+                else:
+                    frame = image
+                if frame.ndim == 3 and frame.shape[2] == 4:
+                    frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+                if self.annotate is not None and annotation is not None:
+                    self.annotate(frame, annotation)
+
+                # 2. Start a new segment when the current one is long enough (or the frame size changed)
+                size = (frame.shape[1], frame.shape[0])
+                if self.video is None or size != self.size or timestamp - self.segmentStart >= self.segmentLength * 1e9:
+                    self.startSegment(timestamp, size)
+
+                # 3. Encode the frame and index it
+                self.video.write(frame)
+                self.index.write("%d,%d,%d\n" % (self.segmentFrames, frameNumber, timestamp))
+                self.segmentFrames += 1
+                self.frames += 1
+            except Exception as error:
+                self.error = error
+            finally:
+                if release is not None:
+                    release(image)
+        self.closeSegment()
+
+    def startSegment(self, timestamp:int, size):
+        '''Closes the current segment and opens the next one.'''
+        self.closeSegment()
+        path = os.path.join(self.directory, videoPattern % self.segments)
+        self.video = cv2.VideoWriter(path + self.extension, cv2.VideoWriter_fourcc(*self.codec), self.fps, size)
+        if not self.video.isOpened():
+            self.video = None
+            raise IOError("Unable to open " + path + self.extension + " for writing with codec " + self.codec)
+        self.index = open(path + ".csv", "w", newline="")
+        self.index.write("frame,frameNumber,timestamp\n")
+        self.segments += 1
+        self.segmentStart = timestamp
+        self.segmentFrames = 0
+        self.size = size
+
+    def closeSegment(self):
+        '''Closes the video file and index of the current segment, if any.'''
+        if self.video is not None:
+            self.video.release()
+            self.video = None
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+    def close(self):
+        '''Encodes the frames that are still queued and waits for the encoder thread to finish. Raises the last error the encoder ran into, if any, once the files are closed.'''
+        self.queue.put(None)
+        self.encoder.join()
+        if self.error is not None:
+            raise self.error
+
+
+
+def readVideoIndex(directory:str):
+    '''Returns the index of all video segments in a directory as a (segment, frame, frameNumber, timestamp) int64 array, ordered by segment and frame.'''
+    parts = []
+    for path in sorted(glob.glob(os.path.join(directory, "video_*.csv"))):
+        rows = np.loadtxt(path, np.int64, delimiter=",", skiprows=1, ndmin=2)
+        segment = int(os.path.basename(path)[len("video_"):-len(".csv")])
+        parts.append(np.column_stack([np.full(len(rows), segment, np.int64), rows]) if len(rows) > 0 else np.empty((0,4), np.int64))
+    return np.concatenate(parts) if parts else np.empty((0,4), np.int64)
+
+
+
+def readRecording(directory:str):
+    '''Returns all detections in a recording as a dictionary of columns.'''
+    columns = {name: [] for name, dtype, header in detectionColumns}
+    for path in sorted(glob.glob(os.path.join(directory, "segment_*.npz"))):
+        with np.load(path) as segment:
+            for name in columns:
+                columns[name].append(segment[name])
+    return {name: np.concatenate(parts) if parts else np.empty(0, dtype)
+            for (name, parts), (_, dtype, header) in zip(columns.items(), detectionColumns)}
+
+
+def exportCsv(directory:str, path:str):
+    '''Exports a recording to a CSV file.'''
+    columns = readRecording(directory)
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow([header for name, dtype, header in detectionColumns])
+        writer.writerows(zip(*[columns[name].tolist() for name, dtype, header in detectionColumns]))
+
+
+def exportXlsx(directory:str, path:str):
+    '''Exports a recording to an xlsx file (requires xlsxwriter).'''
+    import xlsxwriter
+    columns = readRecording(directory)
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    worksheet = workbook.add_worksheet()
+    worksheet.write_row(0, 0, [header for name, dtype, header in detectionColumns])
+    rows = zip(*[columns[name].tolist() for name, dtype, header in detectionColumns])
+    for row, values in enumerate(rows, 1):
+        worksheet.write_row(row, 0, values)
+    workbook.close()
+
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python Recording.py <recording directory> <output .csv or .xlsx>")
+        exit(-1)
+    if sys.argv[2].endswith(".xlsx"):
+        exportXlsx(sys.argv[1], sys.argv[2])
+    else:
+        exportCsv(sys.argv[1], sys.argv[2])
@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 20:51:26 2026
+
+A session recording keeps every frame (its timestamp and frame number) and the object records of
+every frame in a directory, in files that can be searched without reading them:
+    frames.bin      one fixed-size entry per frame, in capture order: the index by time
+    objects.bin     the object records of all frames, each with its timestamp
+    trackRows.npy   the rows in objects.bin, grouped by track id within each batch written
+    trackRuns.npy   for each batch and track id, where its rows are in trackRows.npy: the index by id
+    session.json    the format version and record layouts
+All files are only appended to, by the writer, while recording. Reading memory-maps them, so a
+query only touches the part of the session it returns:
+
+    python Session.py <session directory> --track 17 --start 14:02 --end 14:05
+"""
+
+import os
+import json
+import queue
+import argparse
+import datetime
+import threading
+
+import numpy as np
+
+import FrameSources as FS
+
+
+sessionVersion = 2
+
+# One entry per frame: the rows of its objects are first ... first + count - 1 in objects.bin
+frameDtype = np.dtype([("timestamp", "<i8"),
+                       ("frameNumber", "<i8"),
+                       ("first", "<i8"),
+                       ("count", "<i4"),
+                       ("predicted", "?")])
+
+# One row per object per frame: the object record with the timestamp of its frame
+sessionObjectDtype = np.dtype([("timestamp", "<i8")] + FS.objectDtype.newbyteorder("<").descr)
+
+# One run per track id per batch: the rows of the track in that batch are trackRows[start:start + count]
+runDtype = np.dtype([("id", "<i4"),
+                     ("start", "<i8"),
+                     ("count", "<i4")])
+
+framesFile = "frames.bin"
+objectsFile = "objects.bin"
+trackRowsFile = "trackRows.npy"
+trackRunsFile = "trackRuns.npy"
+infoFile = "session.json"
+
+
+
+def mapFile(path:str, dtype:np.dtype):
+    '''Returns the complete rows in a file as a read-only memory-mapped array (an empty array if there are none yet).'''
+    rows = os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0
+    if rows == 0:
+        return np.empty(0, dtype)
+    return np.memmap(path, dtype, mode="r", shape=(rows,))
+
+
+def readInfo(directory:str):
+    '''Returns the contents of session.json of a session, raises a ValueError if the directory holds no session of this version.'''
+    path = os.path.join(directory, infoFile)
+    if not os.path.exists(path):
+        raise ValueError("Not a session recording: " + directory)
+    with open(path) as file:
+        info = json.load(file)
+    if info["version"] != sessionVersion:
+        raise ValueError("Unsupported session version %d in %s" % (info["version"], directory))
+    return info
+
+
+def mapArrayFile(path:str):
+    '''Returns the rows of a .npy file written with an ArrayFile as a read-only memory-mapped array, None if there is no such file yet.'''
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode="r")
+
+
+
+class ArrayFile:
+    '''
+    An ArrayFile appends rows to a .npy file, so the file can be memory-mapped with np.load while it grows. The rows are written before the shape in the header is updated, so a reader never sees rows that are not written yet. NumPy pads the header, so it can be rewritten in place for any number of rows.
+
+    Args:
+        path (str): the .npy file, created if it does not exist.
+        dtype (np.dtype): the dtype of the rows.
+
+    Attributes:
+        rows: number of rows in the file.
+    '''
+    def __init__(self, path:str, dtype:np.dtype):
+        self.dtype = dtype
+        if not os.path.exists(path):
+            with open(path, "wb") as file:
+                self.writeHeader(file, 0)
+        self.file = open(path, "r+b")
+        np.lib.format.read_magic(self.file)
+        shape, fortran, stored = np.lib.format.read_array_header_1_0(self.file)
+        if stored != dtype:
+            raise ValueError("Unexpected dtype %s in %s" % (stored, path))
+        self.headerSize = self.file.tell()
+        self.rows = shape[0]
+        # Drop rows that were written after the header was last updated (e.g. by a writer that did not finish)
+        self.file.truncate(self.headerSize + self.rows * dtype.itemsize)
+
+    def writeHeader(self, file, rows:int):
+        '''Writes the header of a file with the given number of rows.'''
+        file.seek(0)
+        np.lib.format.write_array_header_1_0(file, {"descr": np.lib.format.dtype_to_descr(self.dtype), "fortran_order": False, "shape": (rows,)})
+
+    def append(self, rows:np.ndarray):
+        '''Appends the rows to the file, then updates the header.'''
+        self.file.seek(self.headerSize + self.rows * self.dtype.itemsize)
+        self.file.write(np.ascontiguousarray(rows, self.dtype).tobytes())
+        self.file.flush()
+        self.rows += len(rows)
+        self.writeHeader(self.file, self.rows)
+        self.file.flush()
+
+    def close(self):
+        '''Closes the file.'''
+        self.file.close()
+
+
+
+class SessionWriter:
+    '''
+    The SessionWriter records a session incrementally: frames are appended as they are captured, and written to disk in batches on a background thread, so the capture thread never waits for the disk. The index by id is appended to with every batch, so a session that is still being recorded (or was not closed) can be searched by id as well.
+
+    Args:
+        directory (str): directory to record the session to, created if it does not exist. A session that is already there is appended to: the label and tracking state names it was recorded with are numbered the same in this process, a ValueError is raised if they were numbered differently.
+        flushFrames (int): number of frames handed to the writer thread at once.
+
+    Attributes:
+        frames: number of frames appended so far.
+        rows: number of object records appended so far.
+    '''
+    def __init__(self, directory:str, flushFrames:int=30):
+        self.directory = directory
+        self.flushFrames = flushFrames
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(os.path.join(directory, infoFile)):
+            info = readInfo(directory)
+            for codes, names in ((FS.objectLabels, info["objectLabels"]), (FS.trackingStates, info["trackingStates"])):
+                known = min(len(codes.names), len(names))
+                if codes.names[:known] != names[:known]:
+                    raise ValueError("Cannot append to %s: its names %s are numbered differently from %s" % (directory, names, codes.names))
+                codes.extend(names)
+        self.writtenNames = None
+        self.writeInfo()
+
+        self.frameFile = open(os.path.join(directory, framesFile), "ab")
+        self.objectFile = open(os.path.join(directory, objectsFile), "ab")
+        self.trackRows = ArrayFile(os.path.join(directory, trackRowsFile), np.dtype("<i8"))
+        self.trackRuns = ArrayFile(os.path.join(directory, trackRunsFile), runDtype)
+        self.frames = self.frameFile.tell() // frameDtype.itemsize
+        self.rows = self.objectFile.tell() // sessionObjectDtype.itemsize
+        self.pendingFrames = []
+        self.pendingObjects = []
+
+        self.writeQueue = queue.Queue()
+        self.writer = threading.Thread(target=self.writeLoop, name="SessionWriter", daemon=True)
+        self.writer.start()
+
+    def writeInfo(self):
+        '''Writes session.json, with the names of the label and tracking state codes known so far, if they changed since it was last written. The file is replaced at once, so readers never see it half written.'''
+        names = (list(FS.objectLabels.names), list(FS.trackingStates.names))
+        if names == self.writtenNames:
+            return
+        path = os.path.join(self.directory, infoFile)
+        with open(path + ".tmp", "w") as file:
+            json.dump({"version": sessionVersion,
+                       "frameDtype": np.lib.format.dtype_to_descr(frameDtype),
+                       "objectDtype": np.lib.format.dtype_to_descr(sessionObjectDtype),
+                       "objectLabels": names[0],
+                       "trackingStates": names[1]}, file, indent=2)
+        os.replace(path + ".tmp", path)
+        self.writtenNames = names
+
+    def append(self, timestamp:int, frameNumber:int, records:np.ndarray, predicted:bool=False):
+        '''Adds a frame with its objects, given as object records (see FrameSources.packObjects). Frames should be appended in capture order.'''
+        objects = np.empty(len(records), sessionObjectDtype)
+        objects["timestamp"] = timestamp
+        for name in FS.objectDtype.names:
+            objects[name] = records[name]
+        frame = np.array([(timestamp, frameNumber, self.rows, len(records), predicted)], frameDtype)
+        self.pendingObjects.append(objects)
+        self.pendingFrames.append(frame)
+        self.frames += 1
+        self.rows += len(records)
+        if len(self.pendingFrames) >= self.flushFrames:
+            self.flush()
+
+    def flush(self):
+        '''Hands the frames appended so far to the writer thread.'''
+        if not self.pendingFrames:
+            return
+        self.writeQueue.put((np.concatenate(self.pendingFrames), np.concatenate(self.pendingObjects)))
+        self.pendingFrames = []
+        self.pendingObjects = []
+
+    def writeLoop(self):
+        '''Writes the batches handed over by flush() until close() is called. The names of new label and tracking state codes, the objects and the index of a frame are written before the frame, so readers never see a frame without its objects or names.'''
+        while True:
+            item = self.writeQueue.get()
+            if item is None:
+                break
+            frames, objects = item
+            self.writeInfo()
+            self.objectFile.write(objects.tobytes())
+            self.objectFile.flush()
+            
+            # The rows of each track id in this batch, in capture order: one run per id
+            order = np.argsort(objects["id"], kind="stable")
+            ids, starts, counts = np.unique(objects["id"][order], return_index=True, return_counts=True)
+            runs = np.empty(len(ids), runDtype)
+            runs["id"] = ids
+            runs["start"] = self.trackRows.rows + starts
+            runs["count"] = counts
+            self.trackRows.append(frames["first"][0] + order)
+            self.trackRuns.append(runs)
+            
+            self.frameFile.write(frames.tobytes())
+            self.frameFile.flush()
+
+    def close(self):
+        '''Writes the remaining frames and waits for the writer thread to finish.'''
+        self.flush()
+        self.writeQueue.put(None)
+        self.writer.join()
+        self.frameFile.close()
+        self.objectFile.close()
+        self.trackRows.close()
+        self.trackRuns.close()
+        self.writeInfo()
+
+
+
+class Session:
+    '''
+    The Session reads a session recorded with the SessionWriter, memory-mapping its files so only the queried parts are read from disk.
+
+    Frames are found by time with a binary search over the frames. Objects of a track are found with the index by id: a scan over the runs (one per track id per batch, so a fraction of the objects) and a gather of the rows of the matching runs. All times are capture timestamps in nanoseconds. A session that is still being recorded can be read as well, call refresh() to see the frames written since it was opened. The Session never writes to the session.
+
+    Args:
+        directory (str): directory the session was recorded to.
+
+    Attributes:
+        frames: memory-mapped array (with dtype frameDtype) of all frames.
+        objects: memory-mapped array (with dtype sessionObjectDtype) of the object records of all frames.
+        labels: the label names of the label codes in the object records.
+    '''
+    def __init__(self, directory:str):
+        self.directory = directory
+        self.refresh()
+
+    def refresh(self):
+        '''Reads the names and maps the files again, to see the frames written since the session was opened.'''
+        info = readInfo(self.directory)
+        self.labels = info["objectLabels"]
+        self.trackingStates = info["trackingStates"]
+        # The index first: the writer appends to it before the frames, so it covers all frames mapped after it
+        trackRows = mapArrayFile(os.path.join(self.directory, trackRowsFile))
+        trackRuns = mapArrayFile(os.path.join(self.directory, trackRunsFile))
+        self.trackRows = trackRows if trackRows is not None else np.empty(0, np.int64)
+        self.trackRuns = trackRuns if trackRuns is not None else np.empty(0, runDtype)
+        self.frames = mapFile(os.path.join(self.directory, framesFile), frameDtype)
+        self.objects = mapFile(os.path.join(self.directory, objectsFile), sessionObjectDtype)
+        # Only objects of complete frames count, the writer may be halfway through a batch
+        rows = int(self.frames["first"][-1] + self.frames["count"][-1]) if len(self.frames) > 0 else 0
+        self.objects = self.objects[:rows]
+
+    def __len__(self):
+        return len(self.frames)
+
+    def timeRange(self):
+        '''Returns the timestamps of the first and last frame, None if there are no frames.'''
+        if len(self.frames) == 0:
+            return None
+        return int(self.frames["timestamp"][0]), int(self.frames["timestamp"][-1])
+
+    def frameSlice(self, start:int=None, end:int=None):
+        '''Returns the slice of frames captured from start up to (not including) end, None for the first or last frame.'''
+        timestamps = self.frames["timestamp"]
+        first = 0 if start is None else int(np.searchsorted(timestamps, start, "left"))
+        last = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, "left"))
+        return slice(first, max(first, last))
+
+    def framesBetween(self, start:int=None, end:int=None):
+        '''Returns the frames captured from start up to (not including) end.'''
+        return self.frames[self.frameSlice(start, end)]
+
+    def objectsBetween(self, start:int=None, end:int=None):
+        '''Returns the object records of all frames captured from start up to (not including) end, as a view of the memory-mapped objects.'''
+        frames = self.framesBetween(start, end)
+        if len(frames) == 0:
+            return self.objects[0:0]
+        return self.objects[int(frames["first"][0]):int(frames["first"][-1] + frames["count"][-1])]
+
+    def trackIdList(self):
+        '''Returns the ids of all tracks in the session.'''
+        return np.unique(self.trackRuns["id"]).tolist()
+
+    def track(self, id:int, start:int=None, end:int=None):
+        '''Returns the object records of a track, in capture order, from start up to (not including) end. Only the records of the track are read.'''
+        # 1. The runs of the track, and the positions of their rows in trackRows
+        runs = self.trackRuns[self.trackRuns["id"] == id]
+        counts = runs["count"].astype(np.int64)
+        ends = np.cumsum(counts)
+        positions = np.repeat(runs["start"] - ends + counts, counts) + np.arange(ends[-1] if len(ends) > 0 else 0)
+        
+        # 2. The rows, in capture order, of the objects of complete frames only
+        rows = self.trackRows[positions]
+        rows = rows[:np.searchsorted(rows, len(self.objects))]
+        if start is not None or end is not None:
+            timestamps = self.objects["timestamp"][rows]
+            first = 0 if start is None else int(np.searchsorted(timestamps, start, "left"))
+            last = len(rows) if end is None else int(np.searchsorted(timestamps, end, "left"))
+            rows = rows[first:max(first, last)]
+        return self.objects[rows]
+
+    def frameObjects(self, frame:int):
+        '''Returns the object records of the frame with the given index.'''
+        first, count = int(self.frames["first"][frame]), int(self.frames["count"][frame])
+        return self.objects[first:first+count]
+
+
+
+def parseTime(text:str, session:Session):
+    '''Returns the timestamp (in nanoseconds) of a time given as a number of nanoseconds, an ISO date and time, or a time of day (e.g. 14:02) on the day the session started, in local time.'''
+    if text.isdigit():
+        return int(text)
+    try:
+        moment = datetime.datetime.fromisoformat(text)
+    except ValueError:
+        first = session.timeRange()
+        day = datetime.datetime.fromtimestamp(first[0] / 1e9).date() if first is not None else datetime.date.today()
+        moment = datetime.datetime.combine(day, datetime.time.fromisoformat(text))
+    return int(moment.timestamp() * 1e9)
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query a session recording.")
+    parser.add_argument("directory", help="session directory")
+    parser.add_argument("--track", type=int, help="only the objects of this track id")
+    parser.add_argument("--start", help="from this time (nanoseconds, ISO date and time, or time of day)")
+    parser.add_argument("--end", help="up to this time")
+    args = parser.parse_args()
+
+    session = Session(args.directory)
+    start = parseTime(args.start, session) if args.start is not None else None
+    end = parseTime(args.end, session) if args.end is not None else None
+    if args.track is not None:
+        objects = session.track(args.track, start, end)
+    else:
+        objects = session.objectsBetween(start, end)
+
+    print("Timestamp (ns),ID,Label,x-axis,y-axis,z-axis,Confidence,Predicted")
+    for row in objects:
+        x, y, z = row["position"].tolist()
+        print("%d,%d,%s,%.3f,%.3f,%.3f,%.1f,%d" % (row["timestamp"], row["id"], session.labels[row["label"]], x, y, z, row["confidence"], row["predicted"]))
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 18:26:40 2026
+
+The DetectionStreamer publishes the detected objects and feature values of every frame over a
+local UNIX or TCP socket, in compact binary batches. The StreamSubscriber receives them, e.g.
+in another service on the same machine:
+
+    python Streaming.py unix:///tmp/zed.sock   # print the frames published on this endpoint
+"""
+
+import os
+import sys
+import json
+import time
+import select
+import socket
+import struct
+import threading
+from collections import deque
+
+import numpy as np
+
+from typing import List, TYPE_CHECKING
+import Actors as A
+import FrameSources as FS
+if TYPE_CHECKING:
+    import ZEDFeatureExtractor as ZED
+
+
+# Objects as they are streamed (little-endian, 80 bytes per object)
+streamObjectDtype = np.dtype([("id", "<i4"),
+                              ("label", "S16"),
+                              ("confidence", "<f4"),
+                              ("position", "<f4", (3,)),
+                              ("velocity", "<f4", (3,)),
+                              ("bounding_box_2d", "<f4", (4,2))])
+
+# Message layout, all little-endian. A message is a batch of frames, preceded by its length:
+#   batch:  length (uint32), magic "ZEDS", version (uint8), number of frames (uint16), frames
+#   frame:  timestamp (int64), frameNumber (int64), number of objects (uint32), objects (streamObjectDtype), number of values (uint16), values
+#   value:  label (string), dtype (string, numpy descr as JSON), number of dimensions (uint8), shape (uint32 each), data (uint32 length + bytes)
+#   string: length (uint16) + utf-8
+streamMagic = b"ZEDS"
+streamVersion = 1
+batchHeader = struct.Struct("<4sBH")
+frameHeader = struct.Struct("<qqI")
+
+
+
+# =============================================================================
+# Encoding
+# =============================================================================
+def packString(text:str):
+    '''Returns a string as its length and utf-8 bytes.'''
+    data = text.encode()
+    return struct.pack("<H", len(data)) + data
+
+
+def unpackString(data, offset:int):
+    '''Returns the string at offset and the offset after it.'''
+    length, = struct.unpack_from("<H", data, offset)
+    offset += 2
+    return bytes(data[offset:offset+length]).decode(), offset + length
+
+
+def encodeFrame(timestamp:int, frameNumber:int, records:np.ndarray, values:dict):
+    '''Returns a frame as bytes: the objects (given as object records, see FrameSources.packObjects) and the values that are numbers or ndarrays (other values are left out).'''
+    objects = np.zeros(len(records), streamObjectDtype)
+    for name in ["id", "confidence", "position", "velocity", "bounding_box_2d"]:
+        objects[name] = records[name]
+    objects["label"] = np.array(FS.objectLabels.names, "S16")[records["label"]]
+
+    parts = [frameHeader.pack(timestamp, frameNumber, len(objects)), objects.tobytes()]
+    encoded = []
+    for label, value in values.items():
+        if isinstance(value, (int, float, np.number)):
+            value = np.asarray(value)
+        if not isinstance(value, np.ndarray) or value.dtype.hasobject:
+            continue
+        value = np.ascontiguousarray(value)
+        data = value.tobytes()
+        encoded.append(packString(label) + packString(json.dumps(np.lib.format.dtype_to_descr(value.dtype)))
+                       + struct.pack("<B%dI" % value.ndim, value.ndim, *value.shape) + struct.pack("<I", len(data)) + data)
+    parts.append(struct.pack("<H", len(encoded)))
+    parts.extend(encoded)
+    return b"".join(parts)
+
+
+def encodeBatch(frames:List[bytes]):
+    '''Returns a message holding the given encoded frames, preceded by its length.'''
+    body = batchHeader.pack(streamMagic, streamVersion, len(frames)) + b"".join(frames)
+    return struct.pack("<I", len(body)) + body
+
+
+def decodeBatch(body):
+    '''Returns the frames in a message (without its length) as dictionaries with timestamp, frameNumber, objects (ndarray with dtype streamObjectDtype) and values.'''
+    magic, version, count = batchHeader.unpack_from(body, 0)
+    if magic != streamMagic or version != streamVersion:
+        raise ValueError("Not a detection stream message (version %d)." % streamVersion)
+    offset = batchHeader.size
+    frames = []
+    for f in range(count):
+        timestamp, frameNumber, numObjects = frameHeader.unpack_from(body, offset)
+        offset += frameHeader.size
+        objects = np.frombuffer(body, streamObjectDtype, numObjects, offset)
+        offset += objects.nbytes
+
+        values = {}
+        numValues, = struct.unpack_from("<H", body, offset)
+        offset += 2
+        for v in range(numValues):
+            label, offset = unpackString(body, offset)
+            descr, offset = unpackString(body, offset)
+            ndim, = struct.unpack_from("<B", body, offset)
+            shape = struct.unpack_from("<%dI" % ndim, body, offset + 1)
+            length, = struct.unpack_from("<I", body, offset + 1 + 4 * ndim)
+            offset += 5 + 4 * ndim
+            dtype = np.lib.format.descr_to_dtype(json.loads(descr))
+            values[label] = np.frombuffer(body, dtype, int(np.prod(shape)), offset).reshape(shape)
+            offset += length
+        frames.append({"timestamp": timestamp, "frameNumber": frameNumber, "objects": objects, "values": values})
+    return frames
+
+
+def parseEndpoint(endpoint:str):
+    '''Returns the socket family and address of an endpoint, "unix:///path/to/socket" or "tcp://host:port".'''
+    if endpoint.startswith("unix://"):
+        return socket.AF_UNIX, endpoint[len("unix://"):]
+    if endpoint.startswith("tcp://"):
+        host, port = endpoint[len("tcp://"):].rsplit(":", 1)
+        return socket.AF_INET, (host, int(port))
+    raise ValueError("Unknown endpoint, expected unix://path or tcp://host:port: " + endpoint)
+
+
+
+# =============================================================================
+# DetectionStreamer
+# =============================================================================
+class DetectionStreamer(A.Actor):
+    '''
+    The DetectionStreamer is an Actor that publishes the objects and the expected values of each frame to all subscribers connected to its endpoint.
+
+    Frames are encoded on the capture thread (a few microseconds per object) and collected into batches of at most batchFrames frames or batchInterval seconds, so several frames share one send. A sender thread accepts subscribers and writes the batches to them without blocking: each subscriber has its own outgoing buffer, and batches are dropped (and counted) for a subscriber whose buffer is full, so a slow subscriber neither slows down the capture nor the other subscribers. Batches that the sender thread itself cannot keep up with are dropped as well, oldest first.
+
+    Args:
+        endpoint (str): where subscribers connect, "unix:///path/to/socket" or "tcp://host:port".
+        expectsValues (List[str]): labels of the feature values to stream along with the objects (values that are not numbers or ndarrays are left out).
+        batchFrames (int): maximum number of frames per batch.
+        batchInterval (float): a batch is also sent when its first frame is this many seconds old (checked as new frames arrive, and on stop()).
+        maxQueuedBatches (int): number of batches waiting for the sender thread before the oldest is dropped.
+        maxPendingBytes (int): size of the outgoing buffer of each subscriber.
+
+    Attributes:
+        sentFrames: number of frames handed to the sender thread.
+        droppedBatches: number of batches dropped, for the sender thread or for a subscriber.
+        subscribers: number of connected subscribers.
+    '''
+    def __init__(self, endpoint:str, expectsValues:List[str]=None, batchFrames:int=8, batchInterval:float=0.05, maxQueuedBatches:int=16, maxPendingBytes:int=4*2**20):
+        super().__init__(expectsValues if expectsValues is not None else [])
+        self.endpoint = endpoint
+        self.batchFrames = batchFrames
+        self.batchInterval = batchInterval
+        self.maxPendingBytes = maxPendingBytes
+
+        self.sentFrames = 0
+        self.droppedBatches = 0
+        self.subscribers = 0
+
+        # 1. Listen for subscribers
+        family, self.address = parseEndpoint(endpoint)
+        if family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)
+        self.server = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(self.address)
+        self.server.listen()
+        self.server.setblocking(False)
+
+        # 2. Start the sender thread, woken up through a pipe when a batch is queued
+        self.batch = []
+        self.batchStart = 0.0
+        self.queue = deque(maxlen=maxQueuedBatches)
+        self.lock = threading.Lock()
+        self.wakeRead, self.wakeWrite = os.pipe()
+        self.stopped = False
+        self.thread = threading.Thread(target=self.sendLoop, name="DetectionStreamer", daemon=True)
+        self.thread.start()
+
+    def update(self, capture:'ZED.CaptureZEDFeatures'):
+        '''Encodes the frame and sends the batch when it is full or has waited long enough.'''
+        values = {label: self.values[label] for label in self.expectsValues if label in self.values}
+        if not self.batch:
+            self.batchStart = time.perf_counter()
+        self.batch.append(encodeFrame(capture.getTimestamp(), capture.getFrameNumber(), capture.getObjectRecords(), values))
+        if len(self.batch) >= self.batchFrames or time.perf_counter() - self.batchStart >= self.batchInterval:
+            self.flush()
+
+    def flush(self):
+        '''Hands the frames collected so far to the sender thread, dropping the oldest waiting batch if the queue is full.'''
+        if not self.batch:
+            return
+        message = encodeBatch(self.batch)
+        with self.lock:
+            if len(self.queue) == self.queue.maxlen:
+                self.droppedBatches += 1
+            self.queue.append(message)
+        self.sentFrames += len(self.batch)
+        self.batch = []
+        os.write(self.wakeWrite, b"x")
+
+    def sendLoop(self):
+        '''Accepts subscribers and writes the queued batches to them, until stopped and all batches are written (or a second has passed).'''
+        outboxes = {} # subscriber socket -> bytes waiting to be sent
+        while True:
+            # 1. Distribute the queued batches, skipping subscribers that cannot keep up
+            with self.lock:
+                messages = list(self.queue)
+                self.queue.clear()
+                stopped = self.stopped
+            for message in messages:
+                for outbox in outboxes.values():
+                    if len(outbox) + len(message) <= self.maxPendingBytes:
+                        outbox += message
+                    else:
+                        self.droppedBatches += 1
+            waiting = [client for client, outbox in outboxes.items() if outbox]
+            if stopped and (not waiting or time.perf_counter() - self.stopTime > 1.0):
+                break
+
+            # 2. Accept subscribers and write to those that can take more
+            readable, writable, _ = select.select([self.server, self.wakeRead] + list(outboxes), waiting, [], 0.5)
+            for ready in readable:
+                if ready is self.server:
+                    client, _ = self.server.accept()
+                    client.setblocking(False)
+                    outboxes[client] = bytearray()
+                elif ready == self.wakeRead:
+                    os.read(self.wakeRead, 4096)
+                elif ready in outboxes:
+                    # Subscribers do not send anything, so readable means they disconnected
+                    try:
+                        if ready.recv(4096):
+                            continue
+                    except (BlockingIOError, InterruptedError):
+                        continue
+                    except OSError:
+                        pass
+                    ready.close()
+                    del outboxes[ready]
+            for client in writable:
+                if client not in outboxes:
+                    continue
+                try:
+                    sent = client.send(outboxes[client])
+                    del outboxes[client][:sent]
+                except (BlockingIOError, InterruptedError):
+                    pass
+                except OSError:
+                    client.close()
+                    del outboxes[client]
+            self.subscribers = len(outboxes)
+
+        for client in outboxes:
+            client.close()
+
+    def stop(self):
+        '''Sends the remaining frames, then disconnects all subscribers and stops listening.'''
+        self.flush()
+        with self.lock:
+            self.stopped = True
+            self.stopTime = time.perf_counter()
+        os.write(self.wakeWrite, b"x")
+        self.thread.join()
+        self.server.close()
+        os.close(self.wakeRead)
+        os.close(self.wakeWrite)
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+
+
+# =============================================================================
+# StreamSubscriber
+# =============================================================================
+class StreamSubscriber:
+    '''
+    The StreamSubscriber connects to a DetectionStreamer and receives the frames it publishes.
+
+        subscriber = StreamSubscriber("unix:///tmp/zed.sock")
+        for frame in subscriber.frames():
+            print(frame["timestamp"], frame["objects"]["position"], frame["values"])
+
+    Args:
+        endpoint (str): the endpoint of the DetectionStreamer.
+    '''
+    def __init__(self, endpoint:str):
+        family, address = parseEndpoint(endpoint)
+        self.socket = socket.socket(family, socket.SOCK_STREAM)
+        self.socket.connect(address)
+        self.buffer = bytearray()
+
+    def receive(self, timeout:float=None):
+        '''Returns the frames of the next batch, an empty list after the timeout, or None once the streamer disconnected.'''
+        self.socket.settimeout(timeout)
+        while True:
+            if len(self.buffer) >= 4:
+                length, = struct.unpack_from("<I", self.buffer, 0)
+                if len(self.buffer) >= 4 + length:
+                    body = bytes(self.buffer[4:4+length])
+                    del self.buffer[:4+length]
+                    return decodeBatch(body)
+            try:
+                data = self.socket.recv(1 << 16)
+            except socket.timeout:
+                return []
+            if not data:
+                return None
+            self.buffer += data
+
+    def frames(self):
+        '''Yields the received frames one by one, until the streamer disconnects.'''
+        while True:
+            batch = self.receive()
+            if batch is None:
+                return
+            for frame in batch:
+                yield frame
+
+    def close(self):
+        '''Disconnects from the streamer.'''
+        self.socket.close()
+
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python Streaming.py <endpoint>, e.g. unix:///tmp/zed.sock or tcp://127.0.0.1:5555")
+        exit(-1)
+    subscriber = StreamSubscriber(sys.argv[1])
+    for frame in subscriber.frames():
+        print("frame %d at %.3f s: %d objects, values %s" % (frame["frameNumber"], frame["timestamp"] / 1e9, len(frame["objects"]),
+              {label: value.tolist() for label, value in frame["values"].items()}))
+    subscriber.close()
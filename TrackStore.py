@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 16:48:13 2026
+
+The TrackStore keeps the recent history (position, timestamp, bounding box) of every tracked
+object id, in fixed-size circular buffers. The TrackPredictor uses it to skip object detection
+on some frames, predicting the objects from their tracks instead.
+"""
+
+import numpy as np
+
+import FrameSources as FS
+
+
+
+class TrackStore:
+    '''
+    The TrackStore keeps the last historyLength observations of each tracked object id, so features can look back without re-deriving the history.
+
+    All histories live in preallocated arrays with one row (a circular buffer) per track, so adding an observation is O(1) and does not allocate. Tracks that have not been seen for maxAge seconds are evicted and their row is reused.
+
+    Args:
+        historyLength (int): number of observations kept per track.
+        maxAge (float): seconds after which a track that has not been seen is evicted.
+        capacity (int): number of tracks allocated up front, doubled when more tracks are alive at once.
+        velocityWindow (int): number of observations the velocity and acceleration are estimated over.
+
+    Attributes:
+        slots: for each live track id, its row in the arrays.
+    '''
+    def __init__(self, historyLength:int=60, maxAge:float=2.0, capacity:int=64, velocityWindow:int=5):
+        self.historyLength = historyLength
+        self.maxAge = maxAge
+        self.velocityWindow = max(2, velocityWindow)
+        self.slots = {}
+        self.allocate(capacity)
+
+    def allocate(self, capacity:int):
+        '''Allocates (or grows) the arrays to hold the given number of tracks.'''
+        old = getattr(self, "capacity", 0)
+        arrays = {"positions": np.zeros((capacity, self.historyLength, 3), np.float32),
+                  "timestamps": np.zeros((capacity, self.historyLength), np.int64),
+                  "bboxes": np.zeros((capacity, self.historyLength, 4, 2), np.float32),
+                  "heads": np.zeros(capacity, np.int64),  # index of the next observation in each row
+                  "counts": np.zeros(capacity, np.int64), # number of observations in each row
+                  "lastSeen": np.zeros(capacity, np.int64),
+                  "ids": np.full(capacity, -1, np.int64)}
+        for name, array in arrays.items():
+            if old > 0:
+                array[:old] = getattr(self, name)
+            setattr(self, name, array)
+        self.free = list(range(capacity - 1, old - 1, -1)) + (self.free if old > 0 else [])
+        self.capacity = capacity
+
+    def update(self, timestamp:int, records:np.ndarray):
+        '''Adds the objects of a frame (captured at timestamp, in nanoseconds, as object records, see FrameSources.packObjects) to their tracks and evicts tracks that have not been seen for maxAge.'''
+        ids, positions, bboxes = records["id"].tolist(), records["position"], records["bounding_box_2d"]
+        for i in range(len(ids)):
+            self.append(ids[i], timestamp, positions[i], bboxes[i])
+        self.evict(timestamp)
+
+    def append(self, id:int, timestamp:int, position, bounding_box=None):
+        '''Adds a single observation to the track of the given id, starting a new track if needed.'''
+        slot = self.slots.get(id)
+        if slot is None:
+            if not self.free:
+                self.allocate(2 * self.capacity)
+            slot = self.free.pop()
+            self.slots[id] = slot
+            self.ids[slot] = id
+            self.heads[slot] = 0
+            self.counts[slot] = 0
+        head = self.heads[slot]
+        self.positions[slot, head] = position
+        self.timestamps[slot, head] = timestamp
+        if bounding_box is not None:
+            self.bboxes[slot, head] = bounding_box
+        self.heads[slot] = (head + 1) % self.historyLength
+        self.counts[slot] = min(self.counts[slot] + 1, self.historyLength)
+        self.lastSeen[slot] = timestamp
+
+    def evict(self, timestamp:int):
+        '''Removes the tracks that have not been seen for maxAge seconds before timestamp.'''
+        cutoff = timestamp - int(self.maxAge * 1e9)
+        for slot in np.flatnonzero((self.ids >= 0) & (self.lastSeen < cutoff)).tolist():
+            del self.slots[int(self.ids[slot])]
+            self.ids[slot] = -1
+            self.free.append(slot)
+
+    def __contains__(self, id:int):
+        return id in self.slots
+
+    def __len__(self):
+        return len(self.slots)
+
+    def getIds(self):
+        '''Returns the ids of all live tracks.'''
+        return list(self.slots)
+
+    def order(self, slot:int, n:int=None):
+        '''Returns the indices of the last n observations in a row, oldest first.'''
+        count = self.counts[slot] if n is None else min(n, self.counts[slot])
+        return (self.heads[slot] - count + np.arange(count)) % self.historyLength
+
+    def history(self, id:int, n:int=None):
+        '''Returns the timestamps, positions and bounding boxes of the last n (default: all kept) observations of a track, oldest first.'''
+        slot = self.slots[id]
+        indices = self.order(slot, n)
+        return self.timestamps[slot, indices], self.positions[slot, indices], self.bboxes[slot, indices]
+
+    def lastPosition(self, id:int):
+        '''Returns the timestamp and position of the last observation of a track.'''
+        slot = self.slots[id]
+        last = (self.heads[slot] - 1) % self.historyLength
+        return self.timestamps[slot, last], self.positions[slot, last]
+
+    def velocity(self, id:int):
+        '''Returns the velocity (meters per second) of a track over the last velocityWindow observations, zero if it has only been seen once.'''
+        timestamps, positions, _ = self.history(id, self.velocityWindow)
+        if len(timestamps) < 2 or timestamps[-1] == timestamps[0]:
+            return np.zeros(3, np.float32)
+        return (positions[-1] - positions[0]) / ((timestamps[-1] - timestamps[0]) / 1e9)
+
+    def boxVelocity(self, id:int):
+        '''Returns the velocity (pixels per second) of the (4,2) bounding box corners of a track over the last velocityWindow observations, zero if it has only been seen once.'''
+        timestamps, _, bboxes = self.history(id, self.velocityWindow)
+        if len(timestamps) < 2 or timestamps[-1] == timestamps[0]:
+            return np.zeros((4,2), np.float32)
+        return (bboxes[-1] - bboxes[0]) / ((timestamps[-1] - timestamps[0]) / 1e9)
+
+    def acceleration(self, id:int):
+        '''Returns the acceleration (meters per second squared) of a track, from the velocities over both halves of the last velocityWindow observations.'''
+        timestamps, positions, _ = self.history(id, self.velocityWindow)
+        if len(timestamps) < 3:
+            return np.zeros(3, np.float32)
+        middle = len(timestamps) // 2
+        seconds = timestamps / 1e9
+        if seconds[middle] == seconds[0] or seconds[-1] == seconds[middle]:
+            return np.zeros(3, np.float32)
+        first = (positions[middle] - positions[0]) / (seconds[middle] - seconds[0])
+        second = (positions[-1] - positions[middle]) / (seconds[-1] - seconds[middle])
+        return (second - first) / ((seconds[-1] - seconds[0]) / 2)
+
+    def velocities(self):
+        '''Returns the ids, last positions and velocities of all live tracks as arrays, computed for all tracks at once.'''
+        slots = np.array(list(self.slots.values()), np.int64)
+        if len(slots) == 0:
+            return np.empty(0, np.int64), np.empty((0,3), np.float32), np.empty((0,3), np.float32)
+        count = np.minimum(self.counts[slots], self.velocityWindow)
+        last = (self.heads[slots] - 1) % self.historyLength
+        first = (self.heads[slots] - count) % self.historyLength
+        seconds = (self.timestamps[slots, last] - self.timestamps[slots, first]) / 1e9
+        positions = self.positions[slots, last]
+        moved = positions - self.positions[slots, first]
+        velocities = np.zeros_like(moved)
+        np.divide(moved, seconds[:,None], out=velocities, where=seconds[:,None] > 0)
+        return self.ids[slots], positions, velocities
+
+
+
+class TrackPredictor:
+    '''
+    The TrackPredictor lets the capture run object detection on a subset of the frames only. For the other frames it predicts the objects of the last detection with constant velocity, from their tracks in a TrackStore. Predicted objects have their predicted attribute set.
+
+    Detection runs every stride frames, and sooner when maxShift is given and a bounding box is expected to have moved more than maxShift pixels since the last detection, so fast motion is detected more often than a still scene.
+
+    Args:
+        stride (int): run detection at least every stride frames, 1 to detect every frame.
+        maxShift (float): detect as soon as a bounding box may have moved this many pixels since the last detection, None to only use the stride.
+        store (TrackStore): the tracks to predict from, a new TrackStore if not given.
+
+    Attributes:
+        detectedFrames: number of frames with detection.
+        predictedFrames: number of frames with predicted objects.
+    '''
+    def __init__(self, stride:int=3, maxShift:float=None, store:TrackStore=None):
+        self.stride = stride
+        self.maxShift = maxShift
+        self.store = store if store is not None else TrackStore()
+        self.detected = np.empty(0, FS.objectDtype) # the object records of the last detection
+        self.lastDetection = None
+        self.framesSinceDetection = 0
+        self.maxBoxSpeed = 0.0 # pixels per second of the fastest bounding box corner at the last detection
+        self.detectedFrames = 0
+        self.predictedFrames = 0
+
+    def shouldDetect(self, timestamp:int):
+        '''Returns whether objects should be detected for the frame captured at timestamp (in nanoseconds), instead of predicted.'''
+        if self.lastDetection is None or self.framesSinceDetection + 1 >= self.stride:
+            return True
+        return self.maxShift is not None and self.maxBoxSpeed * (timestamp - self.lastDetection) / 1e9 > self.maxShift
+
+    def update(self, timestamp:int, records:np.ndarray):
+        '''Adds the detected objects of a frame (as object records) to their tracks, and takes their positions, bounding boxes and velocities to predict from.'''
+        store = self.store
+        store.update(timestamp, records)
+        self.detected = records.copy()
+        n = len(records)
+        self.velocities = np.empty((n,3), np.float32)
+        self.boxVelocities = np.empty((n,4,2), np.float32)
+        for i, id in enumerate(records["id"].tolist()):
+            self.velocities[i] = store.velocity(id)
+            self.boxVelocities[i] = store.boxVelocity(id)
+        self.maxBoxSpeed = float(np.abs(self.boxVelocities).max()) if n > 0 else 0.0
+        self.lastDetection = timestamp
+        self.framesSinceDetection = 0
+        self.detectedFrames += 1
+
+    def predict(self, timestamp:int):
+        '''Returns the objects of the last detection, moved with constant velocity to the frame captured at timestamp.'''
+        seconds = (timestamp - self.lastDetection) / 1e9
+        records = self.detected.copy()
+        records["position"] += self.velocities * seconds
+        records["velocity"] = self.velocities
+        records["bounding_box_2d"] += self.boxVelocities * seconds
+        records["predicted"] = True
+        records.flags.writeable = False
+        self.framesSinceDetection += 1
+        self.predictedFrames += 1
+        objects = FS.unpackObjects(records, timestamp)
+        objects.predicted = True
+        return objects
@@ -5,114 +5,329 @@ Created on Mon Aug 24 11:43:25 2020
 @author: jhvroon
 """
 
-import _thread
+import threading
+import time
+import argparse
+
+import numpy as np
 
-import pyzed.sl as sl
-import cv2
 from typing import List
 
 import Features as F
 import Actors as A
+import FrameSources as FS
+import FrameBuffer as FB
+import FeatureScheduler as FSched
+import Profiling as P
+import FeatureWorkers as FW
+import CaptureProfile as CP
+import TrackStore as TS
+
+
+
+class CaptureError(RuntimeError):
+    '''Raised when the frame source cannot be opened.'''
+    pass
+
 
 
 class CaptureZEDFeatures:
     '''
-    The CaptureZEDFeatures captures features from the ZED2 camera.
+    The CaptureZEDFeatures captures features from the ZED2 camera, or from another FrameSource.
+    
+    The source is opened on the first run() (or with open()) and stays open when the capture is stopped, so run() can be called again without re-opening the camera and re-enabling tracking and object detection. The capture can be paused and resumed while it runs. When grabbing fails maxFailures times in a row (e.g. the camera was unplugged), the source is re-opened, retrying with a growing delay until it succeeds or the capture is stopped.
     
     Args:
         featureExtractor (FeatureExtractor): used to connect the extracted features baked into the ZED2 camera to other features and actors defined in this package.
         trackPeople (bool): indicates whether people tracking should be enabled. Should in most cases be used (otherwise, why use the ZED 2?), but can be disabled to save on resources.
+        source (FrameSource): where the frames come from, defaults to the live ZED 2 camera.
+        bufferSize (int): if larger than 0, frames are grabbed on a separate thread into a FrameRing with this many slots, so slow features and actors do not slow down grabbing. If 0, grabbing and feature extraction alternate on a single thread.
+        bufferPolicy (str): what the grab thread does when the buffer is full, one of FrameBuffer.bufferPolicies.
+        profiler (Profiler): measures the grab and retrieve stages, a disabled Profiler if not given.
+        needsDepth (bool): whether the depth map should be retrieved. When tracking people, it is only retrieved for frames with detected objects.
+        needsPointCloud (bool): whether the point cloud should be retrieved, with the same restriction.
+        adaptive (AdaptiveResolution): if given, is told how long the features and actors take for each frame, and switches the source to the video mode it picks.
+        predictor (TrackPredictor): if given, objects are only detected on the frames it picks, and predicted from their tracks on the other frames.
         
     Attributes:
         featureExtractor: stores the featureExtractor
-        zed: the camera object
-        runtime_parameters: parameters for configuring the camera
+        source: the frame source
         trackpeople: stores if we should track people
-        detection_parameters_rt: if we track people, holds parameters for configuring the camera to do so
         objects: the detected objects
         image: the recorded image
+        depth: the depth map of the recorded image, None if not retrieved for this frame
+        pointCloud: the point cloud of the recorded image, None if not retrieved for this frame
+        timestamp: capture time of the recorded image in nanoseconds
+        frameNumber: number of the recorded image since the capture was started
+        frame: read-only access to the buffers of the current frame
+        pool: the BufferPool copies of the frames are taken from
+        ring: the FrameRing between the grab thread and the features, if buffered
+        maxFailures: number of failed grabs in a row after which the source is re-opened
+        reconnectDelay: seconds to wait before the first retry when re-opening the source fails, doubled for every retry up to maxReconnectDelay
+        reconnects: number of times the source was re-opened
     '''
-    def __init__(self, featureExtractor, trackPeople):
+    def __init__(self, featureExtractor, trackPeople, source:FS.FrameSource=None, bufferSize:int=0, bufferPolicy:str=FB.dropOldestPolicy, profiler:P.Profiler=None, needsDepth:bool=False, needsPointCloud:bool=False, adaptive:CP.AdaptiveResolution=None, predictor:TS.TrackPredictor=None):
         self.featureExtractor = featureExtractor
+        self.adaptive = adaptive
+        self.predictor = predictor
+        self.pendingMode = None
+        self.needsDepth = needsDepth
+        self.needsPointCloud = needsPointCloud
+        self.bufferSize = bufferSize
+        self.bufferPolicy = bufferPolicy
+        self.ring = None
+        self.profiler = profiler if profiler is not None else P.Profiler()
         
-        # 1. Create the ZED camera object:
-        # Create a Camera object
-        self.zed = sl.Camera()
-        # Create a InitParameters object and set configuration parameters
-        init_params = sl.InitParameters()
-        init_params.camera_resolution = sl.RESOLUTION.HD720  # Use HD720 video mode
-        init_params.camera_fps = 60  # Set fps at 15
-        init_params.coordinate_units = sl.UNIT.METER # Set units in meters
-        # Open the camera
-        err = self.zed.open(init_params)
-        if err != sl.ERROR_CODE.SUCCESS:
-            exit(1)
-        
-        self.runtime_parameters = sl.RuntimeParameters()
-        self.runtime_parameters.sensing_mode = sl.SENSING_MODE.STANDARD  # Use STANDARD sensing mode
-        
-        # Setting the depth confidence parameters
-        self.runtime_parameters.confidence_threshold = 100
-        self.runtime_parameters.textureness_confidence_threshold = 100
-        
-        # 2. If we are to track people, initialize:
+        # 1. The frame source (the ZED camera unless specified otherwise), opened on the first run:
+        self.source = source if source is not None else FS.ZEDFrameSource()
         self.trackPeople = trackPeople
-        if self.trackPeople:
-            # Set initialization parameters
-            obj_param = sl.ObjectDetectionParameters()
-            obj_param.enable_tracking = True
-        
-            #Configuration for Tracking Object Motion in Runtime using positional tracking
-            if obj_param.enable_tracking:
-                # Set positional tracking parameters
-                positional_tracking_parameters = sl.PositionalTrackingParameters()
-                positional_tracking_parameters.set_floor_as_origin = True
-        
-                # Enable positional tracking
-                self.zed.enable_positional_tracking(positional_tracking_parameters)
-        
-            # Set runtime parameters
-            self.detection_parameters_rt = sl.ObjectDetectionRuntimeParameters()
-            self.detection_parameters_rt.detection_confidence_threshold = 40
-        
-            # Enable object detection with initialization parameters
-            zed_error = self.zed.enable_object_detection(obj_param)
-            if zed_error != sl.ERROR_CODE.SUCCESS :
-                print("enable_object_detection", zed_error, "\nExit program.")
-                self.zed.close()
-                exit(-1)
-            
-            self.objects = sl.Objects() # Structure containing all the detected objects
+        self.opened = False
         
-        #Capture images and depth using point_cloud,
-        self.image = sl.Mat()
+        # 2. Lifecycle
+        self.stopped = False
+        self.paused = False
+        self.condition = threading.Condition()
+        self.maxFailures = 30
+        self.reconnectDelay = 0.5
+        self.maxReconnectDelay = 10.0
+        self.failures = 0
+        self.reconnects = 0
+        self.nextFrameNumber = 0
         
+        self.objects = None
+        self.records = np.empty(0, FS.objectDtype)
+        self.image = None
+        self.depth = None
+        self.pointCloud = None
+        self.timestamp = 0
+        self.frameNumber = 0
+        self.objectsKey = None
+        self.pool = FB.BufferPool()
+        self.frame = FB.Frame(self.pool)
         
     
+    def open(self):
+        '''Opens the frame source, if it is not open yet. Raises a CaptureError if it cannot be opened.'''
+        if not self.opened:
+            if not self.source.open(self.trackPeople):
+                raise CaptureError("Unable to open the frame source.")
+            self.opened = True
+    
+    def close(self):
+        '''Closes the frame source. The capture should be stopped first.'''
+        if self.opened:
+            self.source.close()
+            self.opened = False
+    
     def run(self):
-        '''Runs the camera and feature extraction until the stop function is called.'''
-        self.stopped = False
+        '''Runs the camera and feature extraction until the stop function is called (also when called before run), or until the source runs out of frames (which closes the source).'''
+        self.open()
+        if self.bufferSize > 0:
+            self.runBuffered()
+        else:
+            profiler = self.profiler
+            while self.waitWhilePaused() and self.source.hasFrames():
+                self.switchMode()
+                # Grab an image, a new image is available if grab() returns True
+                if self.grab():
+                    start = profiler.start()
+                    self.image = self.source.retrieveImage()
+                    profiler.stop("retrieveImage", start)
+                    self.timestamp = self.source.getTimestamp()
+                    self.frameNumber = self.nextFrameNumber
+                    self.nextFrameNumber += 1
+                    
+                    if self.trackPeople:
+                        self.objects, self.records = self.retrieveObjects(self.timestamp)
+                    self.depth, self.pointCloud = self.retrieveDepth()
+                    
+                    self.processFrame()
+    
+        # Close the camera once it has no more frames to give, otherwise keep it open for the next run
+        if not self.source.hasFrames():
+            self.close()
+        with self.condition:
+            self.stopped = False
+    
+    def runBuffered(self):
+        '''Runs the grab loop on a separate thread and the feature extraction on this thread, with a FrameRing in between.'''
+        # 1. Allocate all slots up front, they are reused for every frame
+        slots = [FB.FrameSlot(self.source.createImage(), self.source.createObjects() if self.trackPeople else None,
+                              self.source.createDepth() if self.needsDepth else None, self.source.createPointCloud() if self.needsPointCloud else None)
+                 for i in range(self.bufferSize)]
+        self.ring = FB.FrameRing(slots, self.bufferPolicy)
         
-        while not self.stopped:
-            # Grab an image, a RuntimeParameters object must be given to grab()
-            if self.zed.grab(self.runtime_parameters) == sl.ERROR_CODE.SUCCESS:
-                # A new image is available if grab() returns SUCCESS
-                self.zed.retrieve_image(self.image, sl.VIEW.LEFT)
-                
+        # 2. Start grabbing
+        grabThread = threading.Thread(target=self.grabLoop, name="ZEDGrab", daemon=True)
+        grabThread.start()
+        
+        # 3. Process frames until the grab loop closes the ring. The ring is closed and the grab thread joined even if a feature or actor raises, so the grab thread never stays blocked on the ring
+        try:
+            while not self.stopped:
+                slot = self.ring.acquireRead()
+                if slot is None:
+                    break
+                self.image = slot.image
+                self.timestamp = slot.timestamp
+                self.frameNumber = slot.frameNumber
                 if self.trackPeople:
-                    self.zed.retrieve_objects(self.objects, self.detection_parameters_rt)
-                    self.obj_array = self.objects.object_list
-                
-                self.image_data = self.image.get_data()
-                  
-                self.featureExtractor.onFeatureUpdate()
-    
-        # Close the camera
-        self.zed.close()      
+                    self.objects = slot.predicted if slot.predicted is not None else slot.objects
+                    self.records = slot.records
+                self.depth = slot.depth if slot.hasDepth else None
+                self.pointCloud = slot.pointCloud if slot.hasDepth else None
+                self.processFrame()
+                self.ring.releaseRead(slot)
+        finally:
+            self.ring.close()
+            grabThread.join()
+        self.ring = None
+    
+    def processFrame(self):
+        '''Runs the features and actors on the current frame.'''
+        self.frame.set(self.image, self.timestamp, self.frameNumber, self.depth, self.pointCloud)
+        self.image_data = self.frame.getImageData()
+        self.objectsKey = None
+        
+        start = time.perf_counter()
+        try:
+            self.featureExtractor.onFeatureUpdate()
+        finally:
+            # The copies borrowed from the pool for this frame go back even if a feature or actor raised
+            self.frame.release()
+        if self.adaptive is not None:
+            current = self.adaptive.getMode()
+            mode = self.adaptive.update(time.perf_counter() - start)
+            if mode is not None:
+                # Keep the mode the source runs in, to go back to if the switch fails
+                pending = self.pendingMode
+                self.pendingMode = (mode, pending[1] if pending is not None else current)
+    
+    def switchMode(self):
+        '''Switches the source to the video mode picked by the AdaptiveResolution, if it picked a new one. Called on the grab thread, between grabs. If the source cannot switch, the AdaptiveResolution goes back to the mode the source kept.'''
+        pending = self.pendingMode
+        if pending is None:
+            return
+        self.pendingMode = None
+        mode, current = pending
+        if not self.source.reconfigure(*mode):
+            print("Unable to switch the frame source to %s at %d fps." % mode)
+            self.adaptive.setMode(current)
+    
+    def grabLoop(self):
+        '''Grabs frames into the FrameRing until stopped or the source runs out of frames.'''
+        profiler = self.profiler
+        while self.waitWhilePaused() and self.source.hasFrames():
+            self.switchMode()
+            if not self.grab():
+                continue
+            slot = self.ring.acquireWrite()
+            if slot is None:
+                break
+            start = profiler.start()
+            self.source.retrieveImage(slot.image)
+            profiler.stop("retrieveImage", start)
+            slot.timestamp = self.source.getTimestamp()
+            if self.trackPeople:
+                objects, slot.records = self.retrieveObjects(slot.timestamp, slot.objects)
+                slot.predicted = objects if objects is not slot.objects else None
+            depth, pointCloud = self.retrieveDepth(slot.depth, slot.pointCloud, slot.records if self.trackPeople else None)
+            slot.hasDepth = depth is not None or pointCloud is not None
+            slot.frameNumber = self.nextFrameNumber
+            self.nextFrameNumber += 1
+            self.ring.commitWrite(slot)
+        self.ring.close()
+    
+    def grab(self):
+        '''Grabs the next frame, returns whether a new frame is available. Re-opens the source after maxFailures failed grabs in a row.'''
+        start = self.profiler.start()
+        grabbed = self.source.grab()
+        self.profiler.stop("grab", start)
+        if grabbed:
+            self.failures = 0
+        else:
+            self.failures += 1
+            if self.failures >= self.maxFailures and self.source.hasFrames():
+                self.reconnect()
+        return grabbed
+    
+    def reconnect(self):
+        '''Closes and re-opens the source, retrying with a growing delay until it succeeds or the capture is stopped. Returns whether the source is open again.'''
+        delay = self.reconnectDelay
+        while not self.stopped:
+            self.source.close()
+            if self.source.open(self.trackPeople):
+                self.failures = 0
+                self.reconnects += 1
+                return True
+            with self.condition:
+                self.condition.wait_for(lambda: self.stopped, delay)
+            delay = min(2 * delay, self.maxReconnectDelay)
+        return False
+    
+    def waitWhilePaused(self):
+        '''Waits while the capture is paused. Returns False once the capture is stopped.'''
+        with self.condition:
+            self.condition.wait_for(lambda: self.stopped or not self.paused)
+            return not self.stopped
             
+    def retrieveObjects(self, timestamp:int, objects=None):
+        '''Retrieves the objects of the grabbed frame (into objects, if given), or predicts them when the predictor skips detection for this frame. Returns the objects and their object records (see FrameSources.packObjects), which are packed here once so the features and actors can share them.'''
+        profiler = self.profiler
+        predictor = self.predictor
+        if predictor is not None and not predictor.shouldDetect(timestamp):
+            start = profiler.start()
+            objects = predictor.predict(timestamp)
+            profiler.stop("predictObjects", start)
+            return objects, objects.records
+        
+        start = profiler.start()
+        objects = self.source.retrieveObjects(objects)
+        profiler.stop("retrieveObjects", start)
+        start = profiler.start()
+        records = FS.packObjects(objects)
+        profiler.stop("packObjects", start)
+        if predictor is not None:
+            predictor.update(timestamp, records)
+        return objects, records
+    
+    def retrieveDepth(self, depth=None, pointCloud=None, records=None):
+        '''Retrieves the depth map and/or point cloud of the grabbed frame, if needed. When tracking people, frames without detected objects are skipped, as there is nothing to measure. Returns the depth map and point cloud, or None for each that was not retrieved.'''
+        if not self.needsDepth and not self.needsPointCloud:
+            return None, None
+        records = records if records is not None else self.records
+        if self.trackPeople and len(records) == 0:
+            return None, None
+        
+        profiler = self.profiler
+        if self.needsDepth:
+            start = profiler.start()
+            depth = self.source.retrieveDepth(depth)
+            profiler.stop("retrieveDepth", start)
+        if self.needsPointCloud:
+            start = profiler.start()
+            pointCloud = self.source.retrievePointCloud(pointCloud)
+            profiler.stop("retrievePointCloud", start)
+        return depth if self.needsDepth else None, pointCloud if self.needsPointCloud else None
+    
     def stop(self):
-        '''Stops the camera and feature extraction. (Note: you cannot restart the camera after calling stop, as currently the camera object is destroyed.)'''
-        self.stopped = True
+        '''Stops the camera and feature extraction: run() returns after the current frame. The source stays open, call run() again to restart quickly, or close() to close it.'''
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        ring = self.ring
+        if ring is not None:
+            ring.close()
+    
+    def pause(self):
+        '''Pauses grabbing, the source stays open.'''
+        with self.condition:
+            self.paused = True
+    
+    def resume(self):
+        '''Resumes grabbing after pause().'''
+        with self.condition:
+            self.paused = False
+            self.condition.notify_all()
             
     def getObjects(self):
         '''Returns the objects detected in the most recent frame from the camera.'''
@@ -120,44 +335,126 @@ class CaptureZEDFeatures:
         
     def getObjectArray(self):
         '''Returns the array of objects from the objects detected in the most recent frame from the camera. Can also be extracted manually with getObjects().object_list'''
-        return self.obj_array
+        return self.objects.object_list if self.objects is not None else []
+    
+    def getObjectRecords(self):
+        '''Returns the objects detected in the most recent frame as object records: a read-only structured array (with dtype FrameSources.objectDtype) with one record per object, in the order of getObjectArray(). Packed once per frame and shared by all features and actors, read its columns (e.g. getObjectRecords()["position"]) instead of walking the object array.'''
+        return self.records
+    
+    def isPredicted(self):
+        '''Returns whether the objects of the most recent frame were predicted from their tracks (see TrackPredictor) instead of detected.'''
+        return getattr(self.objects, "predicted", False)
     
     def getImage(self):
         '''Returns the latest frame from the camera.'''
         return self.image
     
     def getImageData(self):
-        '''Returns data from the latest frame from the camera. Can also be extracted manually with getImage().getData()'''
+        '''Returns a read-only view of the data from the latest frame from the camera. To draw on the image, get a copy with getFrame().getWritableImageData()'''
         return self.image_data
+    
+    def getDepthData(self):
+        '''Returns a read-only view of the depth map of the latest frame, None if it was not retrieved.'''
+        return self.frame.getDepthData()
+    
+    def getPointCloudData(self):
+        '''Returns a read-only view of the point cloud of the latest frame, None if it was not retrieved.'''
+        return self.frame.getPointCloudData()
+    
+    def getFrame(self):
+        '''Returns the latest frame, with read-only views and copy-on-write access to its buffers.'''
+        return self.frame
+    
+    def getTimestamp(self):
+        '''Returns the time the latest frame was captured, in nanoseconds.'''
+        return self.timestamp
+    
+    def getFrameNumber(self):
+        '''Returns the number of the latest frame since the capture was started. With a buffer, numbers of dropped frames are skipped.'''
+        return self.frameNumber
+    
+    def getInputKey(self, input:str):
+        '''Returns a key for an input of the current frame (see Feature.inputs) that only changes when the input changes.'''
+        if input == F.objectsInput:
+            if self.objectsKey is None:
+                self.objectsKey = self.records.tobytes()
+            return self.objectsKey
+        return self.frameNumber
+    
+    def getBufferStats(self):
+        '''Returns the grabbed, processed, dropped and queued frame counters of the buffer, or None when running without a buffer.'''
+        if self.ring is None:
+            return None
+        return self.ring.getStats()
 
 
 
 
 class FeatureExtractor:    
-    def __init__(self, features:List[F.Feature], actors:List[A.Actor]):
+    '''
+    The FeatureExtractor runs all features and actors on each frame captured by its CaptureZEDFeatures.
+    
+    Args:
+        features (List[Feature]): the features to compute, in any order as long as the features they depend on are listed as well.
+        actors (List[Actor]): the actors to update after the values they expect have been computed.
+        source (FrameSource): where the frames come from, defaults to the live ZED 2 camera.
+        bufferSize (int): number of frames buffered between grabbing and feature extraction, 0 to grab and extract on a single thread.
+        bufferPolicy (str): what to do when the buffer is full, one of FrameBuffer.bufferPolicies.
+        workers (int): number of threads to compute independent features on in parallel, 1 to compute all features on the capture thread.
+        profiler (Profiler): measures the duration of each stage, each feature and each actor. A disabled Profiler if not given, enable it with profiler.enable().
+        processes (int): number of worker processes for the features with runInWorker set.
+        adaptive (AdaptiveResolution): if given, steps the video mode of the source down when the features and actors cannot keep up, and back up when there is headroom.
+        predictor (TrackPredictor): if given, objects are only detected on some frames (e.g. every third frame) and predicted with constant velocity on the others, trading some accuracy for throughput.
+        
+    The FeatureExtractor can be used as a context manager, which closes it (stopping the capture, the actors and the workers, and closing the source) when done:
+        
+        with FeatureExtractor(features, actors) as extractor:
+            extractor.start()
+            extractor.wait()
+    
+    Raises:
+        ValueError: if features depend on features that are not listed, or on each other in a cycle.
+    '''
+    def __init__(self, features:List[F.Feature], actors:List[A.Actor], source:FS.FrameSource=None, bufferSize:int=0, bufferPolicy:str=FB.dropOldestPolicy, workers:int=1, profiler:P.Profiler=None, processes:int=1, adaptive:CP.AdaptiveResolution=None, predictor:TS.TrackPredictor=None):
         self.features = features
         self.actors = actors
+        self.profiler = profiler if profiler is not None else P.Profiler()
+        
+        self.thread = None
+        self.error = None
+        self.closed = False
         
         dependenciesOK, needsTrackPeople = self.checkFeatures(self.features)
         if not dependenciesOK:
-            print("Not all feature dependencies are supplied in the feature list.\nExit program.")
-            exit(-1)
+            raise ValueError("Not all feature dependencies are supplied in the feature list.")
         dependenciesOK = self.checkActors(self.actors, self.features)
         
-        self.capture = CaptureZEDFeatures(self, needsTrackPeople)
+        # Order the features by their dependencies, so they can be computed in parallel where possible
+        self.graph = FSched.FeatureGraph(self.features, self.actors)
+        cycle = self.graph.findCycle()
+        if cycle is not None:
+            raise ValueError("Features depend on each other in a cycle: " + " -> ".join(feature.label for feature in cycle))
+        self.features = self.graph.sortedFeatures()
+        
+        # Start worker processes for the features that should not run in-process
+        workerFeatures = [feature for feature in self.features if feature.runInWorker]
+        workerPool = FW.FeatureWorkerPool(workerFeatures, processes) if workerFeatures else None
+        self.scheduler = FSched.FeatureScheduler(self.graph, workers, self.profiler, workerPool)
+        
+        needsDepth = any(feature.needsDepth for feature in self.features)
+        needsPointCloud = any(feature.needsPointCloud for feature in self.features)
+        self.capture = CaptureZEDFeatures(self, needsTrackPeople, source, bufferSize, bufferPolicy, self.profiler, needsDepth, needsPointCloud, adaptive, predictor)
     
     def checkFeatures(self, features:List[F.Feature]):
-        '''Returns if all features only depend on features that are listed earlier in the list. Also checks if any feature needs to track people.'''
+        '''Returns if all features only depend on features that are listed in the list. Also checks if any feature needs to track people.'''
         dependenciesOK = True
         needsTrackPeople = False
-        checked = []
         for feature in features:
             if not needsTrackPeople:
                 needsTrackPeople = feature.needsTrackPeople
             for featureNeeded in feature.dependentOn:
-                if checked.count(featureNeeded) <= 0:
+                if features.count(featureNeeded) <= 0:
                     dependenciesOK = False
-            checked.append(feature)
         return dependenciesOK, needsTrackPeople
     
     def checkActors(self, actors:List[A.Actor], features:List[F.Feature]):
@@ -173,27 +470,85 @@ class FeatureExtractor:
         return dependenciesOK
                     
     def start(self):
-        '''Starts the ZED2 capture. Also starts a key listener that terminates the capture when the user presses the q-key.'''
+        '''Opens the source (raising a CaptureError if it cannot be opened) and starts the capture on a separate thread. Starting again after stop() reuses the open source.'''
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.capture.open()
+        self.error = None
+        self.thread = threading.Thread(target=self.runCapture, name="ZEDCapture", daemon=True)
+        self.thread.start()
+    
+    def runCapture(self):
+        '''Runs the capture, keeping the exception (if any) for wait().'''
         try:
-            _thread.start_new_thread( self.capture.run )
-            
-            def stopFunction(capture:CaptureZEDFeatures):
-                key = ''
-                while key != 113:
-                    key = cv2.waitKey(5)
-                capture.stop()
-                for actor in self.actors:
-                    actor.stop()
-            _thread.start_new_thread( stopFunction , (self.capture) )
-        except:
-            print("Error: unable to start thread")
+            self.capture.run()
+        except Exception as error:
+            self.error = error
+    
+    def wait(self, timeout:float=None):
+        '''Waits until the capture ends (the source runs out of frames, or stop() is called), or until an actor requests to quit (e.g. the q-key in the Cv2Plotter window), which stops the capture. Returns whether the capture ended, False after the timeout. Raises the exception that ended the capture, if any.'''
+        deadline = time.perf_counter() + timeout if timeout is not None else None
+        while self.thread is not None and self.thread.is_alive():
+            if any(actor.quitRequested for actor in self.actors):
+                self.stop()
+                break
+            remaining = deadline - time.perf_counter() if deadline is not None else 0.1
+            if remaining <= 0:
+                return False
+            self.thread.join(min(remaining, 0.1))
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+        return True
+    
+    def stop(self):
+        '''Stops the capture and waits for it to finish the current frame. The source stays open, so start() can restart it quickly.'''
+        self.capture.stop()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+    
+    def pause(self):
+        '''Pauses the capture, the source stays open.'''
+        self.capture.pause()
+    
+    def resume(self):
+        '''Resumes the capture after pause().'''
+        self.capture.resume()
+    
+    def close(self):
+        '''Stops the capture, the actors and the worker threads and processes, and closes the source. If an actor raises when it is stopped, the others are still stopped and the source closed before the first error is raised.'''
+        if self.closed:
+            return
+        self.closed = True
+        self.stop()
+        errors = []
+        for actor in self.actors:
+            try:
+                actor.stop()
+            except Exception as error:
+                errors.append(error)
+        self.scheduler.shutdown()
+        self.capture.close()
+        if errors:
+            raise errors[0]
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+        return False
 
     def onFeatureUpdate(self):
         '''Should be called whenever a new frame has been loaded from the ZED, computes all feature values for the next frame, and updates all actors.'''
-        for feature in self.feature:
-            feature.compute(self.capture)
-        for actor in self.actors:
-            actor.update(self.capture)
+        start = self.profiler.start()
+        self.scheduler.run(self.capture)
+        self.profiler.stop("onFeatureUpdate", start)
+        self.profiler.frameDone()
+    
+    def getProfile(self):
+        '''Returns the frame rate and the duration statistics of each stage, feature and actor (empty while the profiler is disabled).'''
+        return self.profiler.getStats()
     
         
 
@@ -201,18 +556,24 @@ class FeatureExtractor:
 # =============================================================================
 # Where we actually construct and run the code:
 # =============================================================================
-# 1. Construct all the actors            
-plotter = A.Cv2Plotter()
-actors = [plotter]
-
-# 2. Construct all the features (and connect them to the actors as needed)
-distance = F.NaiveDistance(plotter)
-features = [distance]
+if __name__ == "__main__":
+    # 0. Read the capture profile from the command line
+    parser = argparse.ArgumentParser(description="Plot the distances between the people seen by the ZED 2.")
+    CP.CaptureProfile.addArguments(parser)
+    profile = CP.CaptureProfile.fromArgs(parser.parse_args())
+    
+    # 1. Construct all the actors            
+    plotter = A.Cv2Plotter()
+    actors = [plotter]
 
-# 3. Create the extractor and run
-extractor = FeatureExtractor(features, actors)
-extractor.start()
+    # 2. Construct all the features (and connect them to the actors as needed)
+    distance = F.NaiveDistance([plotter])
+    features = [distance]
 
-# The extractor has a key listener that should kill it when people press 'q'
+    # 3. Create the extractor and run
+    adaptive = CP.AdaptiveResolution(profile) if profile.adaptive else None
+    with FeatureExtractor(features, actors, FS.ZEDFrameSource(profile=profile), adaptive=adaptive) as extractor:
+        extractor.start()
         
-        
\ No newline at end of file
+        # Run until people press 'q' in the plot window
+        extractor.wait()
@@ -10,7 +10,7 @@ import threading
 
 import pyzed.sl as sl
 import cv2
-import math
+import numpy as np
 
 from typing import List
 
@@ -62,10 +62,18 @@ class Feature:
 # =============================================================================
 # NaiveDistance
 # =============================================================================
+def objectPositions(obj_array):
+    '''Packs the positions of the given objects into an (N,3) float32 array.'''
+    positions = np.empty((len(obj_array),3), np.float32)
+    for i in range(len(obj_array)):
+        positions[i] = obj_array[i].position
+    return positions
+
 naiveDistanceLabel = "NaiveDistance"
 class NaiveDistance(Feature):
     '''
     The NaiveDistance is a Feature that lazily computes distances between each detected person and the previous detected person (first person compared to 0,0,0).
+    The value is an ndarray with one distance per detected object.
     '''
     dependentOn = []
     
@@ -76,21 +84,30 @@ class NaiveDistance(Feature):
         
     def computeValue(self, capture):
         '''Computes the distances between each detected person and the previous detected person (first person compared to 0,0,0).'''
-        prePosition = [0,0,0]
-        obj_array = capture.getObjectArray()
-        self.value = []
+        positions = objectPositions(capture.getObjectArray())
+        self.value = NaiveDistance.computeDistances(positions)
+    
+    @staticmethod
+    def computeDistances(positions:np.ndarray):
+        '''Returns the distances between each position in an (N,3) array and the previous position (first position compared to 0,0,0).'''
+        return np.linalg.norm(np.diff(positions, axis=0, prepend=np.zeros((1,3), positions.dtype)), axis=1)
+    
+    @staticmethod
+    def computeBatch(positions:np.ndarray, counts:np.ndarray=None):
+        '''
+        Computes the NaiveDistances for a stack of frames at once, e.g. when replaying a recording offline.
+        
+        Args:
+            positions (ndarray): (frames, N, 3) positions, frames with fewer than N objects are padded at the end.
+            counts (ndarray): number of objects in each frame, None if all frames have N objects.
             
-        for i in range(len(obj_array)) :
-            obj_data = obj_array[i]
-            obj_position = obj_data.position
-
-            # Calculating distance 
-            distance = math.sqrt((obj_position[0]-prePosition[0])*(obj_position[0]-prePosition[0]) + 
-                               (obj_position[1]-prePosition[1])*(obj_position[1]-prePosition[1]) +
-                               (obj_position[2]-prePosition[2])*(obj_position[2]-prePosition[2]))
-            self.value.append(distance)
-
-            prePosition = obj_position
+        Returns:
+            (frames, N) ndarray of distances, NaN for the padding.
+        '''
+        distances = np.linalg.norm(np.diff(positions, axis=1, prepend=np.zeros((positions.shape[0],1,3), positions.dtype)), axis=2)
+        if counts is not None:
+            distances[np.arange(positions.shape[1])[None,:] >= np.asarray(counts)[:,None]] = np.nan
+        return distances
         
 
 
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 19:48:52 2026
+
+Zones (polygons) and tripwires (line segments) on the floor, in the floor-referenced coordinates
+of the positional tracking (x and z with the floor as origin). The geometry is prepared once, so
+testing all positions of a frame against it is a handful of array operations.
+"""
+
+import numpy as np
+
+from typing import List
+
+
+
+def cross(a:np.ndarray, b:np.ndarray):
+    '''Returns the 2D cross products of the (..., 2) vectors a and b.'''
+    return a[...,0] * b[...,1] - a[...,1] * b[...,0]
+
+
+
+class Zone:
+    '''
+    A Zone is an area on the floor, given as a polygon.
+
+    Args:
+        name (str): name of the zone.
+        polygon: (N,2) corners of the polygon on the floor (x, z in meters), in order, at least three.
+    '''
+    def __init__(self, name:str, polygon):
+        self.name = name
+        self.polygon = np.asarray(polygon, np.float64).reshape(-1, 2)
+        if len(self.polygon) < 3:
+            raise ValueError("Zone " + name + " needs at least three corners.")
+        # The edges, from each corner to the next
+        self.starts = self.polygon
+        self.ends = np.roll(self.polygon, -1, axis=0)
+        self.bounds = (self.polygon[:,0].min(), self.polygon[:,0].max(), self.polygon[:,1].min(), self.polygon[:,1].max())
+
+    def contains(self, points:np.ndarray):
+        '''Returns for each of the (N,2) points whether it lies inside the polygon, testing all points against all edges at once (even-odd rule).'''
+        x, z = points[:,0,None], points[:,1,None]
+        x1, z1 = self.starts[:,0], self.starts[:,1]
+        x2, z2 = self.ends[:,0], self.ends[:,1]
+        straddles = (z1 > z) != (z2 > z)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            crossings = straddles & (x < x1 + (z - z1) * (x2 - x1) / (z2 - z1))
+        return np.count_nonzero(crossings, axis=1) % 2 == 1
+
+
+
+class Tripwire:
+    '''
+    A Tripwire is a line segment on the floor that counts the people crossing it, in both directions.
+
+    Crossing from the left of the segment (seen from start towards end) to its right counts as entering, the other way as leaving. Swap start and end to swap the directions.
+
+    Args:
+        name (str): name of the tripwire.
+        start: (x, z) of one end of the segment in meters.
+        end: (x, z) of the other end.
+    '''
+    entering = 1
+    leaving = -1
+
+    def __init__(self, name:str, start, end):
+        self.name = name
+        self.start = np.asarray(start, np.float64)
+        self.end = np.asarray(end, np.float64)
+        self.direction = self.end - self.start
+
+    def crossings(self, before:np.ndarray, after:np.ndarray):
+        '''Returns for each movement from the (N,2) points before to the (N,2) points after whether it crosses the segment: entering, leaving, or 0.'''
+        # 1. The sides of the line both points are on: the movement crosses the line if they differ
+        leftBefore = cross(self.direction, before - self.start) > 0
+        leftAfter = cross(self.direction, after - self.start) > 0
+        # 2. The sides of the movement both ends of the segment are on: it crosses the segment itself if they differ
+        movement = after - before
+        within = (cross(movement, self.start - before) > 0) != (cross(movement, self.end - before) > 0)
+        return np.where(within & leftBefore & ~leftAfter, Tripwire.entering, 0) + np.where(within & ~leftBefore & leftAfter, Tripwire.leaving, 0)
+
+
+
+class ZoneLayout:
+    '''
+    The ZoneLayout tests floor points against a set of zones at once.
+
+    With a resolution, the zones are rasterized once into a grid of cells (each cell holds which zones contain its center), so a test is a single lookup per point, exact up to the resolution along the edges. Without one, each point is tested against the polygons exactly.
+
+    Args:
+        zones (List[Zone]): the zones.
+        resolution (float): size of the raster cells in meters, None to test against the polygons.
+
+    Attributes:
+        names: the names of the zones, in order.
+    '''
+    def __init__(self, zones:List[Zone], resolution:float=None):
+        self.zones = zones
+        self.names = [zone.name for zone in zones]
+        self.resolution = resolution
+        self.mask = None
+        if resolution is not None and len(zones) > 0:
+            self.rasterize(resolution)
+
+    def rasterize(self, resolution:float):
+        '''Precomputes the (rows, columns, zones) mask over the bounds of all zones.'''
+        bounds = np.array([zone.bounds for zone in self.zones])
+        self.origin = np.array([bounds[:,0].min(), bounds[:,2].min()])
+        columns = max(1, int(np.ceil((bounds[:,1].max() - self.origin[0]) / resolution)))
+        rows = max(1, int(np.ceil((bounds[:,3].max() - self.origin[1]) / resolution)))
+        centers = np.stack(np.meshgrid(self.origin[0] + (np.arange(columns) + 0.5) * resolution,
+                                       self.origin[1] + (np.arange(rows) + 0.5) * resolution), axis=-1).reshape(-1, 2)
+        self.mask = np.stack([zone.contains(centers) for zone in self.zones], axis=1).reshape(rows, columns, len(self.zones))
+
+    def contains(self, points:np.ndarray):
+        '''Returns an (N, zones) boolean array holding for each of the (N,2) points which zones contain it.'''
+        if self.mask is None:
+            return np.stack([zone.contains(points) for zone in self.zones], axis=1) if self.zones else np.zeros((len(points), 0), bool)
+        cells = np.floor((points - self.origin) / self.resolution).astype(np.intp)
+        rows, columns = self.mask.shape[:2]
+        inside = (cells[:,0] >= 0) & (cells[:,0] < columns) & (cells[:,1] >= 0) & (cells[:,1] < rows)
+        result = np.zeros((len(points), len(self.zones)), bool)
+        result[inside] = self.mask[cells[inside,1], cells[inside,0]]
+        return result
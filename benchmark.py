@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 14:31:52 2026
+
+Benchmarks the Feature/Actor pipeline on synthetic scenes, without a camera.
+
+    python benchmark.py                                   # HD720 to HD2K, all crowd sizes, results in benchmark.json
+    python benchmark.py --resolutions HD720 --people 10 50 --frames 500 --output before.json
+    python benchmark.py --compare before.json after.json  # compare two runs
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+
+import ZEDFeatureExtractor as ZED
+import Features as F
+import Actors as A
+import FrameSources as FS
+import Profiling as P
+import CaptureProfile as CP
+
+
+# The resolutions benchmarked by default, the image sizes are those of CaptureProfile.resolutionSizes
+defaultResolutions = ["HD720", "HD1080", "HD2K"]
+
+
+
+def buildPipeline():
+    '''Returns the features and actors to benchmark: NaiveDistance and Proximity, plotted by a headless Cv2Plotter that plots every frame.'''
+    plotter = A.Cv2Plotter(refreshRate=1000, headless=True)
+    actors = [plotter]
+    features = [F.NaiveDistance([plotter]), F.Proximity([])]
+    return features, actors
+
+
+def runPipeline(resolution, people:int, frames:int, profiler:P.Profiler, workers:int, bufferSize:int):
+    '''Runs the pipeline over the given number of synthetic frames. Returns the elapsed time in seconds and the actors.'''
+    features, actors = buildPipeline()
+    source = FS.SyntheticFrameSource(numPeople=people, resolution=resolution, numFrames=frames)
+    extractor = ZED.FeatureExtractor(features, actors, source, bufferSize=bufferSize, workers=workers, profiler=profiler)
+    start = time.perf_counter()
+    extractor.capture.run()
+    elapsed = time.perf_counter() - start
+    extractor.close()
+    return elapsed, actors
+
+
+def benchmark(name:str, people:int, frames:int, workers:int, bufferSize:int):
+    '''Benchmarks a single resolution and crowd size. Returns the results as a dictionary.'''
+    resolution = CP.resolutionSizes[name]
+
+    # 1. Timing run, with the profiler measuring each stage
+    profiler = P.Profiler(enabled=True, windowSize=frames)
+    elapsed, actors = runPipeline(resolution, people, frames, profiler, workers, bufferSize)
+    stats = profiler.getStats()
+
+    # 2. Memory run, separately as tracing allocations slows everything down
+    tracemalloc.start()
+    runPipeline(resolution, people, min(frames, 50), P.Profiler(), workers, bufferSize)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"resolution": name,
+            "people": people,
+            "frames": frames,
+            "fps": frames / elapsed,
+            "stages": stats["stages"],
+            "plottedFrames": actors[0].plottedFrames,
+            "peakMemoryMB": peak / 2**20}
+
+
+def version():
+    '''Returns the git commit the benchmark runs on, if known.'''
+    try:
+        return subprocess.check_output(["git", "describe", "--always", "--dirty"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(basePath:str, newPath:str):
+    '''Prints the fps and the p95 of each stage of two benchmark runs side by side.'''
+    with open(basePath) as file:
+        base = json.load(file)
+    with open(newPath) as file:
+        new = json.load(file)
+    print("%s (%s) -> %s (%s)" % (basePath, base["version"], newPath, new["version"]))
+    baseResults = {(result["resolution"], result["people"]): result for result in base["results"]}
+    for result in new["results"]:
+        key = (result["resolution"], result["people"])
+        if key not in baseResults:
+            continue
+        old = baseResults[key]
+        print("%-7s %4d people: %8.1f -> %8.1f fps (%+.1f%%), peak memory %.1f -> %.1f MB" % (key[0], key[1], old["fps"], result["fps"],
+              100 * (result["fps"] / old["fps"] - 1), old["peakMemoryMB"], result["peakMemoryMB"]))
+        for stage in sorted(result["stages"]):
+            if stage in old["stages"]:
+                print("    %-30s p95 %8.3f -> %8.3f ms" % (stage, old["stages"][stage]["p95"], result["stages"][stage]["p95"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Feature/Actor pipeline on synthetic scenes.")
+    parser.add_argument("--resolutions", nargs="+", default=defaultResolutions, choices=list(CP.resolutionSizes))
+    parser.add_argument("--people", nargs="+", type=int, default=[1, 10, 50, 200])
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=1, help="threads to compute features on")
+    parser.add_argument("--buffer", type=int, default=0, help="frames buffered between grabbing and the features, 0 for a single thread")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="compare two benchmark results instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = []
+    for name in args.resolutions:
+        for people in args.people:
+            result = benchmark(name, people, args.frames, args.workers, args.buffer)
+            print("%-7s %4d people: %8.1f fps, onFeatureUpdate p95 %.3f ms, peak memory %.1f MB" % (name, people, result["fps"],
+                  result["stages"]["onFeatureUpdate"]["p95"], result["peakMemoryMB"]))
+            results.append(result)
+
+    with open(args.output, "w") as file:
+        json.dump({"version": version(),
+                   "python": platform.python_version(),
+                   "numpy": np.__version__,
+                   "machine": platform.platform(),
+                   "workers": args.workers,
+                   "buffer": args.buffer,
+                   "results": results}, file, indent=2)
+    print("Results written to " + args.output)
+
+if __name__ == "__main__":
+    main()